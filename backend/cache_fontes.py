@@ -0,0 +1,115 @@
+import glob
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Diretório onde ficam as cópias colunares dos arquivos de origem
+DIRETORIO_CACHE = os.getenv("CACHE_FONTES_DIR", "data/.cache")
+
+try:
+    import pyarrow  # noqa: F401
+    FORMATO_CACHE = "parquet"
+except ImportError:
+    FORMATO_CACHE = "npz"
+
+
+# -----------------------------
+# Funções Auxiliares
+# -----------------------------
+def hash_arquivo(path: str) -> str:
+    """
+    Retorna o SHA-256 (20 primeiros caracteres) do conteúdo do arquivo.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()[:20]
+
+def _ler_original(path: str) -> pd.DataFrame:
+    if path.endswith(".csv"):
+        return pd.read_csv(path, sep=";")
+    elif path.endswith(".xlsx"):
+        return pd.read_excel(path)
+    else:
+        raise ValueError(f"Formato não suportado: {path}")
+
+def _normalizar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deixa cada coluna com um tipo único para poder ser gravada em formato colunar:
+    datas em objetos viram datetime64 e colunas com tipos misturados viram texto.
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        tipo = pd.api.types.infer_dtype(df[col], skipna=True)
+        if tipo in ("date", "datetime"):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif tipo not in ("string", "empty"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def _gravar_cache(df: pd.DataFrame, destino: str):
+    # Grava num arquivo temporário e renomeia: leitores nunca veem arquivo pela metade
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    if FORMATO_CACHE == "parquet":
+        df.to_parquet(temporario, index=False)
+    else:
+        with open(temporario, "wb") as f:
+            np.savez(f, __colunas__=np.array(df.columns, dtype=object),
+                     **{f"c{i}": df[col].to_numpy() for i, col in enumerate(df.columns)})
+    os.replace(temporario, destino)
+
+def _ler_cache(path: str) -> pd.DataFrame:
+    if FORMATO_CACHE == "parquet":
+        return pd.read_parquet(path)
+    with np.load(path, allow_pickle=True) as dados:
+        colunas = list(dados["__colunas__"])
+        return pd.DataFrame({col: dados[f"c{i}"] for i, col in enumerate(colunas)})
+
+
+# -----------------------------
+# Leitura com cache
+# -----------------------------
+def _nome_cache(path: str) -> str:
+    """
+    Prefixo das entradas de um arquivo: nome + hash do caminho absoluto, para
+    que partições com o mesmo nome em pastas diferentes (2024-01/vendas.csv,
+    2024-02/vendas.csv) não usem nem apaguem as entradas umas das outras.
+    """
+    origem = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    return f"{os.path.basename(path)}-{origem}"
+
+def ler_fonte(path: str) -> pd.DataFrame:
+    """
+    Lê um arquivo de origem (.xlsx ou .csv) usando o cache colunar.
+    A chave do cache é o hash do conteúdo: enquanto o arquivo não muda,
+    o openpyxl não é usado.
+    """
+    chave = hash_arquivo(path)
+    nome = _nome_cache(path)
+    destino = os.path.join(DIRETORIO_CACHE, f"{nome}-{chave}.{FORMATO_CACHE}")
+
+    if os.path.exists(destino):
+        try:
+            return _ler_cache(destino)
+        except FileNotFoundError:
+            pass  # removido por outro processo entre a verificação e a leitura: converte de novo
+
+    inicio = time.perf_counter()
+    df = _normalizar_tipos(_ler_original(path))
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    _gravar_cache(df, destino)
+    print(f"   cache: {path} convertido em {time.perf_counter() - inicio:.2f}s -> {destino}")
+
+    # Remove versões antigas do mesmo arquivo (outro processo pode já ter removido)
+    for antigo in glob.glob(os.path.join(DIRETORIO_CACHE, f"{glob.escape(nome)}-*.{FORMATO_CACHE}")):
+        if antigo != destino:
+            try:
+                os.remove(antigo)
+            except FileNotFoundError:
+                pass
+    return df
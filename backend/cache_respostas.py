@@ -0,0 +1,293 @@
+"""
+Cache das respostas do chat.
+
+A chave é (intenção, slots extraídos, impressão dos dados), não o texto da
+pergunta: "vendas por região" e "Vendas por regiao?" caem na mesma entrada, e
+uma nova versão dos dados nunca lê respostas antigas. A impressão
+(snapshot.impressao_recente) inclui o hash do conteúdo: o número da versão
+sozinho recomeça em v1 quando o banco é recriado, e o redis devolveria as
+respostas do banco anterior.
+
+Backends (CACHE_RESPOSTAS):
+- "memoria" (padrão): LRU com TTL dentro do processo;
+- "redis": armazenamento compartilhado entre workers (CACHE_RESPOSTAS_URL);
+  o pacote `redis` só é importado quando esse backend é escolhido;
+- "local": substituto em memória com a mesma interface do cliente redis,
+  para exercitar a serialização sem um servidor;
+- "0": desliga o cache.
+
+Chamadas simultâneas para a mesma chave ausente são calculadas uma única vez
+(single-flight por processo): as demais aguardam o mesmo resultado. Se a
+requisição que calculava for cancelada (cliente desconectou), as que aguardavam
+não são canceladas junto: uma delas passa a calcular.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .metricas import cache
+
+BACKEND = os.getenv("CACHE_RESPOSTAS", "memoria")
+URL_REDIS = os.getenv("CACHE_RESPOSTAS_URL", "redis://localhost:6379/0")
+TAMANHO = int(os.getenv("CACHE_RESPOSTAS_TAMANHO", "1024"))
+TTL = float(os.getenv("CACHE_RESPOSTAS_TTL", "300"))
+PREFIXO = "chatbot:resposta:"
+
+# Resultado entregue a quem aguardava quando o cálculo é cancelado: tentar de novo
+_REFAZER = object()
+
+
+def chave(intencao: str, slots: dict, impressao: str) -> str:
+    """
+    Chave canônica: os slots são ordenados e serializados, então a ordem em
+    que foram extraídos não importa. `impressao` vem de snapshot.impressao_recente().
+    """
+    return f"{impressao}|{intencao}|{json.dumps(slots, sort_keys=True, ensure_ascii=False, separators=(',', ':'))}"
+
+
+def _para_json(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} não é serializável")
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class BackendMemoria:
+    """
+    LRU limitado a `tamanho` entradas, cada uma válida por `ttl` segundos.
+    Guarda o próprio objeto (sem serializar).
+    """
+    nome = "memoria"
+
+    def __init__(self, tamanho: int = TAMANHO, ttl: float = TTL):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._dados = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+    def ler(self, chave: str):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return item[1]
+
+    def gravar(self, chave: str, valor):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._dados)
+
+
+class RedisLocal:
+    """
+    Substituto em processo do cliente redis, só com o que o cache usa
+    (get, set com `ex`, scan_iter, delete, dbsize).
+    """
+
+    def __init__(self):
+        self._dados = {}
+        self._lock = threading.Lock()
+
+    def _vivo(self, k):
+        item = self._dados.get(k)
+        if item is not None and item[0] is not None and item[0] < time.monotonic():
+            del self._dados[k]
+            return None
+        return item
+
+    def get(self, k):
+        with self._lock:
+            item = self._vivo(k)
+            return item[1] if item else None
+
+    def set(self, k, v, ex=None):
+        with self._lock:
+            self._dados[k] = (time.monotonic() + ex if ex else None, v.encode() if isinstance(v, str) else v)
+        return True
+
+    def scan_iter(self, match="*"):
+        prefixo = match.rstrip("*")
+        with self._lock:
+            return [k for k in list(self._dados) if k.startswith(prefixo) and self._vivo(k)]
+
+    def delete(self, *chaves):
+        with self._lock:
+            return sum(self._dados.pop(k, None) is not None for k in chaves)
+
+    def dbsize(self):
+        with self._lock:
+            return sum(1 for k in list(self._dados) if self._vivo(k))
+
+
+class BackendRedis:
+    """
+    Armazenamento compartilhado: valores em JSON com expiração de `ttl` segundos.
+    O limite de memória fica a cargo da política de despejo do servidor.
+    """
+    nome = "redis"
+
+    def __init__(self, cliente, ttl: float = TTL):
+        self.cliente = cliente
+        self.ttl = ttl
+
+    def ler(self, chave: str):
+        bruto = self.cliente.get(PREFIXO + chave)
+        return None if bruto is None else json.loads(bruto)
+
+    def gravar(self, chave: str, valor):
+        texto = json.dumps(valor, ensure_ascii=False, default=_para_json)
+        self.cliente.set(PREFIXO + chave, texto, ex=max(int(self.ttl), 1))
+
+    def limpar(self):
+        chaves = list(self.cliente.scan_iter(match=PREFIXO + "*"))
+        if chaves:
+            self.cliente.delete(*chaves)
+
+    def __len__(self):
+        return sum(1 for _ in self.cliente.scan_iter(match=PREFIXO + "*"))
+
+
+def criar_backend(nome: str = BACKEND):
+    if nome in ("0", "", "nenhum"):
+        return None
+    if nome == "memoria":
+        return BackendMemoria()
+    if nome == "redis":
+        import redis  # dependência opcional, só para deploys com vários workers
+        return BackendRedis(redis.Redis.from_url(URL_REDIS))
+    if nome == "local":
+        backend = BackendRedis(RedisLocal())
+        backend.nome = "local"
+        return backend
+    raise ValueError(f"Backend de cache desconhecido: {nome}. Use memoria, redis, local ou 0")
+
+
+# -----------------------------
+# Cache com single-flight
+# -----------------------------
+class CacheRespostas:
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._em_voo = {}  # chave -> asyncio.Future do cálculo em andamento
+        self._contadores = {"acertos": 0, "faltas": 0, "compartilhados": 0, "erros": 0}
+
+    @property
+    def ativo(self) -> bool:
+        return self.backend is not None
+
+    async def obter(self, chave: str, calcular):
+        """
+        Retorna o valor em cache ou aguarda `calcular()` (corrotina). Respostas
+        None e exceções não são guardadas; a exceção chega a todos os que aguardavam.
+        """
+        if self.backend is None:
+            return await calcular()
+
+        while True:
+            valor = self.backend.ler(chave)
+            if valor is not None:
+                self._contadores["acertos"] += 1
+                cache("respostas", "acerto")
+                return valor
+
+            em_voo = self._em_voo.get(chave)
+            if em_voo is None:
+                break
+            self._contadores["compartilhados"] += 1
+            cache("respostas", "compartilhado")
+            valor = await asyncio.shield(em_voo)
+            if valor is not _REFAZER:
+                return valor
+            # O cálculo foi cancelado: a primeira a voltar aqui calcula, as demais aguardam
+
+        self._contadores["faltas"] += 1
+        cache("respostas", "falta")
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_voo[chave] = futuro
+        try:
+            valor = await calcular()
+        except asyncio.CancelledError:
+            futuro.set_result(_REFAZER)
+            raise
+        except BaseException as e:
+            self._contadores["erros"] += 1
+            futuro.set_exception(e)
+            futuro.exception()  # marcado como lido: sem aviso se ninguém aguardava
+            raise
+        else:
+            if valor is not None:
+                self.backend.gravar(chave, valor)
+            futuro.set_result(valor)
+            return valor
+        finally:
+            del self._em_voo[chave]
+
+    async def obter_lote(self, chaves, calcular):
+        """
+        Valores de várias chaves de uma vez: as ausentes (sem repetição) são
+        passadas numa única chamada `calcular(faltantes)`, que retorna a lista
+        de valores na mesma ordem. Retorna {chave: valor}.
+        """
+        valores, faltantes = {}, []
+        for c in dict.fromkeys(chaves):
+            valor = self.backend.ler(c) if self.backend is not None else None
+            if valor is None:
+                faltantes.append(c)
+            else:
+                valores[c] = valor
+        if self.backend is not None:
+            self._contadores["acertos"] += len(valores)
+            self._contadores["faltas"] += len(faltantes)
+            cache("respostas", "acerto", len(valores))
+            cache("respostas", "falta", len(faltantes))
+        if not faltantes:
+            return valores
+
+        try:
+            calculados = await calcular(faltantes)
+        except Exception:
+            self._contadores["erros"] += 1
+            raise
+        for c, valor in zip(faltantes, calculados):
+            valores[c] = valor
+            if valor is not None and self.backend is not None:
+                self.backend.gravar(c, valor)
+        return valores
+
+    def limpar(self):
+        if self.backend is not None:
+            self.backend.limpar()
+
+    def estatisticas(self) -> dict:
+        consultas = self._contadores["acertos"] + self._contadores["faltas"] + self._contadores["compartilhados"]
+        reaproveitadas = self._contadores["acertos"] + self._contadores["compartilhados"]
+        return {
+            "backend": self.backend.nome if self.backend is not None else None,
+            "entradas": len(self.backend) if self.backend is not None else 0,
+            **self._contadores,
+            "taxa_acerto": round(reaproveitadas / consultas, 4) if consultas else 0.0,
+        }
+
+
+cache_respostas = CacheRespostas(criar_backend())
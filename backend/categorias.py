@@ -0,0 +1,145 @@
+"""
+Índice de categorias de produto, montado uma vez por versão dos dados.
+
+A frase da pergunta é normalizada (sem acentos, minúsculas) e resolvida, nesta ordem:
+1. nome exato da categoria (dict, O(1));
+2. palavras: cada palavra da frase deve ser prefixo de alguma palavra da
+   categoria ("eletro" -> "Eletrônicos"), por busca binária no vocabulário;
+3. aproximação (difflib) para erros de digitação, se CATEGORIAS_APROXIMADA=1.
+
+O resultado traz as categorias originais encontradas e os ids dos produtos delas.
+"""
+import bisect
+import difflib
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .metricas import cache
+from .texto import normalizar
+
+APROXIMADA = os.getenv("CATEGORIAS_APROXIMADA", "1") == "1"
+CORTE_APROXIMADA = float(os.getenv("CATEGORIAS_CORTE", "0.7"))
+
+_RE_PALAVRA = re.compile(r"[a-z0-9]+")
+_IGNORADAS = {"de", "da", "do", "das", "dos", "e"}
+
+
+def chave(texto) -> str:
+    """
+    Forma normalizada usada no índice: sem acentos, minúsculas, espaços simples.
+    """
+    return " ".join(normalizar(str(texto)).split())
+
+def _palavras(texto: str):
+    return [p for p in _RE_PALAVRA.findall(texto) if p not in _IGNORADAS]
+
+
+@dataclass(frozen=True)
+class Resolucao:
+    categorias: tuple   # nomes originais das categorias encontradas
+    ids: np.ndarray     # ids dos produtos dessas categorias, ordenados
+    modo: str           # "exata", "palavras", "aproximada" ou "nenhuma"
+
+
+class IndiceCategorias:
+    def __init__(self, df_produtos: pd.DataFrame):
+        df = df_produtos[["id_produto", "categoria"]].dropna()
+        self._originais = {}  # chave -> nome original
+        self._ids = {}        # chave -> ids dos produtos
+        for categoria, grupo in df.groupby(df["categoria"].astype(str), sort=False):
+            k = chave(categoria)
+            ids = grupo["id_produto"].to_numpy(dtype=np.int64)
+            if k in self._ids:  # grafias diferentes da mesma categoria
+                ids = np.concatenate((self._ids[k], ids))
+            self._ids[k] = np.unique(ids)
+            self._originais.setdefault(k, set()).add(categoria)
+
+        # palavra -> chaves das categorias que a contêm; vocabulário ordenado para prefixos
+        self._por_palavra = {}
+        for k in self._ids:
+            for palavra in _palavras(k):
+                self._por_palavra.setdefault(palavra, set()).add(k)
+        self._vocabulario = sorted(self._por_palavra)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _com_prefixo(self, prefixo: str) -> set:
+        encontradas = set()
+        i = bisect.bisect_left(self._vocabulario, prefixo)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(prefixo):
+            encontradas |= self._por_palavra[self._vocabulario[i]]
+            i += 1
+        return encontradas
+
+    def _por_palavras(self, frase: str) -> set:
+        palavras = _palavras(frase)
+        if not palavras:
+            return set()
+        chaves = self._com_prefixo(palavras[0])
+        for palavra in palavras[1:]:
+            if not chaves:
+                break
+            chaves &= self._com_prefixo(palavra)
+        return chaves
+
+    def _aproximadas(self, frase: str) -> set:
+        parecidas = difflib.get_close_matches(frase, list(self._ids), n=3, cutoff=CORTE_APROXIMADA)
+        if parecidas:
+            return set(parecidas[:1])
+        # Palavra a palavra, contra o vocabulário
+        chaves = None
+        for palavra in _palavras(frase):
+            proximas = difflib.get_close_matches(palavra, self._vocabulario, n=1, cutoff=CORTE_APROXIMADA)
+            if not proximas:
+                return set()
+            candidatas = self._por_palavra[proximas[0]]
+            chaves = set(candidatas) if chaves is None else chaves & candidatas
+        return chaves or set()
+
+    def _resolucao(self, chaves: set, modo: str) -> Resolucao:
+        if not chaves:
+            return Resolucao((), np.empty(0, dtype=np.int64), "nenhuma")
+        ordenadas = sorted(chaves)
+        categorias = tuple(sorted(nome for k in ordenadas for nome in self._originais[k]))
+        ids = self._ids[ordenadas[0]] if len(ordenadas) == 1 else np.unique(np.concatenate([self._ids[k] for k in ordenadas]))
+        return Resolucao(categorias, ids, modo)
+
+    def resolver(self, frase, aproximada: bool = APROXIMADA) -> Resolucao:
+        k = chave(frase)
+        if not k:
+            return self._resolucao(set(), "nenhuma")
+        if k in self._ids:
+            return self._resolucao({k}, "exata")
+        if chaves := self._por_palavras(k):
+            return self._resolucao(chaves, "palavras")
+        if aproximada and (chaves := self._aproximadas(k)):
+            return self._resolucao(chaves, "aproximada")
+        return self._resolucao(set(), "nenhuma")
+
+
+_cache = {}
+_lock = threading.Lock()
+
+def indice_da_versao(versao: str, carregar) -> IndiceCategorias:
+    """
+    Índice da versão de dados informada; `carregar()` retorna (id_produto, categoria)
+    de todos os produtos e só é chamado quando a versão muda.
+    """
+    indice = _cache.get(versao)
+    if indice is None:
+        with _lock:
+            indice = _cache.get(versao)
+            if indice is None:
+                cache("categorias", "falta")
+                indice = IndiceCategorias(carregar())
+                _cache.clear()
+                _cache[versao] = indice
+                return indice
+    cache("categorias", "acerto")
+    return indice
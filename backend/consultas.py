@@ -0,0 +1,207 @@
+"""
+Consultas agregadas executadas direto no banco (SQLAlchemy Core).
+Retornam apenas as linhas de resultado, sem materializar as tabelas em pandas.
+"""
+import os
+
+import pandas as pd
+from sqlalchemy import desc, func, select
+
+from .database import ENGINE, Produto, Vendedor, Venda, VendaVendedorMes, VendaProdutoTrimestre, VendaRegiao
+
+# Linhas buscadas por vez pelas consultas em streaming (cursor do servidor)
+LINHAS_POR_LOTE = int(os.getenv("CONSULTAS_LINHAS_POR_LOTE", "1000"))
+
+
+def _iterar(stmt):
+    """
+    Gera as linhas de `stmt` como dicts sem materializar o resultado: a conexão
+    fica aberta enquanto o gerador é consumido e as linhas vêm em lotes de
+    LINHAS_POR_LOTE (stream_results + yield_per).
+    """
+    with ENGINE.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=LINHAS_POR_LOTE).execute(stmt)
+        for row in resultado.mappings():
+            yield dict(row)
+
+
+# -----------------------------
+# VENDAS
+# -----------------------------
+def total_vendas_produto(id_produto: int):
+    nome = select(Produto.nome_produto).where(Produto.id_produto == id_produto).scalar_subquery()
+    total = (
+        select(func.coalesce(func.sum(Venda.valor_total), 0.0))
+        .where(Venda.id_produto == id_produto)
+        .scalar_subquery()
+    )
+    with ENGINE.connect() as conn:
+        row = conn.execute(select(nome, total)).one()
+    return {"id_produto": id_produto, "produto_nome": row[0], "total_vendas": float(row[1])}
+
+
+def total_vendas_vendedor(id_vendedor: int):
+    nome = select(Vendedor.nome_vendedor).where(Vendedor.id_vendedor == id_vendedor).scalar_subquery()
+    total = (
+        select(func.coalesce(func.sum(Venda.valor_total), 0.0))
+        .where(Venda.id_vendedor == id_vendedor)
+        .scalar_subquery()
+    )
+    with ENGINE.connect() as conn:
+        row = conn.execute(select(nome, total)).one()
+    return {"id_vendedor": id_vendedor, "nome_vendedor": row[0], "total_vendas": float(row[1])}
+
+
+def _totais_por_id(coluna_id, coluna_nome, coluna_venda, ids):
+    """
+    Nome e total de vendas de vários ids com duas consultas agrupadas numa
+    mesma conexão; retorna {id: (nome, total)}.
+    """
+    ids = sorted({int(i) for i in ids})
+    nomes = select(coluna_id, coluna_nome).where(coluna_id.in_(ids))
+    totais = (
+        select(coluna_venda, func.sum(Venda.valor_total))
+        .where(coluna_venda.in_(ids))
+        .group_by(coluna_venda)
+    )
+    with ENGINE.connect() as conn:
+        por_nome = dict(conn.execute(nomes).all())
+        por_total = dict(conn.execute(totais).all())
+    return {i: (por_nome.get(i), float(por_total.get(i) or 0.0)) for i in ids}
+
+
+def totais_vendas_produtos(ids):
+    totais = _totais_por_id(Produto.id_produto, Produto.nome_produto, Venda.id_produto, ids)
+    return [{"id_produto": int(i), "produto_nome": totais[int(i)][0], "total_vendas": totais[int(i)][1]} for i in ids]
+
+
+def totais_vendas_vendedores(ids):
+    totais = _totais_por_id(Vendedor.id_vendedor, Vendedor.nome_vendedor, Venda.id_vendedor, ids)
+    return [{"id_vendedor": int(i), "nome_vendedor": totais[int(i)][0], "total_vendas": totais[int(i)][1]} for i in ids]
+
+
+def vendas_por_regiao():
+    return list(linhas_vendas_por_regiao())
+
+
+def linhas_vendas_por_regiao():
+    # Lido do rollup por região, mantido pela carga
+    stmt = select(VendaRegiao.regiao, VendaRegiao.valor_total).order_by(desc(VendaRegiao.valor_total))
+    yield from _iterar(stmt)
+
+
+# -----------------------------
+# PRODUTOS
+# -----------------------------
+def detalhes_produto(id_produto: int):
+    stmt = select(Produto.__table__).where(Produto.id_produto == id_produto)
+    with ENGINE.connect() as conn:
+        row = conn.execute(stmt).first()
+    return dict(row._mapping) if row else None
+
+
+def linhas_totais_produtos(resolucao=None):
+    """
+    Quantidade e valor vendidos de cada produto do catálogo (inclusive os sem
+    venda), somados a partir do rollup produto x trimestre, em ordem de id.
+    Com `resolucao` (backend/categorias.py), só os produtos das categorias dela.
+    """
+    rollup = (
+        select(
+            VendaProdutoTrimestre.id_produto,
+            func.sum(VendaProdutoTrimestre.quantidade).label("quantidade"),
+            func.sum(VendaProdutoTrimestre.valor_total).label("valor_total"),
+        )
+        .group_by(VendaProdutoTrimestre.id_produto)
+        .subquery()
+    )
+    stmt = (
+        select(
+            Produto.id_produto, Produto.nome_produto, Produto.categoria,
+            func.coalesce(rollup.c.quantidade, 0).label("quantidade"),
+            func.coalesce(rollup.c.valor_total, 0.0).label("valor_total"),
+        )
+        .outerjoin(rollup, rollup.c.id_produto == Produto.id_produto)
+        .order_by(Produto.id_produto)
+    )
+    if resolucao is not None:
+        stmt = stmt.where(Produto.categoria.in_(resolucao.categorias))
+    yield from _iterar(stmt)
+
+
+def linhas_top_produtos_ano(resolucao, ano: int, top_n: int = 5):
+    """
+    Produtos das categorias resolvidas (backend/categorias.py) com maior valor
+    vendido no ano, do maior para o menor. O filtro por categoria usa o índice
+    de produtos.categoria; o valor vem do rollup produto x trimestre.
+    """
+    valor_total = func.sum(VendaProdutoTrimestre.valor_total).label("valor_total")
+    stmt = (
+        select(VendaProdutoTrimestre.id_produto, valor_total, Produto.nome_produto)
+        .join(Produto, Produto.id_produto == VendaProdutoTrimestre.id_produto)
+        .where(VendaProdutoTrimestre.ano == ano, Produto.categoria.in_(resolucao.categorias))
+        .group_by(VendaProdutoTrimestre.id_produto, Produto.nome_produto)
+        .order_by(desc(valor_total), VendaProdutoTrimestre.id_produto)
+        .limit(top_n)
+    )
+    yield from _iterar(stmt)
+
+
+def categorias_produtos() -> pd.DataFrame:
+    with ENGINE.connect() as conn:
+        return pd.read_sql(select(Produto.id_produto, Produto.categoria), conn)
+
+
+def detalhes_produtos(ids):
+    stmt = select(Produto.__table__).where(Produto.id_produto.in_({int(i) for i in ids}))
+    with ENGINE.connect() as conn:
+        por_id = {row.id_produto: dict(row._mapping) for row in conn.execute(stmt)}
+    return [por_id.get(int(i)) for i in ids]
+
+
+# -----------------------------
+# VENDEDORES
+# -----------------------------
+def produtos_mais_vendidos_vendedor(id_vendedor: int, top_n: int = 3):
+    valor_total = func.sum(Venda.valor_total).label("valor_total")
+    stmt = (
+        select(Produto.nome_produto, valor_total)
+        .select_from(Venda)
+        .outerjoin(Produto, Venda.id_produto == Produto.id_produto)
+        .where(Venda.id_vendedor == id_vendedor)
+        .group_by(Venda.id_produto, Produto.nome_produto)
+        .order_by(desc(valor_total))
+        .limit(top_n)
+    )
+    with ENGINE.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(stmt)]
+
+
+# -----------------------------
+# ROLLUPS
+# -----------------------------
+def rollup_vendedor_mes(id_vendedor: int = None) -> pd.DataFrame:
+    """
+    Vendas por vendedor e mês (id_vendedor, ano, mes, valor_total), ordenadas por período.
+    """
+    stmt = select(VendaVendedorMes.id_vendedor, VendaVendedorMes.ano, VendaVendedorMes.mes, VendaVendedorMes.valor_total)
+    if id_vendedor is not None:
+        stmt = stmt.where(VendaVendedorMes.id_vendedor == id_vendedor)
+    stmt = stmt.order_by(VendaVendedorMes.ano, VendaVendedorMes.mes)
+    with ENGINE.connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+
+def rollup_produto_trimestre(id_produto: int = None) -> pd.DataFrame:
+    """
+    Vendas por produto e trimestre (id_produto, ano, trimestre, valor_total), ordenadas por período.
+    """
+    stmt = select(
+        VendaProdutoTrimestre.id_produto, VendaProdutoTrimestre.ano,
+        VendaProdutoTrimestre.trimestre, VendaProdutoTrimestre.valor_total,
+    )
+    if id_produto is not None:
+        stmt = stmt.where(VendaProdutoTrimestre.id_produto == id_produto)
+    stmt = stmt.order_by(VendaProdutoTrimestre.ano, VendaProdutoTrimestre.trimestre)
+    with ENGINE.connect() as conn:
+        return pd.read_sql(stmt, conn)
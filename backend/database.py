@@ -1,10 +1,127 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey
+import os
+
+from sqlalchemy import create_engine, event, Column, Index, Integer, String, Float, Date, DateTime, ForeignKey, func, insert, select, update
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from .metricas import instrumentar_engine
+
+# -----------------------------
+# Configuração do banco (variáveis de ambiente)
+# -----------------------------
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///chatbot.db")
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"  # log de cada SQL: só para depuração
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Pragmas aplicados a cada conexão SQLite: WAL deixa leitores e o escritor
+# trabalharem em paralelo; synchronous=NORMAL é seguro em WAL e evita um fsync
+# por commit; mmap lê as páginas do arquivo sem cópia para o cache do SQLite.
+PRAGMAS_SQLITE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": os.getenv("DB_SQLITE_MMAP", str(256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+    "busy_timeout": os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"),
+}
+
+# Drivers assíncronos usados por criar_engine_async para cada banco
+_DRIVERS_ASYNC = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _em_memoria(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _opcoes_engine(url) -> dict:
+    opcoes = {"echo": DB_ECHO}
+    if url.get_backend_name() == "sqlite":
+        # As conexões são usadas pelas threads do despachante, não pela que as abriu
+        opcoes["connect_args"] = {"check_same_thread": False}
+        if _em_memoria(url):
+            # Banco em memória só existe dentro de uma conexão: todas compartilham a mesma
+            # (e o pool de processos do despachante não o enxerga: use DESPACHO_PROCESSOS=0)
+            opcoes["poolclass"] = StaticPool
+            return opcoes
+    else:
+        opcoes["pool_pre_ping"] = True
+    opcoes.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return opcoes
 
-ENGINE = create_engine("sqlite:///chatbot.db", echo=True)
+def _registrar_pragmas(engine_sync, url):
+    if url.get_backend_name() != "sqlite":
+        return
+    pragmas = dict(PRAGMAS_SQLITE)
+    if _em_memoria(url):
+        pragmas.pop("journal_mode")  # WAL não se aplica a bancos em memória
+
+    @event.listens_for(engine_sync, "connect")
+    def _aplicar(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        for nome, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nome}={valor}")
+        cursor.close()
+
+def criar_engine(url: str = None):
+    """
+    Engine síncrona a partir de DATABASE_URL (ou da url informada), com pool
+    e, no SQLite, os pragmas de PRAGMAS_SQLITE em cada conexão. O tempo de
+    cada comando SQL entra nas métricas (backend/metricas.py).
+    """
+    url = make_url(url or DATABASE_URL)
+    engine = create_engine(url, **_opcoes_engine(url))
+    _registrar_pragmas(engine, url)
+    instrumentar_engine(engine)
+    return engine
+
+def criar_engine_async(url: str = None):
+    """
+    Engine assíncrona para a mesma base (aiosqlite ou asyncpg, que só são
+    importados aqui). Os pragmas do SQLite são aplicados da mesma forma.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(url or DATABASE_URL)
+    driver = _DRIVERS_ASYNC.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Sem driver assíncrono configurado para {url.get_backend_name()}")
+    if url.drivername != driver:
+        url = url.set(drivername=driver)
+    opcoes = _opcoes_engine(url)
+    opcoes.pop("connect_args", None)  # check_same_thread não se aplica ao aiosqlite
+    engine = create_async_engine(url, **opcoes)
+    _registrar_pragmas(engine.sync_engine, url)
+    instrumentar_engine(engine.sync_engine)
+    return engine
+
+
+ENGINE = criar_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=ENGINE)
 
+_engine_async = None
+_sessao_async = None
+
+def AsyncSessionLocal():
+    """
+    Sessão assíncrona (AsyncSession), com a engine criada no primeiro uso:
+    `async with AsyncSessionLocal() as s: await s.execute(...)`.
+    """
+    global _engine_async, _sessao_async
+    if _sessao_async is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _engine_async = criar_engine_async()
+        _sessao_async = async_sessionmaker(_engine_async, autoflush=False, expire_on_commit=False)
+    return _sessao_async()
+
 Base = declarative_base()
 
 # -----------------------------
@@ -17,6 +134,8 @@ class Produto(Base):
     categoria = Column(String, nullable=False)
     preco = Column(Float, nullable=False)
 
+    __table_args__ = (Index("ix_produtos_categoria", "categoria"),)
+
     # Relacionamento com vendas
     vendas = relationship("Venda", back_populates="produto")
 
@@ -40,13 +159,102 @@ class Venda(Base):
     data_venda = Column(Date, nullable=False)
     preco_unit = Column(Float, nullable=False)
     valor_total = Column(Float, nullable=False)
+    # Ano e mês de data_venda, calculados na ingestão (evitam extrair a data em cada consulta)
+    ano = Column(Integer)
+    mes = Column(Integer)
 
     # Relacionamentos
     produto = relationship("Produto", back_populates="vendas")
     vendedor = relationship("Vendedor", back_populates="vendas")
 
+    # Índices de cobertura para os filtros por produto/vendedor (e período):
+    # o total de um id é lido só do índice, sem visitar a tabela
+    __table_args__ = (
+        Index("ix_vendas_produto_data", "id_produto", "data_venda", "valor_total"),
+        Index("ix_vendas_vendedor_data", "id_vendedor", "data_venda", "valor_total"),
+    )
+
+
+# -----------------------------
+# Rollups (mantidos pela carga em backend/rollups.py)
+# -----------------------------
+class VendaVendedorMes(Base):
+    __tablename__ = "rollup_vendedor_mes"
+    id_vendedor = Column(Integer, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    valor_total = Column(Float, nullable=False)
+    quantidade = Column(Integer, nullable=False)
+
+
+class VendaProdutoTrimestre(Base):
+    __tablename__ = "rollup_produto_trimestre"
+    id_produto = Column(Integer, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    trimestre = Column(Integer, primary_key=True)
+    valor_total = Column(Float, nullable=False)
+    quantidade = Column(Integer, nullable=False)
+
+
+class VendaRegiao(Base):
+    __tablename__ = "rollup_regiao"
+    regiao = Column(String, primary_key=True)
+    valor_total = Column(Float, nullable=False)
+
+
+class VersaoDados(Base):
+    """
+    Linha única com a versão atual dos dados de vendas.
+    Incrementada a cada carga para invalidar os caches que dependem dela.
+    """
+    __tablename__ = "versao_dados"
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class FonteCarregada(Base):
+    """
+    Arquivo de origem da última carga completa, para a partida do servidor
+    pular validação e seed quando os arquivos não mudaram (ver backend/inicializacao.py).
+    """
+    __tablename__ = "fontes_carregadas"
+    nome = Column(String, primary_key=True)  # produtos, vendedores, vendas
+    caminho = Column(String, nullable=False)
+    tamanho = Column(Integer, nullable=False)
+    modificado_ns = Column(Integer, nullable=False)
+    hash = Column(String, nullable=False)
+    carregada_em = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class VersaoSchema(Base):
+    """
+    Migrações já aplicadas ao banco (ver backend/migracoes.py).
+    """
+    __tablename__ = "versao_schema"
+    numero = Column(Integer, primary_key=True)
+    descricao = Column(String, nullable=False)
+    aplicada_em = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
 # -----------------------------
 # Função auxiliar para criar as tabelas
 # -----------------------------
 def init_db():
-    Base.metadata.create_all(bind=ENGINE)
+    # Import local: migracoes depende dos modelos deste módulo
+    from .migracoes import migrar
+    migrar()
+
+def incrementar_versao(conn):
+    """
+    Incrementa a versão dos dados usando a conexão ou sessão informada (sem commit),
+    para que faça parte da mesma transação da carga. Retorna a nova versão.
+    """
+    tabela = VersaoDados.__table__
+    atual = conn.execute(select(tabela.c.versao).where(tabela.c.id == 1)).scalar()
+    if atual is None:
+        conn.execute(insert(tabela).values(id=1, versao=1))
+        return 1
+    conn.execute(
+        update(tabela)
+        .where(tabela.c.id == 1)
+        .values(versao=atual + 1, atualizado_em=func.current_timestamp())
+    )
+    return atual + 1
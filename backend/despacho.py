@@ -0,0 +1,124 @@
+"""
+Execução das funções bloqueantes do serviço fora do event loop.
+
+- tipo "db": consultas ao banco/pandas, previsões e gráficos (que ficam em
+  cache por versão dos dados), num pool de threads limitado;
+- tipo "cpu": cálculo pesado que não reaproveita os caches do processo, num pool
+  de processos criado no primeiro uso (DESPACHO_PROCESSOS=0 roda esse tipo
+  também no pool de threads). Os processos partem frios (import do backend,
+  snapshot, caches): use-o só para trabalho que demora bem mais que isso.
+
+O pool de processos usa spawn: o processo filho importa de novo o módulo
+principal. Todo ponto de entrada que importa frontend.api/main e pode despachar
+para ele precisa do guarda `if __name__ == "__main__":`; sem ele o filho
+reexecuta o script e o pool falha com BrokenProcessPool. Com uvicorn
+(`uvicorn main:app`) isso já vale.
+
+Cada pool aceita no máximo DESPACHO_FILA_* chamadas pendentes (em execução + na fila);
+acima disso `executar` levanta `Sobrecarga` imediatamente, sem enfileirar.
+"""
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .metricas import acompanhada
+
+THREADS = int(os.getenv("DESPACHO_THREADS", "8"))
+PROCESSOS = int(os.getenv("DESPACHO_PROCESSOS", str(min(os.cpu_count() or 1, 4))))
+FILA_DB = int(os.getenv("DESPACHO_FILA_DB", str(THREADS * 8)))
+FILA_CPU = int(os.getenv("DESPACHO_FILA_CPU", str(max(PROCESSOS, 1) * 4)))
+TIMEOUT = float(os.getenv("DESPACHO_TIMEOUT", "30"))
+
+
+class Sobrecarga(Exception):
+    """Fila do pool cheia: a chamada não foi aceita."""
+
+
+class TempoEsgotado(Exception):
+    """A chamada não terminou dentro do timeout."""
+
+
+class Despachante:
+    def __init__(self, threads: int = THREADS, processos: int = PROCESSOS,
+                 fila_db: int = FILA_DB, fila_cpu: int = FILA_CPU, timeout: float = TIMEOUT):
+        self.threads = threads
+        self.processos = processos
+        self.timeout = timeout
+        self._limites = {"db": fila_db, "cpu": fila_cpu}
+        self._pendentes = {"db": 0, "cpu": 0}
+        self._lock = threading.Lock()
+        self._pool_threads = None
+        self._pool_processos = None
+
+    # -----------------------------
+    # Pools (criados no primeiro uso)
+    # -----------------------------
+    def _pool(self, tipo: str):
+        with self._lock:
+            if tipo == "cpu" and self.processos > 0:
+                if self._pool_processos is None:
+                    # spawn: o filho não herda conexões nem locks das threads do servidor
+                    self._pool_processos = ProcessPoolExecutor(
+                        max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+                    )
+                return self._pool_processos
+            if self._pool_threads is None:
+                self._pool_threads = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="despacho")
+            return self._pool_threads
+
+    def _reservar(self, tipo: str):
+        with self._lock:
+            if self._pendentes[tipo] >= self._limites[tipo]:
+                raise Sobrecarga(f"Fila '{tipo}' cheia ({self._limites[tipo]} chamadas pendentes)")
+            self._pendentes[tipo] += 1
+
+    def _liberar(self, tipo: str):
+        with self._lock:
+            self._pendentes[tipo] -= 1
+
+    def pendentes(self) -> dict:
+        with self._lock:
+            return dict(self._pendentes)
+
+    # -----------------------------
+    # Execução
+    # -----------------------------
+    async def executar(self, func, *args, tipo: str = "db", timeout: float = None, **kwargs):
+        """
+        Executa `func(*args, **kwargs)` no pool do tipo informado e aguarda o resultado
+        sem bloquear o event loop.
+        """
+        pool = self._pool(tipo)
+        self._reservar(tipo)
+        try:
+            if isinstance(pool, ThreadPoolExecutor):
+                # Propaga contextvars (métricas, request id) para a thread
+                chamada = functools.partial(contextvars.copy_context().run, acompanhada(func), *args, **kwargs)
+            else:
+                chamada = functools.partial(func, *args, **kwargs)
+            futuro = pool.submit(chamada)
+        except BaseException:
+            self._liberar(tipo)
+            raise
+        # A vaga só é liberada quando a função termina de fato (mesmo após timeout)
+        futuro.add_done_callback(lambda _: self._liberar(tipo))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futuro), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise TempoEsgotado(f"{getattr(func, '__name__', func)} excedeu {timeout or self.timeout:g}s")
+
+    def desligar(self):
+        with self._lock:
+            pools = [self._pool_threads, self._pool_processos]
+            self._pool_threads = self._pool_processos = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+
+despachante = Despachante()
@@ -0,0 +1,164 @@
+"""
+Tabela de fatos de vendas em formato compacto, sobre as colunas do snapshot.
+
+- colunas numéricas (ids, quantidade, valores) e chaves de data calculadas uma
+  vez na publicação: dia (desde 1970), ano, mes e trimestre;
+- produtos e vendedores como dimensões: ids ordenados, nomes, grupo codificado
+  (categoria/regiao) e um índice id → linhas das vendas.
+
+O índice de cada dimensão segue o formato CSR: `ordem` tem as linhas das vendas
+agrupadas por membro (na ordem original dentro do grupo) e as vendas do membro i
+são `ordem[inicio[i]:inicio[i + 1]]`. Filtrar por produto ou vendedor é um
+fatiamento, sem máscara sobre a tabela inteira. Vendas com id fora do cadastro
+(que a validação já remove) ficam num grupo extra, no fim, e não aparecem nas
+consultas por id.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def _tipo_posicao(n: int) -> np.dtype:
+    return np.dtype(np.int32) if n < 2**31 else np.dtype(np.int64)
+
+def indexar(ids_dimensao: np.ndarray, ids_fatos: np.ndarray):
+    """
+    Índice de uma dimensão (ids em ordem crescente) sobre a coluna de ids das vendas.
+    Retorna (linha, ordem, inicio):
+    - linha: posição na dimensão de cada venda (len(ids_dimensao) se o id não existe);
+    - ordem, inicio: ver o docstring do módulo (len(inicio) = len(ids_dimensao) + 2).
+    """
+    n = len(ids_dimensao)
+    posicao = np.searchsorted(ids_dimensao, ids_fatos)
+    if n:
+        existe = ids_dimensao[np.minimum(posicao, n - 1)] == ids_fatos
+    else:
+        existe = np.zeros(len(ids_fatos), dtype=bool)
+    linha = np.where(existe, posicao, n).astype(_tipo_posicao(n + 1))
+    ordem = np.argsort(linha, kind="stable").astype(_tipo_posicao(len(ids_fatos)))
+    inicio = np.zeros(n + 2, dtype=np.int64)
+    np.cumsum(np.bincount(linha, minlength=n + 1), out=inicio[1:])
+    return linha, ordem, inicio
+
+
+# -----------------------------
+# Dimensões
+# -----------------------------
+@dataclass(frozen=True)
+class Dimensao:
+    ids: np.ndarray           # em ordem crescente
+    nomes: np.ndarray         # object
+    grupos: pd.Categorical    # categoria (produtos) ou regiao (vendedores)
+    linha: np.ndarray         # posição na dimensão de cada venda
+    ordem: np.ndarray
+    inicio: np.ndarray
+
+    def __len__(self):
+        return len(self.ids)
+
+    def posicao(self, id_):
+        """
+        Posição do id na dimensão, ou None.
+        """
+        i = int(np.searchsorted(self.ids, id_))
+        return i if i < len(self.ids) and self.ids[i] == id_ else None
+
+    def posicoes(self, ids) -> np.ndarray:
+        """
+        Posições dos ids (len(self) para os que não existem).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(ids), dtype=np.int64)
+        i = np.searchsorted(self.ids, ids)
+        existe = self.ids[np.minimum(i, len(self.ids) - 1)] == ids
+        return np.where(existe, i, len(self.ids))
+
+    def vendas(self, id_) -> np.ndarray:
+        """
+        Linhas das vendas do membro (fatia do índice, sem cópia).
+        """
+        i = self.posicao(id_)
+        if i is None:
+            return self.ordem[:0]
+        return self.ordem[self.inicio[i]:self.inicio[i + 1]]
+
+    def vendas_de(self, ids) -> np.ndarray:
+        """
+        Linhas das vendas de vários membros (ids repetidos contam uma vez).
+        """
+        posicoes = np.unique(self.posicoes(ids))
+        posicoes = posicoes[posicoes < len(self.ids)]
+        if not len(posicoes):
+            return self.ordem[:0]
+        return np.concatenate([self.ordem[self.inicio[i]:self.inicio[i + 1]] for i in posicoes])
+
+    def nome(self, id_, padrao=None):
+        i = self.posicao(id_)
+        return padrao if i is None else self.nomes[i]
+
+    def nomes_de(self, ids) -> np.ndarray:
+        nomes = np.append(self.nomes, None)
+        return nomes[self.posicoes(ids)]
+
+    def grupo(self, id_, padrao=None):
+        i = self.posicao(id_)
+        return padrao if i is None else self.grupos[i]
+
+    def somar(self, valores: np.ndarray) -> np.ndarray:
+        """
+        Soma de `valores` (uma coluna das vendas) por membro, na ordem da dimensão.
+        """
+        return np.bincount(self.linha, weights=valores, minlength=len(self.ids) + 1)[:-1]
+
+    def somar_por_grupo(self, valores: np.ndarray, sem_grupo: str) -> pd.Series:
+        """
+        Soma de `valores` por grupo (categoria/regiao), só dos grupos com vendas.
+        Membros sem grupo e vendas órfãs caem em `sem_grupo`.
+        """
+        rotulos = list(self.grupos.categories) + [sem_grupo]
+        codigos = np.append(self.grupos.codes, -1)
+        codigos = np.where(codigos < 0, len(rotulos) - 1, codigos)
+        por_membro = np.bincount(self.linha, weights=valores, minlength=len(self.ids) + 1)
+        vendas_por_membro = np.diff(self.inicio)
+        totais = np.bincount(codigos, weights=por_membro, minlength=len(rotulos))
+        com_vendas = np.bincount(codigos, weights=vendas_por_membro, minlength=len(rotulos)) > 0
+        return pd.Series(totais, index=rotulos)[com_vendas]
+
+    def bytes(self) -> int:
+        return sum(a.nbytes for a in (self.ids, self.nomes, self.grupos.codes, self.linha, self.ordem, self.inicio))
+
+
+# -----------------------------
+# Tabela de fatos
+# -----------------------------
+@dataclass(frozen=True)
+class TabelaFatos:
+    colunas: dict             # nome -> ndarray, uma posição por venda
+    produtos: Dimensao
+    vendedores: Dimensao
+
+    def __len__(self):
+        return len(self.colunas["id_venda"])
+
+    def __getitem__(self, coluna: str) -> np.ndarray:
+        return self.colunas[coluna]
+
+    def agrupar(self, chaves: list, valor: str, linhas: np.ndarray = None) -> pd.DataFrame:
+        """
+        Soma de `valor` por `chaves` (colunas inteiras), nas `linhas` informadas
+        ou na tabela toda. Retorna um DataFrame ordenado pelas chaves.
+        """
+        nomes = list(chaves) + [valor]
+        if linhas is None:
+            df = pd.DataFrame({c: self.colunas[c] for c in nomes}, copy=False)
+        else:
+            df = pd.DataFrame({c: self.colunas[c][linhas] for c in nomes})
+        return df.groupby(chaves, as_index=False)[valor].sum()
+
+    def bytes(self) -> int:
+        """
+        Memória ocupada pelas colunas e índices (sem contar os textos dos nomes).
+        """
+        return sum(a.nbytes for a in self.colunas.values()) + self.produtos.bytes() + self.vendedores.bytes()
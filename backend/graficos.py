@@ -0,0 +1,160 @@
+"""
+Gráficos de previsão renderizados com a API orientada a objetos do matplotlib
+(Figure + FigureCanvasAgg, sem o estado global do pyplot).
+
+Cada gráfico é identificado por (produto, impressão dos dados): a versão com o
+hash do conteúdo (snapshot.impressao_atual), que não se repete quando o banco é
+recriado. A chave tem 24 dígitos hexadecimais: 12 da impressão e 12 do par
+(produto, impressão). O PNG é gravado em GRAFICOS_DIR/<chave>.png (escrita
+atômica), o que permite compartilhá-lo entre processos. Os bytes mais usados
+ficam num LRU em memória.
+
+Ao gravar o primeiro gráfico de uma impressão, os PNGs das impressões antigas
+são apagados; ficam os das GRAFICOS_VERSOES_MANTIDAS mais recentes.
+"""
+import glob
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from .metricas import medido
+
+DIRETORIO = os.getenv("GRAFICOS_DIR", "static/graficos")
+TAMANHO_LRU = int(os.getenv("GRAFICOS_LRU", "128"))
+VERSOES_MANTIDAS = int(os.getenv("GRAFICOS_VERSOES_MANTIDAS", "2"))
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_impressoes_podadas = set()
+
+
+def _prefixo(versao: str) -> str:
+    return hashlib.sha256(f"versao:{versao}".encode()).hexdigest()[:12]
+
+def chave_previsao(id_produto: int, versao: str) -> str:
+    produto = hashlib.sha256(f"previsao-produto:{id_produto}:{versao}".encode()).hexdigest()[:12]
+    return _prefixo(versao) + produto
+
+def _caminho(chave: str) -> str:
+    return os.path.join(DIRETORIO, f"{chave}.png")
+
+def _guardar_lru(chave: str, png: bytes):
+    with _lock:
+        _lru[chave] = png
+        _lru.move_to_end(chave)
+        while len(_lru) > TAMANHO_LRU:
+            _lru.popitem(last=False)
+
+
+# -----------------------------
+# Leitura
+# -----------------------------
+def obter_png(chave: str):
+    """
+    Bytes do gráfico (LRU em memória, depois disco) ou None se não existir.
+    """
+    with _lock:
+        png = _lru.get(chave)
+        if png is not None:
+            _lru.move_to_end(chave)
+            return png
+    caminho = _caminho(chave)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, "rb") as f:
+        png = f.read()
+    _guardar_lru(chave, png)
+    return png
+
+def existe(chave: str) -> bool:
+    with _lock:
+        if chave in _lru:
+            return True
+    return os.path.exists(_caminho(chave))
+
+
+# -----------------------------
+# Limpeza
+# -----------------------------
+def _remover_antigos(prefixo: str):
+    """
+    Apaga os PNGs das impressões antigas, mantendo a atual e as mais recentes
+    (pela data do último gráfico gravado) até VERSOES_MANTIDAS.
+    """
+    recentes = {}
+    for caminho in glob.glob(os.path.join(DIRETORIO, "*.png")):
+        p = os.path.basename(caminho)[:12]
+        try:
+            recentes[p] = max(recentes.get(p, 0.0), os.path.getmtime(caminho))
+        except FileNotFoundError:
+            continue
+    outros = sorted((p for p in recentes if p != prefixo), key=recentes.get, reverse=True)
+    remover = set(outros[max(VERSOES_MANTIDAS - 1, 0):])
+    if not remover:
+        return
+
+    removidos = 0
+    for caminho in glob.glob(os.path.join(DIRETORIO, "*.png")):
+        if os.path.basename(caminho)[:12] in remover:
+            try:
+                os.remove(caminho)
+                removidos += 1
+            except FileNotFoundError:
+                pass  # outro processo já apagou
+    with _lock:
+        for chave in [c for c in _lru if c[:12] in remover]:
+            del _lru[chave]
+    print(f"🧹 {removidos} gráfico(s) de versões antigas removido(s) de {DIRETORIO}")
+
+
+# -----------------------------
+# Renderização
+# -----------------------------
+@medido("graficos.renderizar")
+def renderizar_previsao(id_produto: int, historico, previsao: float) -> bytes:
+    # Import local: o matplotlib só é carregado quando um gráfico é de fato gerado
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(range(len(historico)), historico, marker='o', label='Histórico')
+    ax.plot([len(historico)], [previsao], marker='x', color='red', label='Previsto')
+    ax.set_xlabel('Trimestre')
+    ax.set_ylabel('Vendas (R$)')
+    ax.set_title(f'Projeção Produto {id_produto}')
+    ax.legend()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+def grafico_previsao(id_produto: int, versao: str, historico, previsao: float) -> str:
+    """
+    Garante que o gráfico de previsão do produto na versão de dados exista e
+    retorna sua chave. Só renderiza se ainda não houver um para essa versão.
+    `versao` deve incluir a impressão do conteúdo (snapshot.impressao_atual).
+    """
+    chave = chave_previsao(id_produto, versao)
+    if existe(chave):
+        return chave
+
+    png = renderizar_previsao(id_produto, historico, previsao)
+    os.makedirs(DIRETORIO, exist_ok=True)
+    temporario = f"{_caminho(chave)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(png)
+    os.replace(temporario, _caminho(chave))
+    _guardar_lru(chave, png)
+
+    prefixo = chave[:12]
+    if prefixo not in _impressoes_podadas:
+        _impressoes_podadas.add(prefixo)
+        _remover_antigos(prefixo)
+    return chave
+
+def url(chave: str) -> str:
+    return f"/api/graficos/{chave}.png"
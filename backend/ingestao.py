@@ -0,0 +1,353 @@
+"""
+Pipeline de ingestão: leitura -> renomeação para o esquema ORM -> validação/limpeza -> carga.
+Os DataFrames limpos passam direto da validação para o banco, sem arquivos intermediários.
+
+Na carga de um banco vazio, arquivos de vendas com VALIDACAO_EM_BLOCOS_MB ou mais
+são validados e gravados bloco a bloco (data_test/valida_em_blocos.py): a memória
+fica limitada pelo tamanho do bloco. A ingestão incremental e a validação sem
+carga (`carregar_banco=False`) ainda montam o DataFrame de vendas inteiro.
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+
+from data_test.valida_dados import ARQUIVOS, LIMITE_EM_BLOCOS_MB, imprimir_log, limpar_dados, verificar_arquivos
+from data_test.valida_em_blocos import RelatorioValidacao, limpar_dimensoes, validar_vendas_em_blocos
+from . import snapshot
+from .cache_fontes import hash_arquivo, ler_fonte
+from .database import ENGINE, FonteCarregada, Produto, Vendedor, Venda, incrementar_versao
+from .migracoes import migrar
+from .rollups import atualizar_rollups
+from .seed import (
+    TAMANHO_LOTE, _inserir_em_lotes, carregar_em_blocos, com_periodo, garantir_rollups, renomear_colunas, seed_db_from_files,
+)
+
+
+@dataclass
+class ResultadoIngestao:
+    ok: bool
+    frames: dict = field(default_factory=dict)
+    etapas: list = field(default_factory=list)
+    log: list = field(default_factory=list)
+    erros: list = field(default_factory=list)
+    arquivos: list = field(default_factory=list)  # por arquivo, na ingestão paralela
+
+
+# -----------------------------
+# Etapas
+# -----------------------------
+def ler(arquivos: dict = ARQUIVOS) -> dict:
+    return {nome: ler_fonte(path) for nome, path in arquivos.items()}
+
+def renomear(frames: dict) -> dict:
+    return renomear_colunas(frames)
+
+def validar(frames: dict):
+    return limpar_dados(frames)
+
+def carregar(frames: dict):
+    seed_db_from_files(frames)
+    return frames
+
+
+# -----------------------------
+# Ingestão incremental
+# -----------------------------
+def calcular_delta(frames: dict, por_hash: bool = False) -> dict:
+    """
+    Compara os frames validados com o banco e retorna só o que precisa ser gravado:
+    - produtos/vendedores novos ou alterados (comparação por hash da linha);
+    - vendas com id_venda acima da maior já gravada (marca d'água) e,
+      com `por_hash=True`, também vendas antigas cujo conteúdo mudou.
+    As vendas alteradas ficam em "vendas_alteradas".
+    """
+    with ENGINE.connect() as conn:
+        delta = {
+            "produtos": _linhas_alteradas(conn, Produto, frames["produtos"]),
+            "vendedores": _linhas_alteradas(conn, Vendedor, frames["vendedores"]),
+        }
+        marca = conn.execute(select(func.max(Venda.id_venda))).scalar() or 0
+        df_vendas = frames["vendas"]
+        delta["vendas"] = df_vendas[df_vendas["id_venda"] > marca]
+        if por_hash:
+            delta["vendas_alteradas"] = _linhas_alteradas(conn, Venda, df_vendas[df_vendas["id_venda"] <= marca])
+        else:
+            delta["vendas_alteradas"] = df_vendas.iloc[0:0]
+    return delta
+
+def _linhas_alteradas(conn, modelo, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Linhas de `df` que não existem no banco ou que diferem da versão gravada.
+    """
+    tabela = modelo.__table__
+    chave = tabela.primary_key.columns.values()[0].name
+    colunas = [c.name for c in tabela.columns if c.name in df.columns]
+
+    atuais = pd.read_sql(select(*[tabela.c[c] for c in colunas]), conn)
+    if atuais.empty:
+        return df
+    novos = _normalizar_para_hash(df[colunas])
+    atuais = _normalizar_para_hash(atuais)
+    hash_novos = pd.util.hash_pandas_object(novos, index=False)
+    hash_atuais = pd.Series(
+        pd.util.hash_pandas_object(atuais, index=False).values, index=atuais[chave].values
+    )
+    anteriores = df[chave].map(hash_atuais)
+    return df[anteriores.isna().values | (anteriores.values != hash_novos.values)]
+
+def _normalizar_para_hash(df: pd.DataFrame) -> pd.DataFrame:
+    # Mesmos tipos dos dois lados (arquivo x banco) para o hash ser comparável
+    df = df.copy()
+    for col in df.columns:
+        if col == "data_venda":
+            df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d")
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(float).round(6)
+        else:
+            df[col] = df[col].astype(str)
+    return df
+
+def _upsert(conn, modelo, df: pd.DataFrame, tamanho_lote: int = TAMANHO_LOTE):
+    """
+    Insere ou atualiza (pela chave primária) as linhas do DataFrame.
+    Usa INSERT ... ON CONFLICT no SQLite/PostgreSQL e merge do ORM nos demais bancos.
+    """
+    if df.empty:
+        return 0
+    tabela = modelo.__table__
+    chave = tabela.primary_key.columns.values()[0].name
+    colunas = [c.name for c in tabela.columns if c.name in df.columns]
+    df = df[colunas].copy()
+    if "data_venda" in df.columns:
+        df["data_venda"] = pd.to_datetime(df["data_venda"]).dt.date
+    registros = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+    if conn.dialect.name in ("sqlite", "postgresql"):
+        if conn.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(tabela)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[chave],
+            set_={c: stmt.excluded[c] for c in colunas if c != chave},
+        )
+        for pos in range(0, len(registros), tamanho_lote):
+            conn.execute(stmt, registros[pos:pos + tamanho_lote])
+    else:
+        from sqlalchemy.orm import Session
+        with Session(bind=conn) as s:
+            for registro in registros:
+                s.merge(modelo(**registro))
+            s.flush()
+    return len(registros)
+
+def aplicar_delta(delta: dict) -> dict:
+    """
+    Grava o delta numa única transação e incrementa a versão dos dados.
+    Retorna as contagens gravadas por tabela. Reaplicar um delta já gravado não
+    muda os dados: as vendas novas são conferidas de novo contra a marca d'água.
+    """
+    migrar()
+    with ENGINE.begin() as conn:
+        marca = conn.execute(select(func.max(Venda.id_venda))).scalar() or 0
+        delta = dict(delta, vendas=delta["vendas"][delta["vendas"]["id_venda"] > marca])
+        gravados = {
+            "produtos": _upsert(conn, Produto, delta["produtos"]),
+            "vendedores": _upsert(conn, Vendedor, delta["vendedores"]),
+            "vendas": _inserir_em_lotes(conn, Venda, com_periodo(delta["vendas"]), TAMANHO_LOTE) if len(delta["vendas"]) else 0,
+            "vendas_alteradas": _upsert(conn, Venda, com_periodo(delta["vendas_alteradas"])),
+        }
+        if gravados["vendas_alteradas"]:
+            # Venda alterada pode ter trocado de produto/vendedor: recalcula tudo
+            atualizar_rollups(conn)
+        elif gravados["vendas"] or gravados["vendedores"]:
+            atualizar_rollups(
+                conn,
+                ids_vendedor=delta["vendas"]["id_vendedor"].unique(),
+                ids_produto=delta["vendas"]["id_produto"].unique(),
+            )
+        if any(gravados.values()):
+            incrementar_versao(conn)
+
+    if any(gravados.values()):
+        snapshot.invalidar()
+    return gravados
+
+
+# -----------------------------
+# Fontes da última carga
+# -----------------------------
+def banco_vazio() -> bool:
+    with ENGINE.connect() as conn:
+        return conn.execute(select(Produto.id_produto).limit(1)).first() is None
+
+def fontes_inalteradas(arquivos: dict = ARQUIVOS) -> bool:
+    """
+    True se os arquivos são os mesmos registrados na última carga: mesmo tamanho
+    e data de modificação, ou (se só a data mudou) o mesmo hash do conteúdo.
+    """
+    with ENGINE.connect() as conn:
+        registradas = {f.nome: f for f in conn.execute(select(FonteCarregada)).all()}
+    for nome, path in arquivos.items():
+        fonte = registradas.get(nome)
+        if fonte is None or os.path.abspath(fonte.caminho) != os.path.abspath(path) or not os.path.exists(path):
+            return False
+        info = os.stat(path)
+        if info.st_size != fonte.tamanho:
+            return False
+        if info.st_mtime_ns != fonte.modificado_ns and hash_arquivo(path) != fonte.hash:
+            return False
+    return len(registradas) == len(arquivos)
+
+def registrar_fontes(arquivos: dict = ARQUIVOS):
+    """
+    Grava os arquivos cujo conteúdo está agora no banco.
+    """
+    linhas = []
+    for nome, path in arquivos.items():
+        info = os.stat(path)
+        linhas.append({"nome": nome, "caminho": path, "tamanho": info.st_size,
+                       "modificado_ns": info.st_mtime_ns, "hash": hash_arquivo(path)})
+    with ENGINE.begin() as conn:
+        conn.execute(delete(FonteCarregada))
+        conn.execute(insert(FonteCarregada), linhas)
+
+
+# -----------------------------
+# Pipeline
+# -----------------------------
+def _medir(resultado: ResultadoIngestao, nome: str, func, *args):
+    """
+    Executa uma etapa, registrando duração e número de linhas por tabela.
+    """
+    inicio = time.perf_counter()
+    saida = func(*args)
+    duracao = time.perf_counter() - inicio
+
+    frames = saida[0] if isinstance(saida, tuple) else saida
+    linhas = {tabela: len(df) for tabela, df in frames.items()}
+    resultado.etapas.append({"etapa": nome, "segundos": round(duracao, 4), "linhas": linhas})
+    print(f"   {nome}: {duracao:.2f}s " + " ".join(f"{t}={n}" for t, n in linhas.items()))
+    return saida
+
+
+def _vendas_conferidas(blocos, relatorio: RelatorioValidacao):
+    # Erro de validação no meio do arquivo: a exceção desfaz a carga dos blocos anteriores
+    yield from blocos
+    if relatorio.erros:
+        raise ValueError("; ".join(relatorio.erros))
+
+def _carregar_em_blocos(resultado: ResultadoIngestao, arquivos: dict, gravar: bool) -> ResultadoIngestao:
+    """
+    Valida as vendas bloco a bloco e, com `gravar`, carrega-as numa única
+    transação (banco vazio). `resultado.frames` fica só com produtos e vendedores.
+    """
+    inicio = time.perf_counter()
+    dimensoes, resultado.log, resultado.erros = limpar_dimensoes(arquivos)
+    resultado.etapas.append({"etapa": "cadastros", "segundos": round(time.perf_counter() - inicio, 4),
+                             "linhas": {t: len(df) for t, df in dimensoes.items()}})
+    if resultado.erros:
+        imprimir_log(resultado.log, resultado.erros)
+        return resultado
+
+    inicio = time.perf_counter()
+    relatorio = RelatorioValidacao(arquivos["vendas"])
+    blocos = validar_vendas_em_blocos(arquivos["vendas"], set(dimensoes["produtos"]["id_produto"]),
+                                      set(dimensoes["vendedores"]["id_vendedor"]), relatorio=relatorio)
+    try:
+        if gravar:
+            carregar_em_blocos(dimensoes["produtos"], dimensoes["vendedores"], _vendas_conferidas(blocos, relatorio))
+        else:
+            for _ in _vendas_conferidas(blocos, relatorio):
+                pass
+            garantir_rollups()
+    except ValueError:
+        pass  # os erros estão no relatório
+    resultado.etapas.append({"etapa": "validacao_e_carga", "segundos": round(time.perf_counter() - inicio, 4),
+                             "linhas": {"vendas": relatorio.linhas_validas, "blocos": relatorio.blocos}})
+
+    resultado.log += relatorio.log()
+    resultado.erros += relatorio.erros
+    resultado.ok = imprimir_log(resultado.log, resultado.erros)
+    resultado.frames = dimensoes
+    if resultado.ok and gravar:
+        registrar_fontes(arquivos)
+    return resultado
+
+def executar_pipeline(arquivos: dict = ARQUIVOS, carregar_banco: bool = True, em_blocos: bool = None) -> ResultadoIngestao:
+    """
+    Executa a ingestão completa em uma passada. Com `carregar_banco=False`
+    apenas valida. Os frames limpos ficam em `resultado.frames`.
+    Com o banco vazio e vendas grandes (ou `em_blocos=True`), as vendas são
+    validadas e gravadas em blocos e não ficam em `resultado.frames`.
+    """
+    resultado = ResultadoIngestao(ok=False)
+
+    resultado.erros = verificar_arquivos(arquivos)
+    if resultado.erros:
+        imprimir_log(resultado.log, resultado.erros)
+        return resultado
+
+    if em_blocos is None:
+        em_blocos = os.path.getsize(arquivos["vendas"]) >= LIMITE_EM_BLOCOS_MB * 2**20
+    if carregar_banco and em_blocos:
+        migrar()
+        # O seed só carrega banco vazio: com dados, as vendas só são validadas
+        return _carregar_em_blocos(resultado, arquivos, gravar=banco_vazio())
+
+    frames = _medir(resultado, "leitura", ler, arquivos)
+    frames = _medir(resultado, "renomeacao", renomear, frames)
+    frames, resultado.log, resultado.erros = _medir(resultado, "validacao", validar, frames)
+
+    resultado.ok = imprimir_log(resultado.log, resultado.erros)
+    if not resultado.ok:
+        return resultado
+
+    resultado.frames = frames
+    if carregar_banco:
+        migrar()
+        vazio = banco_vazio()
+        _medir(resultado, "carga", carregar, frames)
+        if vazio:  # o seed só carrega banco vazio
+            registrar_fontes(arquivos)
+    return resultado
+
+def ingerir_incremental(arquivos: dict = ARQUIVOS, por_hash: bool = False) -> ResultadoIngestao:
+    """
+    Lê e valida os arquivos como o pipeline completo, mas grava apenas o que mudou
+    em relação ao banco (ver `calcular_delta`), sem recriar nada.
+    """
+    resultado = executar_pipeline(arquivos, carregar_banco=False)
+    if not resultado.ok:
+        return resultado
+
+    delta = _medir(resultado, "delta", calcular_delta, resultado.frames, por_hash)
+
+    inicio = time.perf_counter()
+    gravados = aplicar_delta(delta)
+    duracao = time.perf_counter() - inicio
+    resultado.etapas.append({"etapa": "upsert", "segundos": round(duracao, 4), "linhas": gravados})
+    print(f"   upsert: {duracao:.2f}s " + " ".join(f"{t}={n}" for t, n in gravados.items()))
+    registrar_fontes(arquivos)
+    return resultado
+
+
+# -----------------------------
+# Linha de comando
+# -----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão dos arquivos de data/ no banco")
+    parser.add_argument("--incremental", action="store_true", help="grava só produtos/vendedores/vendas novos ou alterados")
+    parser.add_argument("--hash", action="store_true", help="no modo incremental, compara também o conteúdo das vendas já gravadas")
+    args = parser.parse_args()
+
+    if args.incremental:
+        resultado = ingerir_incremental(por_hash=args.hash)
+    else:
+        resultado = executar_pipeline()
+    raise SystemExit(0 if resultado.ok else 1)
@@ -0,0 +1,279 @@
+"""
+Ingestão de vários arquivos de origem em paralelo (ex.: vendas divididas em
+arquivos mensais).
+
+Os arquivos vêm de um diretório ou de um glob e são classificados pelo prefixo do
+nome (produtos*, vendedores*, vendas*; .xlsx ou .csv, ignorando *_limpo*). A
+leitura do Excel é o que mais pesa, então cada arquivo é lido num processo do pool:
+1. cadastros: produtos e vendedores lidos em paralelo, unidos e limpos (limpar_dados);
+2. vendas: cada arquivo é lido e validado no seu processo contra os ids dos
+   cadastros (tipos, valores ausentes, integridade, duplicidades dentro do arquivo);
+   vendas com quantidade ou preço <= 0 só são marcadas;
+3. consolidação: as partições são unidas na ordem dos nomes dos arquivos, as
+   duplicidades entre arquivos removidas (a primeira fica) e as vendas marcadas
+   descartadas, o mesmo resultado de limpar_dados sobre o arquivo único;
+4. carga em lote (seed) ou incremental (delta + upsert).
+
+Cada arquivo tem seu tempo, linhas e erro em `resultado.arquivos`.
+
+Uso:
+    python -m backend.ingestao_paralela --origem data/ --processos 4
+    python -m backend.ingestao_paralela --origem "dados/vendas_2024_*.xlsx" --origem data/ --incremental
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_test.valida_dados import (
+    COLUNAS_CRITICAS, converter_tipos_vendas, imprimir_log, limpar_dados, mascara_invalidas,
+)
+from .cache_fontes import ler_fonte
+from .ingestao import ResultadoIngestao, aplicar_delta, banco_vazio, calcular_delta, registrar_fontes
+from .migracoes import migrar
+from .seed import COLUNAS_PRODUTOS, COLUNAS_VENDAS, COLUNAS_VENDEDORES, seed_db_from_files
+
+PROCESSOS = int(os.getenv("INGESTAO_PROCESSOS", str(os.cpu_count() or 1)))
+
+TABELAS = ("produtos", "vendedores", "vendas")
+_COLUNAS = {"produtos": COLUNAS_PRODUTOS, "vendedores": COLUNAS_VENDEDORES, "vendas": COLUNAS_VENDAS}
+
+
+# -----------------------------
+# Descoberta dos arquivos
+# -----------------------------
+def descobrir_fontes(*origens: str) -> dict:
+    """
+    {"produtos": [...], "vendedores": [...], "vendas": [...]} com os arquivos
+    dos diretórios ou globs informados, em ordem de nome.
+    """
+    caminhos = set()
+    for origem in origens:
+        caminhos.update(glob.glob(os.path.join(origem, "*")) if os.path.isdir(origem) else glob.glob(origem))
+
+    fontes = {tabela: [] for tabela in TABELAS}
+    for path in sorted(caminhos, key=lambda p: (os.path.basename(p), p)):
+        nome = os.path.basename(path).lower()
+        if not nome.endswith((".xlsx", ".csv")) or "_limpo" in nome:
+            continue
+        for tabela in TABELAS:
+            if nome.startswith(tabela):
+                fontes[tabela].append(path)
+                break
+    return fontes
+
+
+def _chaves_fontes(fontes: dict) -> dict:
+    """
+    {nome: caminho} para registrar_fontes. Com um arquivo por tabela os nomes são
+    os de ARQUIVOS ("produtos", "vendedores", "vendas"), os mesmos que a
+    verificação da partida (inicializacao) confere; com partições, "<tabela>/<arquivo>".
+    """
+    chaves = {}
+    for tabela, paths in fontes.items():
+        if len(paths) == 1:
+            chaves[tabela] = paths[0]
+        else:
+            chaves.update({f"{tabela}/{os.path.basename(path)}": path for path in paths})
+    return chaves
+
+
+# -----------------------------
+# Tarefas do pool (funções de módulo: o pool usa spawn)
+# -----------------------------
+def _ler_particao(tabela: str, path: str):
+    """
+    Lê um arquivo de cadastro. Retorna (DataFrame ou None, relatório do arquivo).
+    """
+    inicio = time.perf_counter()
+    relatorio = {"arquivo": path, "tabela": tabela, "processo": os.getpid(), "erro": None}
+    df = None
+    try:
+        df = ler_fonte(path).rename(columns=_COLUNAS[tabela])
+        relatorio["linhas"] = len(df)
+    except Exception as e:
+        relatorio["erro"] = f"{type(e).__name__}: {e}"
+    relatorio["segundos"] = round(time.perf_counter() - inicio, 4)
+    return df, relatorio
+
+def _validar_particao_vendas(path: str, ids_produtos: set, ids_vendedores: set):
+    """
+    Lê e valida um arquivo de vendas. Retorna (DataFrame ou None, relatório do arquivo);
+    o DataFrame tem a coluna "_invalida" (quantidade ou preço <= 0).
+    """
+    df, relatorio = _ler_particao("vendas", path)
+    if df is None:
+        return None, relatorio
+    inicio = time.perf_counter()
+    try:
+        faltando = sorted(set(COLUNAS_CRITICAS["vendas"]) - set(df.columns))
+        if faltando:
+            raise ValueError(f"colunas ausentes {faltando}")
+        converter_tipos_vendas(df)
+
+        ausentes = df[COLUNAS_CRITICAS["vendas"]].isna().any(axis=1)
+        df = df[~ausentes].astype({"quantidade": int})
+        orfas = ~(df["id_produto"].isin(ids_produtos) & df["id_vendedor"].isin(ids_vendedores))
+        df = df[~orfas]
+        duplicadas = df["id_venda"].duplicated()
+        df = df[~duplicadas].assign(_invalida=lambda d: mascara_invalidas(d))
+        relatorio["removidas"] = {"valor_ausente": int(ausentes.sum()), "referencia_inexistente": int(orfas.sum()),
+                                  "duplicada": int(duplicadas.sum())}
+        relatorio["linhas_validas"] = len(df)
+    except Exception as e:
+        relatorio["erro"] = f"{type(e).__name__}: {e}"
+        df = None
+    relatorio["segundos"] = round(relatorio["segundos"] + time.perf_counter() - inicio, 4)
+    return df, relatorio
+
+
+def _mapear(pool, func, tarefas: list, arquivos: list):
+    """
+    Executa `func(*tarefa)` para cada tarefa (no pool ou, sem pool, aqui mesmo),
+    devolvendo os resultados na ordem das tarefas. No pool, os maiores arquivos
+    são enviados primeiro, para nenhum processo ficar com o maior no fim.
+    """
+    if pool is None:
+        return [func(*tarefa) for tarefa in tarefas]
+    ordem = sorted(range(len(tarefas)), key=lambda i: -os.path.getsize(arquivos[i]))
+    futuros = {i: pool.submit(func, *tarefas[i]) for i in ordem}
+    return [futuros[i].result() for i in range(len(tarefas))]
+
+
+# -----------------------------
+# Pipeline
+# -----------------------------
+def _etapa(resultado: ResultadoIngestao, nome: str, inicio: float, linhas: dict):
+    duracao = time.perf_counter() - inicio
+    resultado.etapas.append({"etapa": nome, "segundos": round(duracao, 4), "linhas": linhas})
+    print(f"   {nome}: {duracao:.2f}s " + " ".join(f"{t}={n}" for t, n in linhas.items()))
+
+def _erros_dos_arquivos(relatorios: list) -> list:
+    return [f"{r['arquivo']}: {r['erro']}" for r in relatorios if r["erro"]]
+
+def _consolidar_vendas(partes: list):
+    """
+    Une as partições validadas e remove as duplicidades entre arquivos e as vendas
+    marcadas como inválidas. Retorna (vendas, n_duplicadas, n_invalidas).
+    """
+    vendas = pd.concat(partes, ignore_index=True)
+    duplicadas = vendas["id_venda"].duplicated()
+    vendas = vendas[~duplicadas]
+    invalidas = vendas.pop("_invalida")
+    vendas = vendas[~invalidas]
+    return vendas, int(duplicadas.sum()), int(invalidas.sum())
+
+def ingerir_arquivos(*origens: str, processos: int = PROCESSOS, carregar_banco: bool = True,
+                     incremental: bool = False) -> ResultadoIngestao:
+    """
+    Lê, valida e consolida os arquivos encontrados em `origens` (diretórios ou globs)
+    usando até `processos` processos (0 ou 1: tudo neste processo) e carrega o resultado:
+    seed em banco vazio ou, com `incremental=True`, só o que mudou.
+    """
+    resultado = ResultadoIngestao(ok=False)
+    fontes = descobrir_fontes(*origens)
+    resultado.erros = [f"Nenhum arquivo de {tabela} em {', '.join(origens)}" for tabela, lista in fontes.items() if not lista]
+    if resultado.erros:
+        imprimir_log(resultado.log, resultado.erros)
+        return resultado
+
+    n_arquivos = sum(len(lista) for lista in fontes.values())
+    processos = min(processos, n_arquivos)
+    pool = None
+    if processos > 1:  # com um processo só, subir o pool só custaria a partida dele
+        # spawn: como no despachante, o filho não herda conexões nem locks
+        pool = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        # 1. Cadastros
+        inicio = time.perf_counter()
+        tarefas = [(tabela, path) for tabela in ("produtos", "vendedores") for path in fontes[tabela]]
+        lidos = _mapear(pool, _ler_particao, tarefas, [path for _, path in tarefas])
+        resultado.arquivos = [relatorio for _, relatorio in lidos]
+        resultado.erros = _erros_dos_arquivos(resultado.arquivos)
+        if resultado.erros:
+            imprimir_log(resultado.log, resultado.erros)
+            return resultado
+        cadastros = {tabela: pd.concat([df for (t, _), (df, _) in zip(tarefas, lidos) if t == tabela], ignore_index=True)
+                     for tabela in ("produtos", "vendedores")}
+        vazio = pd.DataFrame(columns=list(COLUNAS_VENDAS.values()))
+        limpos, resultado.log, resultado.erros = limpar_dados({**cadastros, "vendas": vazio})
+        _etapa(resultado, "cadastros", inicio, {t: len(limpos[t]) for t in ("produtos", "vendedores")})
+        if resultado.erros:
+            imprimir_log(resultado.log, resultado.erros)
+            return resultado
+
+        # 2. Vendas, um arquivo por tarefa
+        inicio = time.perf_counter()
+        ids_produtos = set(limpos["produtos"]["id_produto"])
+        ids_vendedores = set(limpos["vendedores"]["id_vendedor"])
+        validadas = _mapear(pool, _validar_particao_vendas,
+                            [(path, ids_produtos, ids_vendedores) for path in fontes["vendas"]], fontes["vendas"])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    relatorios = [relatorio for _, relatorio in validadas]
+    resultado.arquivos += relatorios
+    _etapa(resultado, "vendas", inicio, {"arquivos": len(relatorios), "vendas": sum(r.get("linhas_validas", 0) for r in relatorios)})
+    resultado.erros = _erros_dos_arquivos(relatorios)
+    if resultado.erros:
+        imprimir_log(resultado.log, resultado.erros)
+        return resultado
+
+    # 3. Consolidação
+    inicio = time.perf_counter()
+    vendas, duplicadas_entre, invalidas = _consolidar_vendas([df for df, _ in validadas])
+    removidas = {motivo: sum(r["removidas"][motivo] for r in relatorios)
+                 for motivo in ("valor_ausente", "referencia_inexistente", "duplicada")}
+    if removidas["valor_ausente"]:
+        resultado.log.append(f"Vendas: {removidas['valor_ausente']} linhas com valores ausentes ou inválidos em colunas críticas, serão removidas")
+    if removidas["referencia_inexistente"]:
+        resultado.log.append(f"Vendas: {removidas['referencia_inexistente']} registros removidos por referenciar produto ou vendedor inexistente")
+    if removidas["duplicada"] + duplicadas_entre:
+        resultado.log.append(f"{removidas['duplicada'] + duplicadas_entre} duplicidades em id_venda removidas")
+    if invalidas:
+        resultado.log.append(f"{invalidas} registros com quantidade ou preço <= 0 removidos")
+    resultado.frames = {"produtos": limpos["produtos"], "vendedores": limpos["vendedores"], "vendas": vendas}
+    _etapa(resultado, "consolidacao", inicio, {t: len(df) for t, df in resultado.frames.items()})
+
+    for r in resultado.arquivos:
+        print(f"   {r['arquivo']}: {r['segundos']:.2f}s, {r.get('linhas', 0)} linhas (processo {r['processo']})")
+    resultado.ok = imprimir_log(resultado.log, resultado.erros)
+    if not resultado.ok or not carregar_banco:
+        return resultado
+
+    # 4. Carga
+    inicio = time.perf_counter()
+    migrar()
+    arquivos = _chaves_fontes(fontes)
+    if incremental:
+        gravados = aplicar_delta(calcular_delta(resultado.frames))
+        _etapa(resultado, "upsert", inicio, gravados)
+        registrar_fontes(arquivos)
+    else:
+        vazio = banco_vazio()
+        seed_db_from_files(resultado.frames)
+        _etapa(resultado, "carga", inicio, {t: len(df) for t, df in resultado.frames.items()})
+        if vazio:  # o seed só carrega banco vazio
+            registrar_fontes(arquivos)
+    return resultado
+
+
+# -----------------------------
+# Linha de comando
+# -----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão paralela de vários arquivos de origem")
+    parser.add_argument("--origem", action="append", help="diretório ou glob (pode repetir); padrão: data/")
+    parser.add_argument("--processos", type=int, default=PROCESSOS, help="0 ou 1 para não usar processos")
+    parser.add_argument("--incremental", action="store_true", help="grava só o que mudou em relação ao banco")
+    parser.add_argument("--so-validar", action="store_true", help="não grava no banco")
+    args = parser.parse_args()
+
+    resultado = ingerir_arquivos(*(args.origem or ["data"]), processos=args.processos,
+                                 carregar_banco=not args.so_validar, incremental=args.incremental)
+    raise SystemExit(0 if resultado.ok else 1)
@@ -0,0 +1,152 @@
+"""
+Partida do servidor com o mínimo no caminho crítico.
+
+O import da API não carrega a ingestão (validação, leitura de Excel/CSV, seed)
+nem o matplotlib. No lifespan, `iniciar()` dispara numa thread:
+1. verificação: se o banco já tem dados, validação e seed são pulados. Se os
+   arquivos de data/ não são os mesmos da última carga (ver
+   ingestao.fontes_inalteradas), só um aviso é impresso: o seed não carrega banco
+   com dados, e arquivos novos entram pela ingestão incremental;
+2. carga: executar_pipeline(), só com o banco vazio (ou
+   INICIALIZACAO_SEMPRE_CARREGAR=1);
+3. aquecimento: snapshot, previsões, ranking e índice de categorias, para que as
+   primeiras perguntas não paguem a montagem dos caches.
+
+As consultas são aceitas a partir do fim da etapa 2 (`dados_prontos()`); o
+/api/pronto só responde 200 depois do aquecimento. Com INICIALIZACAO=bloqueante
+tudo roda antes de o servidor aceitar requisições, como no fluxo original.
+"""
+import os
+import threading
+import time
+
+MODO = os.getenv("INICIALIZACAO", "segundo_plano")  # ou "bloqueante"
+SEMPRE_CARREGAR = os.getenv("INICIALIZACAO_SEMPRE_CARREGAR", "0") == "1"
+AQUECER = os.getenv("INICIALIZACAO_AQUECER", "1") == "1"
+
+_lock = threading.Lock()
+_estado = {
+    "fase": "nao_iniciado",  # verificando, carregando, aquecendo, pronto ou falhou
+    "dados_prontos": True,   # sem partida gerenciada, o banco é usado como está
+    "carga_pulada": None,
+    "erro": None,
+    "etapas": {},
+    "segundos": None,
+}
+_inicio = None
+
+
+def estado() -> dict:
+    with _lock:
+        atual = dict(_estado, etapas=dict(_estado["etapas"]))
+    if atual["segundos"] is None and _inicio is not None:
+        atual["segundos_decorridos"] = round(time.perf_counter() - _inicio, 3)
+    return atual
+
+def pronto() -> bool:
+    return estado()["fase"] in ("pronto", "nao_iniciado")
+
+def dados_prontos() -> bool:
+    with _lock:
+        return _estado["dados_prontos"]
+
+def _atualizar(**valores):
+    with _lock:
+        _estado.update(valores)
+
+
+def _fase(nome: str, func, *args):
+    _atualizar(fase=nome)
+    inicio = time.perf_counter()
+    saida = func(*args)
+    with _lock:
+        _estado["etapas"][nome] = round(time.perf_counter() - inicio, 4)
+    return saida
+
+
+# -----------------------------
+# Etapas
+# -----------------------------
+def _verificar(arquivos) -> bool:
+    """
+    True se a carga pode ser pulada.
+    """
+    from .ingestao import banco_vazio, fontes_inalteradas
+    from .migracoes import migrar
+
+    migrar()
+    if SEMPRE_CARREGAR or banco_vazio():
+        return False
+    if fontes_inalteradas(arquivos):
+        print("⏩ Arquivos de dados iguais aos da última carga.")
+    else:
+        # O seed só carrega banco vazio: arquivos novos entram pela ingestão incremental
+        print("⚠️ Arquivos de dados diferentes dos da última carga; o banco não é recarregado "
+              "na partida (use POST /api/admin/ingestao).")
+    return True
+
+def _carregar(arquivos):
+    from .ingestao import executar_pipeline
+
+    if not executar_pipeline(arquivos).ok:
+        raise RuntimeError("Falha na validação/limpeza de dados.")
+
+def _aquecer():
+    from . import service
+
+    service.carregar_dados()
+    service.top_vendedores()
+    service.previsoes_produtos([])
+    service.resolver_categoria("")
+
+
+def executar(arquivos: dict = None):
+    """
+    Executa verificação, carga e aquecimento, atualizando o estado de cada fase.
+    """
+    global _inicio
+    _inicio = time.perf_counter()
+    _atualizar(fase="verificando", dados_prontos=False, carga_pulada=None, erro=None, etapas={}, segundos=None)
+    try:
+        if arquivos is None:
+            from data_test.valida_dados import ARQUIVOS
+            arquivos = ARQUIVOS
+
+        pular = _fase("verificando", _verificar, arquivos)
+        _atualizar(carga_pulada=pular)
+        if pular:
+            print("⏩ Banco já carregado: validação e seed pulados.")
+        else:
+            _fase("carregando", _carregar, arquivos)
+            print("✅ Dados validados e seed carregado.")
+        _atualizar(dados_prontos=True)
+
+        if AQUECER:
+            _fase("aquecendo", _aquecer)
+        _atualizar(fase="pronto", segundos=round(time.perf_counter() - _inicio, 3))
+        print(f"🚀 Servidor pronto em {time.perf_counter() - _inicio:.2f}s")
+    except Exception as e:
+        # Se a falha foi no aquecimento, os dados continuam utilizáveis
+        _atualizar(fase="falhou", erro=str(e), segundos=round(time.perf_counter() - _inicio, 3))
+        print(f"❌ Falha na inicialização: {e}")
+        raise
+
+def iniciar(arquivos: dict = None, modo: str = MODO):
+    """
+    Dispara a inicialização. Em segundo plano retorna a thread; no modo
+    bloqueante só retorna quando terminar (e propaga a falha).
+    """
+    if modo == "bloqueante":
+        executar(arquivos)
+        return None
+
+    def alvo():
+        try:
+            executar(arquivos)
+        except Exception:
+            pass  # já registrada no estado, exposta por /api/pronto
+
+    _atualizar(fase="verificando", dados_prontos=False)
+    thread = threading.Thread(target=alvo, name="inicializacao", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,420 @@
+"""
+Métricas de tempo do caminho quente.
+
+- `etapa(nome)` (context manager) e `@medido()` (decorador) medem funções do
+  serviço, SQL, pandas, ajustes e gráficos: duração, linhas e acertos de cache.
+- Cada requisição tem um `Rastro` numa contextvar (propagada às threads do
+  despachante) com a soma do tempo de cada etapa; a API o devolve no header
+  Server-Timing quando pedido.
+- As durações também vão para histogramas, exportados por `prometheus()`
+  no formato texto do Prometheus (/api/metrics).
+- Perfil opcional por amostragem (METRICAS_PERFIL=fração): nas requisições
+  sorteadas, uma thread coleta as pilhas das threads que executam a consulta
+  a cada METRICAS_PERFIL_INTERVALO_MS; as METRICAS_PERFIL_MANTER mais lentas
+  são gravadas em METRICAS_PERFIL_DIR no formato "folded" (flamegraph.pl, speedscope).
+
+Funções executadas no pool de processos não entram no rastro da requisição
+(só o tempo total do despacho, medido no processo do servidor).
+"""
+import bisect
+import contextvars
+import functools
+import heapq
+import inspect
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ATIVAS = os.getenv("METRICAS", "1") != "0"
+CABECALHO = os.getenv("METRICAS_CABECALHO", "0") == "1"
+PERFIL = float(os.getenv("METRICAS_PERFIL", "0"))
+PERFIL_INTERVALO = float(os.getenv("METRICAS_PERFIL_INTERVALO_MS", "5")) / 1000
+PERFIL_MANTER = int(os.getenv("METRICAS_PERFIL_MANTER", "10"))
+PERFIL_DIR = os.getenv("METRICAS_PERFIL_DIR", "perfis")
+
+# Limites dos buckets dos histogramas, em segundos
+FAIXAS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRICOES = {
+    "chatbot_requisicao_segundos": ("histogram", "Duração das requisições da API"),
+    "chatbot_etapa_segundos": ("histogram", "Duração das etapas instrumentadas (inclusiva)"),
+    "chatbot_etapa_linhas_total": ("counter", "Linhas retornadas pelas etapas instrumentadas"),
+    "chatbot_cache_total": ("counter", "Consultas aos caches, por resultado"),
+}
+
+
+# -----------------------------
+# Registro (histogramas e contadores)
+# -----------------------------
+class Histograma:
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self):
+        self.contagens = [0] * (len(FAIXAS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(FAIXAS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def _rotulos(rotulos: dict) -> str:
+    def escapar(valor):
+        return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{escapar(v)}"' for k, v in rotulos.items())
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (métrica, rótulos) -> Histograma
+        self._contadores = {}   # (métrica, rótulos) -> valor
+
+    def observar(self, metrica: str, valor: float, **rotulos):
+        k = (metrica, _rotulos(rotulos))
+        with self._lock:
+            histograma = self._histogramas.get(k)
+            if histograma is None:
+                histograma = self._histogramas[k] = Histograma()
+            histograma.observar(valor)
+
+    def incrementar(self, metrica: str, valor: float = 1, **rotulos):
+        k = (metrica, _rotulos(rotulos))
+        with self._lock:
+            self._contadores[k] = self._contadores.get(k, 0) + valor
+
+    def limpar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def prometheus(self, medidores: dict = None) -> str:
+        """
+        Todas as métricas no formato texto do Prometheus. `medidores` acrescenta
+        valores instantâneos (gauges): {métrica: [(rótulos, valor), ...]}.
+        """
+        with self._lock:
+            histogramas = {k: (list(h.contagens), h.soma, h.total) for k, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+
+        por_metrica = {}
+        for (metrica, rotulos), valor in list(histogramas.items()) + list(contadores.items()):
+            por_metrica.setdefault(metrica, []).append((rotulos, valor))
+
+        linhas = []
+        for metrica in sorted(por_metrica):
+            tipo, ajuda = DESCRICOES.get(metrica, ("untyped", metrica))
+            linhas += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} {tipo}"]
+            for rotulos, valor in sorted(por_metrica[metrica]):
+                if tipo != "histogram":
+                    linhas.append(f"{metrica}{{{rotulos}}} {valor:g}")
+                    continue
+                contagens, soma, total = valor
+                prefixo = f"{rotulos}," if rotulos else ""
+                acumulado = 0
+                for limite, n in zip(FAIXAS, contagens):
+                    acumulado += n
+                    linhas.append(f'{metrica}_bucket{{{prefixo}le="{limite:g}"}} {acumulado}')
+                linhas.append(f'{metrica}_bucket{{{prefixo}le="+Inf"}} {total}')
+                linhas.append(f"{metrica}_sum{{{rotulos}}} {soma:.6f}")
+                linhas.append(f"{metrica}_count{{{rotulos}}} {total}")
+        for metrica, valores in (medidores or {}).items():
+            linhas += [f"# HELP {metrica} {metrica}", f"# TYPE {metrica} gauge"]
+            linhas += [f"{metrica}{{{_rotulos(rotulos)}}} {valor:g}" for rotulos, valor in valores]
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+
+# -----------------------------
+# Rastro por requisição
+# -----------------------------
+class Rastro:
+    def __init__(self, rota: str, amostrado: bool = False):
+        self.rota = rota
+        self.status = 200
+        self.adiado = False  # resposta em streaming: registrada ao fim do envio (corpo_medido)
+        self.inicio = time.perf_counter()
+        self.amostrado = amostrado
+        self.etapas = {}    # nome -> [chamadas, segundos, linhas]
+        self.caches = {}    # (cache, resultado) -> quantidade
+        self.amostras = {}  # pilha "folded" -> quantidade
+        self._lock = threading.Lock()
+
+    def registrar(self, nome: str, segundos: float, linhas=None):
+        with self._lock:
+            etapa = self.etapas.setdefault(nome, [0, 0.0, 0])
+            etapa[0] += 1
+            etapa[1] += segundos
+            etapa[2] += linhas or 0
+
+    def registrar_cache(self, nome: str, resultado: str, n: int = 1):
+        with self._lock:
+            self.caches[(nome, resultado)] = self.caches.get((nome, resultado), 0) + n
+
+    def duracao(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def cabecalho(self) -> str:
+        """
+        Valor do header Server-Timing: tempo total, cada etapa (ms, chamadas,
+        linhas) e os resultados dos caches.
+        """
+        with self._lock:
+            etapas = sorted(self.etapas.items(), key=lambda e: -e[1][1])
+            caches = sorted(self.caches.items())
+        partes = [f"total;dur={self.duracao() * 1000:.2f}"]
+        for nome, (chamadas, segundos, linhas) in etapas:
+            desc = f"n={chamadas} linhas={linhas}" if linhas else f"n={chamadas}"
+            partes.append(f'{nome};dur={segundos * 1000:.2f};desc="{desc}"')
+        for (nome, resultado), n in caches:
+            partes.append(f'cache.{nome}.{resultado};desc="n={n}"')
+        return ", ".join(partes)
+
+
+_rastro = contextvars.ContextVar("metricas_rastro", default=None)
+
+def rastro_atual():
+    return _rastro.get()
+
+@contextmanager
+def requisicao(rota: str):
+    """
+    Abre o rastro da requisição; ao sair registra a duração por rota e status
+    (ajuste `rastro.status` antes) e, se a requisição foi amostrada, seu perfil.
+    """
+    rastro = Rastro(rota, amostrado=PERFIL > 0 and random.random() < PERFIL)
+    token = _rastro.set(rastro)
+    try:
+        yield rastro
+    finally:
+        _rastro.reset(token)
+        if not rastro.adiado:
+            _encerrar(rastro)
+
+def _encerrar(rastro: Rastro):
+    duracao = rastro.duracao()
+    if ATIVAS:
+        registro.observar("chatbot_requisicao_segundos", duracao, rota=rastro.rota, status=rastro.status)
+    if rastro.amostras:
+        _guardar_perfil(rastro, duracao)
+
+async def corpo_medido(rastro: Rastro, corpo):
+    """
+    Envolve o corpo (iterador assíncrono) de uma resposta em streaming: as etapas
+    executadas durante o envio entram no rastro, e a duração da requisição só é
+    registrada quando o envio termina. Marque `rastro.adiado = True` antes de
+    sair de `requisicao()`.
+    """
+    token = _rastro.set(rastro)
+    try:
+        async for parte in corpo:
+            yield parte
+    except Exception:
+        rastro.status = 500
+        raise
+    finally:
+        try:
+            _rastro.reset(token)
+        except ValueError:
+            pass  # fechado em outro contexto (ex.: coletado depois da desconexão)
+        _encerrar(rastro)
+
+
+# -----------------------------
+# Instrumentação
+# -----------------------------
+@contextmanager
+def etapa(nome: str):
+    """
+    Mede o bloco: `with etapa("pandas.groupby") as m: ...; m["linhas"] = len(df)`.
+    """
+    medida = {"linhas": None}
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        _registrar(nome, time.perf_counter() - inicio, medida["linhas"])
+
+def _registrar(nome: str, segundos: float, linhas=None):
+    if not ATIVAS:
+        return
+    registro.observar("chatbot_etapa_segundos", segundos, etapa=nome)
+    if linhas:
+        registro.incrementar("chatbot_etapa_linhas_total", linhas, etapa=nome)
+    rastro = _rastro.get()
+    if rastro is not None:
+        rastro.registrar(nome, segundos, linhas)
+
+def _linhas(resultado):
+    if isinstance(resultado, (str, bytes, dict, tuple)) or not hasattr(resultado, "__len__"):
+        return None
+    return len(resultado)
+
+def medido(nome: str = None):
+    """
+    Decorador que mede cada chamada da função como uma etapa (por padrão
+    "<módulo>.<função>"). Em funções geradoras a medida cobre o consumo das
+    linhas, e as linhas geradas são contadas.
+    """
+    def decorador(func):
+        if not ATIVAS:
+            return func
+        rotulo = nome or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gerador(*args, **kwargs):
+                inicio, linhas = time.perf_counter(), 0
+                try:
+                    for linha in func(*args, **kwargs):
+                        linhas += 1
+                        yield linha
+                finally:
+                    _registrar(rotulo, time.perf_counter() - inicio, linhas)
+            return gerador
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = None
+            try:
+                resultado = func(*args, **kwargs)
+                return resultado
+            finally:
+                _registrar(rotulo, time.perf_counter() - inicio, _linhas(resultado))
+        return wrapper
+    return decorador
+
+def cache(nome: str, resultado: str, n: int = 1):
+    """
+    Conta `n` consultas ao cache `nome` com o resultado informado ("acerto", "falta", ...).
+    """
+    if not ATIVAS or not n:
+        return
+    registro.incrementar("chatbot_cache_total", n, cache=nome, resultado=resultado)
+    rastro = _rastro.get()
+    if rastro is not None:
+        rastro.registrar_cache(nome, resultado, n)
+
+def instrumentar_engine(engine):
+    """
+    Mede a execução de cada comando SQL da engine (síncrona) como etapa
+    "sql.<comando>". O tempo de leitura das linhas fica na etapa de quem as consome.
+    """
+    if not ATIVAS:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("metricas_inicio")
+        if not inicios:
+            return
+        comando = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "?"
+        linhas = cursor.rowcount if comando in ("insert", "update", "delete") and cursor.rowcount > 0 else None
+        _registrar(f"sql.{comando}", time.perf_counter() - inicios.pop(), linhas)
+
+
+# -----------------------------
+# Perfil por amostragem
+# -----------------------------
+class _Amostrador:
+    """
+    Thread que lê periodicamente a pilha das threads acompanhadas e soma as
+    amostras no rastro de cada uma.
+    """
+    def __init__(self, intervalo: float = PERFIL_INTERVALO):
+        self.intervalo = intervalo
+        self._alvos = {}  # id da thread -> rastro
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextmanager
+    def acompanhar(self, rastro: Rastro):
+        ident = threading.get_ident()
+        with self._lock:
+            self._alvos[ident] = rastro
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._laco, name="metricas-perfil", daemon=True)
+                self._thread.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._alvos.pop(ident, None)
+
+    def _laco(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                alvos = list(self._alvos.items())
+            if not alvos:
+                continue
+            quadros = sys._current_frames()
+            for ident, rastro in alvos:
+                quadro = quadros.get(ident)
+                if quadro is not None:
+                    pilha = _pilha(quadro)
+                    with rastro._lock:
+                        rastro.amostras[pilha] = rastro.amostras.get(pilha, 0) + 1
+
+
+def _pilha(quadro) -> str:
+    nomes = []
+    while quadro is not None:
+        codigo = quadro.f_code
+        nomes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+        quadro = quadro.f_back
+    return ";".join(reversed(nomes))
+
+
+_amostrador = _Amostrador()
+
+def acompanhada(func):
+    """
+    Se a requisição atual foi sorteada para perfil, devolve `func` envolvida
+    para que a thread que a executar seja amostrada; senão, a própria `func`.
+    """
+    rastro = _rastro.get()
+    if rastro is None or not rastro.amostrado:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _amostrador.acompanhar(rastro):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+_mais_lentas = []  # heap (duração, arquivo) com as PERFIL_MANTER requisições mais lentas
+_lock_perfis = threading.Lock()
+
+def _guardar_perfil(rastro: Rastro, duracao: float):
+    with _lock_perfis:
+        if len(_mais_lentas) >= PERFIL_MANTER and duracao <= _mais_lentas[0][0]:
+            return
+        os.makedirs(PERFIL_DIR, exist_ok=True)
+        nome = re.sub(r"[^a-zA-Z0-9]+", "_", rastro.rota).strip("_")
+        arquivo = os.path.join(PERFIL_DIR, f"{duracao * 1000:09.1f}ms-{nome}-{time.time_ns()}.folded")
+        with rastro._lock:
+            amostras = sorted(rastro.amostras.items())
+        with open(arquivo, "w") as f:
+            f.writelines(f"{pilha} {n}\n" for pilha, n in amostras)
+        heapq.heappush(_mais_lentas, (duracao, arquivo))
+        while len(_mais_lentas) > PERFIL_MANTER:
+            _, descartado = heapq.heappop(_mais_lentas)
+            if os.path.exists(descartado):
+                os.remove(descartado)
+    print(f"🐢 Perfil de {rastro.rota} ({duracao * 1000:.0f} ms) salvo em {arquivo}")
@@ -0,0 +1,155 @@
+"""
+Migrações do esquema, aplicadas em ordem e registradas em `versao_schema`.
+
+Bancos novos já nascem com o esquema atual (create_all); as migrações levam
+bancos antigos ao mesmo ponto. Cada uma é idempotente e roda na sua própria
+transação, junto com o registro de que foi aplicada.
+
+Uso:
+    python -m backend.migracoes            # aplica as pendentes
+    python -m backend.migracoes --planos   # confere os planos das consultas principais
+"""
+import argparse
+import re
+import sys
+
+from sqlalchemy import Integer, cast, extract, func, insert, inspect, select, text, update
+
+from .database import Base, ENGINE, Produto, Venda, VersaoSchema
+
+MIGRACOES = []
+
+
+def migracao(numero: int, descricao: str):
+    def registrar(func_migracao):
+        MIGRACOES.append((numero, descricao, func_migracao))
+        MIGRACOES.sort(key=lambda m: m[0])
+        return func_migracao
+    return registrar
+
+
+# -----------------------------
+# Migrações
+# -----------------------------
+@migracao(1, "colunas ano/mes em vendas")
+def _colunas_periodo(conn):
+    existentes = {c["name"] for c in inspect(conn).get_columns("vendas")}
+    for nome in ("ano", "mes"):
+        if nome not in existentes:
+            conn.execute(text(f"ALTER TABLE vendas ADD COLUMN {nome} INTEGER"))
+    conn.execute(
+        update(Venda)
+        .where(Venda.ano.is_(None))
+        .values(
+            ano=cast(extract("year", Venda.data_venda), Integer),
+            mes=cast(extract("month", Venda.data_venda), Integer),
+        )
+    )
+
+
+@migracao(2, "índices compostos de vendas e índice de categoria")
+def _indices(conn):
+    for tabela in (Venda.__table__, Produto.__table__):
+        for indice in tabela.indexes:
+            indice.create(conn, checkfirst=True)
+
+
+# -----------------------------
+# Execução
+# -----------------------------
+def aplicadas(conn) -> set:
+    return set(conn.execute(select(VersaoSchema.numero)).scalars())
+
+
+def migrar(engine=ENGINE) -> list:
+    """
+    Cria as tabelas que faltam e aplica as migrações pendentes.
+    Retorna os números das migrações aplicadas nesta chamada.
+    """
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        feitas = aplicadas(conn)
+
+    novas = []
+    for numero, descricao, aplicar in MIGRACOES:
+        if numero in feitas:
+            continue
+        with engine.begin() as conn:
+            aplicar(conn)
+            conn.execute(insert(VersaoSchema).values(numero=numero, descricao=descricao))
+        print(f"🔧 Migração {numero}: {descricao}")
+        novas.append(numero)
+    return novas
+
+
+# -----------------------------
+# Planos de consulta
+# -----------------------------
+# Consultas do serviço e o índice que cada uma deve usar
+PLANOS = {
+    "total do produto": (
+        select(func.sum(Venda.valor_total)).where(Venda.id_produto == 1),
+        "ix_vendas_produto_data",
+    ),
+    "total do vendedor": (
+        select(func.sum(Venda.valor_total)).where(Venda.id_vendedor == 1),
+        "ix_vendas_vendedor_data",
+    ),
+    "vendas do produto no período": (
+        select(Venda.data_venda, Venda.valor_total)
+        .where(Venda.id_produto == 1, Venda.data_venda.between("2023-01-01", "2023-12-31")),
+        "ix_vendas_produto_data",
+    ),
+    "vendas do vendedor no período": (
+        select(Venda.data_venda, Venda.valor_total)
+        .where(Venda.id_vendedor == 1, Venda.data_venda >= "2023-01-01"),
+        "ix_vendas_vendedor_data",
+    ),
+    "produtos da categoria": (
+        select(Produto.id_produto, Produto.nome_produto).where(Produto.categoria == "Alimentos"),
+        "ix_produtos_categoria",
+    ),
+}
+
+
+def plano(conn, stmt) -> str:
+    """
+    Saída de EXPLAIN QUERY PLAN (SQLite) da consulta, com os passos separados por " | ".
+    """
+    sql = str(stmt.compile(conn, compile_kwargs={"literal_binds": True}))
+    return " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+def usa_indice(plano_texto: str, indice: str) -> bool:
+    """
+    True se o plano busca (SEARCH, não SCAN) pelo índice informado.
+    """
+    return re.search(rf"SEARCH \w+ USING (?:COVERING )?INDEX {indice}\b", plano_texto) is not None
+
+
+def conferir_planos(engine=ENGINE) -> bool:
+    """
+    Roda EXPLAIN QUERY PLAN (SQLite) em cada consulta de PLANOS e confere que ela
+    busca pelo índice esperado em vez de varrer a tabela. Retorna True se todas usam.
+    """
+    if engine.dialect.name != "sqlite":
+        print(f"Conferência de planos disponível só para SQLite (banco: {engine.dialect.name}).")
+        return True
+
+    ok = True
+    with engine.connect() as conn:
+        for nome, (stmt, indice) in PLANOS.items():
+            texto = plano(conn, stmt)
+            usa = usa_indice(texto, indice)
+            ok &= usa
+            print(f"{'✅' if usa else '❌'} {nome}: {texto}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrações do esquema do banco")
+    parser.add_argument("--planos", action="store_true", help="confere os índices usados pelas consultas principais")
+    args = parser.parse_args()
+
+    migrar()
+    if args.planos and not conferir_planos():
+        sys.exit(1)
@@ -0,0 +1,105 @@
+"""
+Previsão de vendas do próximo trimestre para todos os produtos de uma vez.
+
+Cada produto tem sua série de trimestres com venda (x = 0, 1, ..., n-1, como no
+modelo original por produto). A reta de mínimos quadrados de todas as séries é
+resolvida em forma fechada com somas agrupadas em NumPy, sem um ajuste por produto.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .metricas import cache, medido
+
+
+@dataclass(frozen=True)
+class Previsoes:
+    versao: str
+    ids: np.ndarray          # ids dos produtos, ordenados
+    previsao: np.ndarray     # valor previsto para o próximo trimestre
+    inclinacao: np.ndarray   # variação por trimestre (R$)
+    intercepto: np.ndarray
+    r2: np.ndarray
+    n_trimestres: np.ndarray
+
+    def linha(self, id_produto: int):
+        """
+        Índice do produto nos arrays, ou None se ele não tiver vendas.
+        """
+        i = int(np.searchsorted(self.ids, id_produto))
+        return i if i < len(self.ids) and self.ids[i] == id_produto else None
+
+    def registro(self, i: int) -> dict:
+        return {
+            "id_produto": int(self.ids[i]),
+            "previsao": float(self.previsao[i]),
+            "inclinacao": float(self.inclinacao[i]),
+            "intercepto": float(self.intercepto[i]),
+            "r2": float(self.r2[i]),
+            "n_trimestres": int(self.n_trimestres[i]),
+        }
+
+    def registros(self, ids=None):
+        if ids is None:
+            linhas = range(len(self.ids))
+        else:
+            linhas = [i for i in (self.linha(int(p)) for p in ids) if i is not None]
+        return [self.registro(i) for i in linhas]
+
+
+@medido("previsao.ajustar")
+def ajustar(df_trimestre: pd.DataFrame, versao: str) -> Previsoes:
+    """
+    Ajusta a tendência linear de todos os produtos a partir das linhas
+    (id_produto, ano, trimestre, valor_total).
+    """
+    df = df_trimestre.sort_values(["id_produto", "ano", "trimestre"], kind="stable")
+    ids, grupo = np.unique(df["id_produto"].to_numpy(dtype=np.int64), return_inverse=True)
+    y = df["valor_total"].to_numpy(dtype=np.float64)
+
+    # Posição de cada trimestre dentro da série do seu produto (linhas já ordenadas por produto)
+    n = np.bincount(grupo, minlength=len(ids)).astype(np.float64)
+    inicio = np.concatenate(([0], np.cumsum(n)[:-1])).astype(np.int64)
+    x = (np.arange(len(y)) - inicio[grupo]).astype(np.float64)
+
+    def soma(pesos):
+        return np.bincount(grupo, weights=pesos, minlength=len(ids))
+
+    sx, sy, sxx, sxy, syy = soma(x), soma(y), soma(x * x), soma(x * y), soma(y * y)
+
+    denominador = n * sxx - sx * sx
+    inclinacao = np.divide(n * sxy - sx * sy, denominador, out=np.zeros(len(ids)), where=denominador > 0)
+    intercepto = np.divide(sy - inclinacao * sx, n, out=np.zeros(len(ids)), where=n > 0)
+    previsao = intercepto + inclinacao * n
+
+    # R² = 1 - SQres / SQtot, com as somas já calculadas
+    sq_res = (syy + n * intercepto ** 2 + inclinacao ** 2 * sxx
+              - 2 * intercepto * sy - 2 * inclinacao * sxy + 2 * intercepto * inclinacao * sx)
+    sq_tot = syy - np.divide(sy * sy, n, out=np.zeros(len(ids)), where=n > 0)
+    r2 = np.where(sq_tot > 1e-9, 1 - np.divide(sq_res, sq_tot, out=np.zeros(len(ids)), where=sq_tot > 1e-9), 1.0)
+
+    return Previsoes(versao, ids, previsao, inclinacao, intercepto, r2, n.astype(np.int64))
+
+
+_cache = {}
+_lock = threading.Lock()
+
+def previsoes_da_versao(versao: str, carregar) -> Previsoes:
+    """
+    Previsões da versão de dados informada; `carregar()` retorna o rollup
+    produto x trimestre completo e só é chamado quando a versão muda.
+    """
+    previsoes = _cache.get(versao)
+    if previsoes is None:
+        with _lock:
+            previsoes = _cache.get(versao)
+            if previsoes is None:
+                cache("previsoes", "falta")
+                previsoes = ajustar(carregar(), versao)
+                _cache.clear()
+                _cache[versao] = previsoes
+                return previsoes
+    cache("previsoes", "acerto")
+    return previsoes
@@ -0,0 +1,149 @@
+"""
+Ranking de vendedores em NumPy sobre uma matriz densa vendedor x mês.
+
+Crescimento mês a mês com tratamento explícito de zeros:
+- mês anterior > 0: (atual - anterior) / anterior
+- mês anterior = 0 e atual > 0: +1.0 (vendedor começou ou voltou a vender)
+- os dois meses zerados: par ignorado na média (sem atividade)
+"""
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .metricas import cache, medido
+
+METRICAS = ("crescimento", "total", "tendencia")
+
+
+@dataclass(frozen=True)
+class MatrizVendedorMes:
+    ids: np.ndarray        # ids dos vendedores, ordenados (linha i -> ids[i])
+    mes_inicial: int       # índice absoluto (ano * 12 + mes - 1) da coluna 0
+    valores: np.ndarray    # float64 [n_vendedores, n_meses], meses contíguos
+    _pontos: dict = field(default_factory=dict, repr=False, compare=False)  # (metrica, inicio, fim) -> pontos
+
+    @classmethod
+    @medido("ranking.de_rollup")
+    def de_rollup(cls, df_mes: pd.DataFrame):
+        """
+        Monta a matriz a partir das linhas (id_vendedor, ano, mes, valor_total).
+        Meses sem venda ficam com zero.
+        """
+        if df_mes.empty:
+            return cls(np.empty(0, dtype=np.int64), 0, np.zeros((0, 0)))
+        ids, linhas = np.unique(df_mes["id_vendedor"].to_numpy(dtype=np.int64), return_inverse=True)
+        meses = df_mes["ano"].to_numpy(dtype=np.int64) * 12 + df_mes["mes"].to_numpy(dtype=np.int64) - 1
+        mes_inicial = int(meses.min())
+        n_meses = int(meses.max()) - mes_inicial + 1
+        posicoes = linhas * n_meses + (meses - mes_inicial)
+        valores = np.bincount(
+            posicoes, weights=df_mes["valor_total"].to_numpy(dtype=np.float64), minlength=len(ids) * n_meses
+        ).reshape(len(ids), n_meses)
+        return cls(ids, mes_inicial, valores)
+
+    def janela(self, inicio: str = None, fim: str = None) -> np.ndarray:
+        """
+        Colunas entre os meses `inicio` e `fim` ("AAAA-MM", inclusivos).
+        """
+        n_meses = self.valores.shape[1]
+        i = _indice_mes(inicio) - self.mes_inicial if inicio else 0
+        f = _indice_mes(fim) - self.mes_inicial + 1 if fim else n_meses
+        return self.valores[:, max(i, 0):min(f, n_meses)]
+
+    def pontos(self, metrica: str, inicio: str = None, fim: str = None) -> np.ndarray:
+        """
+        Valor da métrica para cada vendedor na janela (calculado uma vez por matriz).
+        """
+        # O dict é compartilhado pelas threads do despachante sem lock: o valor é
+        # devolvido da variável local, pois outra thread pode limpá-lo a qualquer momento
+        chave = (metrica, inicio, fim)
+        pontos = self._pontos.get(chave)
+        if pontos is None:
+            pontos = _FUNCOES[metrica](self.janela(inicio, fim))
+            if len(self._pontos) >= 64:
+                self._pontos.clear()
+            self._pontos[chave] = pontos
+        return pontos
+
+
+def _indice_mes(texto: str) -> int:
+    ano, mes = str(texto).split("-")[:2]
+    return int(ano) * 12 + int(mes) - 1
+
+
+# -----------------------------
+# Métricas (vetorizadas por linha)
+# -----------------------------
+def crescimento_medio(valores: np.ndarray) -> np.ndarray:
+    if valores.shape[1] < 2:
+        return np.zeros(valores.shape[0])
+    anterior, atual = valores[:, :-1], valores[:, 1:]
+    com_base = anterior > 0
+    taxa = np.zeros(anterior.shape)
+    np.divide(atual - anterior, anterior, out=taxa, where=com_base)
+    novo = ~com_base & (atual > 0)
+    taxa[novo] = 1.0
+    # pares sem atividade nos dois meses contribuem 0 na soma e não entram na contagem
+    pares = com_base.sum(axis=1) + novo.sum(axis=1)
+    return np.divide(taxa.sum(axis=1), pares, out=np.zeros(valores.shape[0]), where=pares > 0)
+
+def total(valores: np.ndarray) -> np.ndarray:
+    return valores.sum(axis=1)
+
+def tendencia(valores: np.ndarray) -> np.ndarray:
+    """
+    Inclinação da reta de mínimos quadrados (R$ por mês) de cada linha.
+    """
+    n = valores.shape[1]
+    if n < 2:
+        return np.zeros(valores.shape[0])
+    x = np.arange(n, dtype=np.float64) - (n - 1) / 2.0
+    return (valores @ x) / (x @ x)
+
+_FUNCOES = {"crescimento": crescimento_medio, "total": total, "tendencia": tendencia}
+
+
+# -----------------------------
+# Ranking
+# -----------------------------
+def ranquear(matriz: MatrizVendedorMes, metrica: str = "crescimento", top_n: int = 3,
+             inicio: str = None, fim: str = None):
+    """
+    Retorna [(id_vendedor, valor)] dos `top_n` maiores valores da métrica na janela,
+    em ordem decrescente (empates entre os selecionados pelo menor id).
+    """
+    if metrica not in _FUNCOES:
+        raise ValueError(f"Métrica desconhecida: {metrica}. Use uma de {METRICAS}")
+    n = len(matriz.ids)
+    if n == 0 or top_n <= 0:
+        return []
+
+    pontos = matriz.pontos(metrica, inicio, fim)
+    k = min(top_n, n)
+    candidatos = np.argpartition(-pontos, k - 1)[:k] if k < n else np.arange(n)
+    ordem = candidatos[np.lexsort((matriz.ids[candidatos], -pontos[candidatos]))]
+    return [(int(matriz.ids[i]), float(pontos[i])) for i in ordem]
+
+
+_cache = {}
+_lock = threading.Lock()
+
+def matriz_da_versao(versao: str, carregar):
+    """
+    Matriz da versão de dados informada; `carregar()` retorna o DataFrame do
+    rollup vendedor x mês e só é chamado quando a versão muda.
+    """
+    matriz = _cache.get(versao)
+    if matriz is None:
+        with _lock:
+            matriz = _cache.get(versao)
+            if matriz is None:
+                cache("ranking", "falta")
+                matriz = MatrizVendedorMes.de_rollup(carregar())
+                _cache.clear()
+                _cache[versao] = matriz
+                return matriz
+    cache("ranking", "acerto")
+    return matriz
@@ -0,0 +1,104 @@
+"""
+Manutenção das tabelas de rollup (vendedor x mês, produto x trimestre e região).
+São recalculadas na carga e na ingestão incremental, dentro da mesma transação.
+"""
+from sqlalchemy import Integer, case, cast, delete, extract, func, insert, select
+
+from .database import Vendedor, Venda, VendaVendedorMes, VendaProdutoTrimestre, VendaRegiao
+
+
+# Acima disso o recálculo parcial vira completo (evita IN com milhares de parâmetros)
+MAX_IDS_PARCIAL = 500
+
+
+# ano/mes gravados na ingestão; a extração da data cobre linhas gravadas sem eles
+def _ano():
+    return func.coalesce(Venda.ano, cast(extract("year", Venda.data_venda), Integer))
+
+def _mes():
+    return func.coalesce(Venda.mes, cast(extract("month", Venda.data_venda), Integer))
+
+def _trimestre():
+    mes = _mes()
+    return case((mes <= 3, 1), (mes <= 6, 2), (mes <= 9, 3), else_=4)
+
+
+# -----------------------------
+# Recalculo
+# -----------------------------
+def _atualizar_vendedor_mes(conn, ids_vendedor=None):
+    tabela = VendaVendedorMes.__table__
+    agregado = (
+        select(
+            Venda.id_vendedor, _ano(), _mes(),
+            func.sum(Venda.valor_total), func.sum(Venda.quantidade),
+        )
+        .where(Venda.id_vendedor.is_not(None))
+        .group_by(Venda.id_vendedor, _ano(), _mes())
+    )
+    remover = delete(tabela)
+    if ids_vendedor is not None:
+        agregado = agregado.where(Venda.id_vendedor.in_(ids_vendedor))
+        remover = remover.where(tabela.c.id_vendedor.in_(ids_vendedor))
+    conn.execute(remover)
+    conn.execute(insert(tabela).from_select(
+        ["id_vendedor", "ano", "mes", "valor_total", "quantidade"], agregado
+    ))
+
+def _atualizar_produto_trimestre(conn, ids_produto=None):
+    tabela = VendaProdutoTrimestre.__table__
+    agregado = (
+        select(
+            Venda.id_produto, _ano(), _trimestre(),
+            func.sum(Venda.valor_total), func.sum(Venda.quantidade),
+        )
+        .where(Venda.id_produto.is_not(None))
+        .group_by(Venda.id_produto, _ano(), _trimestre())
+    )
+    remover = delete(tabela)
+    if ids_produto is not None:
+        agregado = agregado.where(Venda.id_produto.in_(ids_produto))
+        remover = remover.where(tabela.c.id_produto.in_(ids_produto))
+    conn.execute(remover)
+    conn.execute(insert(tabela).from_select(
+        ["id_produto", "ano", "trimestre", "valor_total", "quantidade"], agregado
+    ))
+
+def _atualizar_regiao(conn):
+    # Calculado a partir do rollup por vendedor: lê poucas linhas e acompanha
+    # mudanças de região dos vendedores sem varrer as vendas
+    rollup = VendaVendedorMes.__table__
+    regiao = func.coalesce(Vendedor.regiao, "Não Informada")
+    agregado = (
+        select(regiao, func.sum(rollup.c.valor_total))
+        .select_from(rollup)
+        .outerjoin(Vendedor, rollup.c.id_vendedor == Vendedor.id_vendedor)
+        .group_by(regiao)
+    )
+    conn.execute(delete(VendaRegiao.__table__))
+    conn.execute(insert(VendaRegiao.__table__).from_select(["regiao", "valor_total"], agregado))
+
+def atualizar_rollups(conn, ids_vendedor=None, ids_produto=None):
+    """
+    Recalcula os rollups na transação de `conn`.
+    Sem ids, recalcula tudo; com ids, só as linhas dos vendedores/produtos informados
+    (o rollup por região é sempre refeito, a partir do rollup por vendedor).
+    """
+    if ids_vendedor is not None and len(ids_vendedor) > MAX_IDS_PARCIAL:
+        ids_vendedor = None
+    if ids_produto is not None and len(ids_produto) > MAX_IDS_PARCIAL:
+        ids_produto = None
+    if ids_vendedor is None or len(ids_vendedor):
+        _atualizar_vendedor_mes(conn, None if ids_vendedor is None else [int(i) for i in ids_vendedor])
+    if ids_produto is None or len(ids_produto):
+        _atualizar_produto_trimestre(conn, None if ids_produto is None else [int(i) for i in ids_produto])
+    _atualizar_regiao(conn)
+
+def rollups_vazios(conn) -> bool:
+    """
+    True se há vendas mas os rollups ainda não foram calculados
+    (banco populado antes da existência dos rollups).
+    """
+    tem_vendas = conn.execute(select(Venda.id_venda).limit(1)).first() is not None
+    tem_rollup = conn.execute(select(VendaVendedorMes.id_vendedor).limit(1)).first() is not None
+    return tem_vendas and not tem_rollup
@@ -1,75 +1,219 @@
+import os
+import time
+from itertools import islice
 import pandas as pd
-from .database import Base, ENGINE, SessionLocal, Produto, Vendedor, Venda
+from sqlalchemy import Date, insert
+from .cache_fontes import ler_fonte
+from .database import ENGINE, SessionLocal, Produto, Vendedor, Venda, incrementar_versao
+from .migracoes import migrar
+from .rollups import atualizar_rollups, rollups_vazios
+
+# Quantidade de linhas enviadas por executemany durante a carga
+TAMANHO_LOTE = int(os.getenv("SEED_TAMANHO_LOTE", "20000"))
+
+# Pragmas do SQLite usados só durante a carga (restaurados ao final)
+PRAGMAS_CARGA = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-200000",  # ~200 MB
+}
+
+# Marcadores de parâmetro por paramstyle do driver (executemany direto)
+_MARCADORES = {"qmark": "?", "format": "%s", "pyformat": "%s"}
 
 def load_file(path: str):
-    if path.endswith(".csv"):
-        return pd.read_csv(path, sep=";")
-    elif path.endswith(".xlsx"):
-        return pd.read_excel(path)
+    if path.endswith((".csv", ".xlsx")):
+        return ler_fonte(path)
     else:
         raise ValueError(f"Formato não suportado: {path}")
 
-def seed_db_from_files():
-    # Cria as tabelas
-    Base.metadata.create_all(ENGINE)
+# Nomes das colunas dos arquivos -> colunas dos modelos ORM
+COLUNAS_PRODUTOS = {
+    "Id_Produto": "id_produto",
+    "Nome_Produto": "nome_produto",
+    "Categoria": "categoria",
+    "R$_Unit": "preco"   # <-- mapeia o nome real para 'preco'
+}
+
+COLUNAS_VENDEDORES = {
+    "Id_Vendedor": "id_vendedor",
+    "Nome_Vendedor": "nome_vendedor",
+    "Região": "regiao"
+}
+
+COLUNAS_VENDAS = {
+    "Id_Venda": "id_venda",
+    "Id_Produto": "id_produto",
+    "Id_Vendedor": "id_vendedor",
+    "Quantidade": "quantidade",
+    "Data_Venda": "data_venda",
+    "R$_Unit": "preco_unit",
+    "R$_Total": "valor_total"
+}
+
+def renomear_colunas(frames: dict) -> dict:
+    """
+    Renomeia as colunas dos arquivos ({"produtos", "vendedores", "vendas"})
+    para os nomes dos modelos ORM.
+    """
+    return {
+        "produtos": frames["produtos"].rename(columns=COLUNAS_PRODUTOS),
+        "vendedores": frames["vendedores"].rename(columns=COLUNAS_VENDEDORES),
+        "vendas": frames["vendas"].rename(columns=COLUNAS_VENDAS),
+    }
+
+def com_periodo(df_vendas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Acrescenta as colunas ano/mes (de data_venda) gravadas junto com cada venda.
+    """
+    datas = pd.to_datetime(df_vendas["data_venda"])
+    return df_vendas.assign(ano=datas.dt.year, mes=datas.dt.month)
+
+# -----------------------------
+# Carga em lote
+# -----------------------------
+def _aplicar_pragmas(conn, pragmas: dict):
+    """
+    Aplica pragmas do SQLite e retorna os valores anteriores para restauração.
+    Em outros bancos não faz nada.
+    """
+    if conn.dialect.name != "sqlite":
+        return {}
+    anteriores = {}
+    for nome, valor in pragmas.items():
+        anteriores[nome] = conn.exec_driver_sql(f"PRAGMA {nome}").scalar()
+        conn.exec_driver_sql(f"PRAGMA {nome}={valor}")
+    conn.commit()
+    return anteriores
+
+def _preparar_linhas(tabela, df: pd.DataFrame):
+    """
+    Converte o DataFrame em tuplas na ordem das colunas da tabela, com datas
+    em ISO (AAAA-MM-DD) e NaN como None, prontas para o executemany do driver.
+    """
+    colunas = [c for c in tabela.columns if c.name in df.columns]
+    dados = {}
+    for coluna in colunas:
+        serie = df[coluna.name]
+        if isinstance(coluna.type, Date):
+            serie = pd.to_datetime(serie).dt.strftime("%Y-%m-%d")
+        if serie.isna().any():
+            serie = serie.astype(object).where(serie.notna(), None)
+        dados[coluna.name] = serie
+    linhas = pd.DataFrame(dados).itertuples(index=False, name=None)
+    return [c.name for c in colunas], linhas
+
+def _inserir_em_lotes(conn, modelo, df: pd.DataFrame, tamanho_lote: int, relatar: bool = True):
+    """
+    Insere o DataFrame na tabela do modelo em lotes de `tamanho_lote` linhas,
+    com um executemany do driver por lote. Retorna o número de linhas inseridas.
+    """
+    tabela = modelo.__table__
+    nomes, linhas = _preparar_linhas(tabela, df)
+
+    marcador = _MARCADORES.get(conn.dialect.paramstyle)
+    if marcador is None:
+        # Driver com paramstyle incomum: usa o insert do Core (mais lento)
+        sql = None
+    else:
+        sql = f"INSERT INTO {tabela.name} ({', '.join(nomes)}) VALUES ({', '.join([marcador] * len(nomes))})"
+
+    inicio = time.perf_counter()
+    while lote := list(islice(linhas, tamanho_lote)):
+        if sql:
+            conn.exec_driver_sql(sql, lote)
+        else:
+            conn.execute(insert(tabela), [dict(zip(nomes, linha)) for linha in lote])
+    duracao = time.perf_counter() - inicio
+
+    if relatar:
+        taxa = len(df) / duracao if duracao > 0 else float("inf")
+        print(f"   {tabela.name}: {len(df)} linhas em {duracao:.2f}s ({taxa:,.0f} linhas/s)")
+    return len(df)
+
+def carregar_em_lote(df_produtos, df_vendedores, df_vendas, tamanho_lote: int = TAMANHO_LOTE):
+    """
+    Grava os três DataFrames (já com as colunas dos modelos ORM) em uma única
+    transação, em lotes, e incrementa a versão dos dados.
+    """
+    inicio = time.perf_counter()
+    with ENGINE.connect() as conn:
+        anteriores = _aplicar_pragmas(conn, PRAGMAS_CARGA)
+        try:
+            with conn.begin():
+                total = _inserir_em_lotes(conn, Produto, df_produtos, tamanho_lote)
+                total += _inserir_em_lotes(conn, Vendedor, df_vendedores, tamanho_lote)
+                total += _inserir_em_lotes(conn, Venda, com_periodo(df_vendas), tamanho_lote)
+                atualizar_rollups(conn)
+
+                # Nova versão dos dados: invalida snapshots carregados antes da carga
+                incrementar_versao(conn)
+        finally:
+            _aplicar_pragmas(conn, anteriores)
+
+    duracao = time.perf_counter() - inicio
+    taxa = total / duracao if duracao > 0 else float("inf")
+    print(f"✅ Seed: {total} linhas em {duracao:.2f}s ({taxa:,.0f} linhas/s)")
+    return total
 
-    # Cria uma sessão usando SessionLocal
+def carregar_em_blocos(df_produtos, df_vendedores, blocos_vendas, tamanho_lote: int = TAMANHO_LOTE):
+    """
+    Como carregar_em_lote, com as vendas vindas de um iterável de DataFrames
+    (ex.: valida_em_blocos.validar_vendas_em_blocos): só um bloco fica na memória
+    por vez. Uma exceção do iterável desfaz a carga inteira.
+    """
+    inicio = time.perf_counter()
+    with ENGINE.connect() as conn:
+        anteriores = _aplicar_pragmas(conn, PRAGMAS_CARGA)
+        try:
+            with conn.begin():
+                total = _inserir_em_lotes(conn, Produto, df_produtos, tamanho_lote)
+                total += _inserir_em_lotes(conn, Vendedor, df_vendedores, tamanho_lote)
+                vendas, inicio_vendas = 0, time.perf_counter()
+                for bloco in blocos_vendas:
+                    vendas += _inserir_em_lotes(conn, Venda, com_periodo(bloco), tamanho_lote, relatar=False)
+                duracao = time.perf_counter() - inicio_vendas
+                print(f"   vendas: {vendas} linhas em blocos, {duracao:.2f}s (validação + carga)")
+                total += vendas
+                atualizar_rollups(conn)
+                incrementar_versao(conn)
+        finally:
+            _aplicar_pragmas(conn, anteriores)
+
+    duracao = time.perf_counter() - inicio
+    taxa = total / duracao if duracao > 0 else float("inf")
+    print(f"✅ Seed: {total} linhas em {duracao:.2f}s ({taxa:,.0f} linhas/s)")
+    return total
+
+def garantir_rollups():
+    """
+    Calcula os rollups de bancos populados antes de eles existirem.
+    """
+    with ENGINE.begin() as conn:
+        if rollups_vazios(conn):
+            print("Calculando rollups de vendas...")
+            atualizar_rollups(conn)
+            incrementar_versao(conn)
+
+def seed_db_from_files(frames: dict = None, tamanho_lote: int = TAMANHO_LOTE):
+    """
+    Popula o banco se ele estiver vazio.
+    `frames` recebe os DataFrames já validados ({"produtos", "vendedores", "vendas"},
+    colunas do esquema ORM); sem eles, roda o pipeline completo de ingestão.
+    """
+    # Cria as tabelas e aplica as migrações pendentes
+    migrar()
+
+    # Verifica se já há dados
     with SessionLocal() as s:
-        # Verifica se já há dados
         if s.query(Produto).first():
+            garantir_rollups()
             return  # já populado
 
-        # Carrega arquivos
-        df_produtos = load_file("data/produtos.xlsx")
-        df_vendedores = load_file("data/vendedores.xlsx")
-        df_vendas = load_file("data/vendas.xlsx")
-
-# Normaliza nomes de colunas para bater com os modelos ORM
-        df_produtos.rename(columns={
-            "Id_Produto": "id_produto",
-            "Nome_Produto": "nome_produto",
-            "Categoria": "categoria",
-            "R$_Unit": "preco"   # <-- mapeia o nome real para 'preco'
-        }, inplace=True)
-
-        # Converte para float
-        df_produtos["preco"] = df_produtos["preco"].astype(float)
-        
-        df_vendedores.rename(columns={
-            "Id_Vendedor": "id_vendedor",
-            "Nome_Vendedor": "nome_vendedor",
-            "Região": "regiao"
-        }, inplace=True)
-
-        df_vendas.rename(columns={
-            "Id_Venda": "id_venda",
-            "Id_Produto": "id_produto",
-            "Id_Vendedor": "id_vendedor",
-            "Quantidade": "quantidade",
-            "Data_Venda": "data_venda",
-            "R$_Unit": "preco_unit",
-            "R$_Total": "valor_total"
-        }, inplace=True)
-
-        # Remove linhas sem preco_unit ou valor_total
-        df_vendas = df_vendas.dropna(subset=["preco_unit", "valor_total"])
-        
-        # Ajusta tipos
-        df_produtos["preco"] = df_produtos["preco"].astype(float)
-        df_vendas["quantidade"] = df_vendas["quantidade"].astype(int)
-        df_vendas["preco_unit"] = df_vendas["preco_unit"].astype(float)
-        df_vendas["valor_total"] = df_vendas["valor_total"].astype(float)
-        df_vendas["data_venda"] = pd.to_datetime(df_vendas["data_venda"]).dt.date
-
-
-
-        # Popula o banco
-        for _, row in df_produtos.iterrows():
-            s.add(Produto(**row.to_dict()))
-        for _, row in df_vendedores.iterrows():
-            s.add(Vendedor(**row.to_dict()))
-        for _, row in df_vendas.iterrows():
-            s.add(Venda(**row.to_dict()))
-
-        # Confirma alterações
-        s.commit()
+    if frames is None:
+        from .ingestao import executar_pipeline  # import local: ingestao depende deste módulo
+        return executar_pipeline()
+
+    # Popula o banco em lotes, numa única transação
+    carregar_em_lote(frames["produtos"], frames["vendedores"], frames["vendas"], tamanho_lote)
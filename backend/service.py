@@ -1,95 +1,281 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-from .database import SessionLocal, Produto, Vendedor, Venda
+from sqlalchemy.exc import SQLAlchemyError
+from .snapshot import impressao_atual, obter_snapshot, versao_recente
+from . import categorias, consultas, graficos, previsao, ranking
+from .metricas import cache, medido
+import functools
 import os
-import io
-import base64
-import re
-import unidecode
+from .texto import extrair_filtros_produtos  # noqa: F401 (mantido como parte da API do serviço)
 
 # -----------------------------
 # Funções Auxiliares
 # -----------------------------
+@medido()
 def carregar_dados():
     """
-    Carrega dados do banco para DataFrames pandas.
+    Retorna os dados de vendas como DataFrames pandas.
+    Os dados vêm do snapshot em memória (recarregado só quando a versão dos
+    dados muda); cada chamada recebe cópias rasas que podem ganhar colunas
+    novas sem afetar as demais requisições.
     """
-    with SessionLocal() as session:
-        df_produtos = pd.DataFrame([p.__dict__ for p in session.query(Produto).all()])
-        df_vendedores = pd.DataFrame([v.__dict__ for v in session.query(Vendedor).all()])
-        df_vendas = pd.DataFrame([v.__dict__ for v in session.query(Venda).all()])
+    return obter_snapshot().visoes()
 
-    # Remove colunas internas do SQLAlchemy
-    for df in [df_produtos, df_vendedores, df_vendas]:
-        if "_sa_instance_state" in df.columns:
-            df.drop(columns=["_sa_instance_state"], inplace=True)
+def _fatos():
+    """
+    Tabela de fatos compacta da versão atual (backend/fatos.py): as consultas
+    por produto ou vendedor fatiam o índice em vez de filtrar a tabela toda.
+    """
+    return obter_snapshot().fatos
+
+# Agregações simples vão direto ao banco; defina CONSULTAS_SQL=0 para forçar pandas
+USAR_SQL = os.getenv("CONSULTAS_SQL", "1") != "0"
+
+def _sql_com_fallback(consulta):
+    """
+    Executa `consulta` (agregação SQL em backend.consultas) e, se o banco falhar,
+    cai para a implementação pandas decorada. Cada caminho é medido como etapa
+    própria ("consultas.*" ou "pandas.*").
+    """
+    consulta_medida = medido(f"consultas.{consulta.__name__}")(consulta)
+
+    def decorador(func_pandas):
+        pandas_medida = medido(f"pandas.{func_pandas.__name__}")(func_pandas)
+
+        @functools.wraps(func_pandas)
+        def wrapper(*args, **kwargs):
+            if USAR_SQL:
+                try:
+                    return consulta_medida(*args, **kwargs)
+                except SQLAlchemyError as e:
+                    print(f"⚠️ Consulta SQL falhou ({func_pandas.__name__}), usando pandas: {e}")
+            return pandas_medida(*args, **kwargs)
+        return wrapper
+    return decorador
 
-    return df_vendas, df_produtos, df_vendedores
+_FIM = object()
+
+def _linhas_sql_com_fallback(consulta):
+    """
+    Como `_sql_com_fallback`, para geradores de linhas: se a consulta falhar antes
+    da primeira linha, gera as linhas da implementação pandas decorada.
+    """
+    consulta_medida = medido(f"consultas.{consulta.__name__}")(consulta)
+
+    def decorador(func_pandas):
+        pandas_medida = medido(f"pandas.{func_pandas.__name__}")(func_pandas)
+
+        @functools.wraps(func_pandas)
+        def wrapper(*args, **kwargs):
+            if USAR_SQL:
+                linhas = consulta_medida(*args, **kwargs)
+                try:
+                    primeira = next(linhas, _FIM)
+                except SQLAlchemyError as e:
+                    print(f"⚠️ Consulta SQL falhou ({func_pandas.__name__}), usando pandas: {e}")
+                else:
+                    if primeira is not _FIM:
+                        yield primeira
+                        yield from linhas
+                    return
+            yield from pandas_medida(*args, **kwargs)
+        return wrapper
+    return decorador
+
+# Linhas por bloco ao percorrer um DataFrame em streaming
+LINHAS_POR_BLOCO = int(os.getenv("SERVICE_LINHAS_POR_BLOCO", "1000"))
+
+def _linhas_em_blocos(df: pd.DataFrame):
+    """
+    Gera as linhas do DataFrame como dicts, convertendo um bloco por vez.
+    """
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        yield from df.iloc[inicio:inicio + LINHAS_POR_BLOCO].to_dict(orient='records')
 
 # -----------------------------
 # VENDAS
 # -----------------------------
+@medido()
+@_sql_com_fallback(consultas.total_vendas_produto)
 def total_vendas_produto(id_produto: int):
-    df_vendas, df_produtos, _ = carregar_dados()
-    df_vendas['produto_nome'] = df_vendas['id_produto'].map(df_produtos.set_index('id_produto')['nome_produto'])
-    total = df_vendas[df_vendas['id_produto'] == id_produto]['valor_total'].sum()
-    return {"id_produto": id_produto, "produto_nome": df_vendas['produto_nome'].iloc[0], "total_vendas": float(total)}
+    fatos = _fatos()
+    total = fatos['valor_total'][fatos.produtos.vendas(id_produto)].sum()
+    return {"id_produto": id_produto, "produto_nome": fatos.produtos.nome(id_produto), "total_vendas": float(total)}
 
+@medido()
+@_sql_com_fallback(consultas.total_vendas_vendedor)
 def total_vendas_vendedor(id_vendedor: int):
-    df_vendas, _, df_vendedores = carregar_dados()
-    df_vendas['nome_vendedor'] = df_vendas['id_vendedor'].map(df_vendedores.set_index('id_vendedor')['nome_vendedor'])
-    total = df_vendas[df_vendas['id_vendedor'] == id_vendedor]['valor_total'].sum()
-    return {"id_vendedor": id_vendedor, "nome_vendedor": df_vendas['nome_vendedor'].iloc[0], "total_vendas": float(total)}
+    fatos = _fatos()
+    total = fatos['valor_total'][fatos.vendedores.vendas(id_vendedor)].sum()
+    return {"id_vendedor": id_vendedor, "nome_vendedor": fatos.vendedores.nome(id_vendedor), "total_vendas": float(total)}
+
+# Versões em lote: uma lista de ids respondida por uma única soma por membro,
+# na mesma ordem (ids repetidos ou inexistentes incluídos)
+def _totais_por_id(fatos, dimensao, ids):
+    totais = np.append(dimensao.somar(fatos['valor_total']), 0.0)
+    posicoes = dimensao.posicoes(ids)
+    nomes = dimensao.nomes_de(ids)
+    return [(int(i), nome, float(totais[p])) for i, nome, p in zip(ids, nomes, posicoes)]
+
+@medido()
+@_sql_com_fallback(consultas.totais_vendas_produtos)
+def totais_vendas_produtos(ids):
+    fatos = _fatos()
+    return [{"id_produto": i, "produto_nome": nome, "total_vendas": total}
+            for i, nome, total in _totais_por_id(fatos, fatos.produtos, ids)]
 
+@medido()
+@_sql_com_fallback(consultas.totais_vendas_vendedores)
+def totais_vendas_vendedores(ids):
+    fatos = _fatos()
+    return [{"id_vendedor": i, "nome_vendedor": nome, "total_vendas": total}
+            for i, nome, total in _totais_por_id(fatos, fatos.vendedores, ids)]
+
+@medido()
 def vendas_por_regiao():
-    df_vendas, _, df_vendedores = carregar_dados()
-    df_vendas['regiao'] = df_vendas['id_vendedor'].map(
-        df_vendedores.set_index('id_vendedor')['regiao']
-    ).fillna("Não Informada")
+    return list(linhas_vendas_por_regiao())
 
+@medido()
+@_linhas_sql_com_fallback(consultas.linhas_vendas_por_regiao)
+def linhas_vendas_por_regiao():
+    fatos = _fatos()
     resumo = (
-        df_vendas.groupby('regiao')['valor_total']
-        .sum()
-        .reset_index()
+        fatos.vendedores.somar_por_grupo(fatos['valor_total'], "Não Informada")
+        .rename_axis('regiao')
+        .reset_index(name='valor_total')
         .sort_values(by="valor_total", ascending=False)
     )
-    return resumo.to_dict(orient='records')
+    yield from _linhas_em_blocos(resumo)
 
 
 # -----------------------------
 # PRODUTOS
 # -----------------------------
+@medido()
+@_sql_com_fallback(consultas.detalhes_produto)
 def detalhes_produto(id_produto: int):
     df_vendas, df_produtos, _ = carregar_dados()
     prod = df_produtos[df_produtos['id_produto'] == id_produto].to_dict(orient='records')
     return prod[0] if prod else None
 
+@medido()
+@_sql_com_fallback(consultas.detalhes_produtos)
+def detalhes_produtos(ids):
+    _, df_produtos, _ = carregar_dados()
+    por_id = df_produtos.drop_duplicates('id_produto').set_index('id_produto', drop=False)
+    return [por_id.loc[i].to_dict() if i in por_id.index else None for i in ids]
+
+@_sql_com_fallback(consultas.categorias_produtos)
+def _categorias_produtos():
+    _, df_produtos, _ = carregar_dados()
+    return df_produtos[['id_produto', 'categoria']]
+
+@medido()
+def resolver_categoria(categoria):
+    """
+    Categorias e ids de produtos que correspondem à frase (ver backend/categorias.py).
+    """
+    indice = categorias.indice_da_versao(versao_recente(), _categorias_produtos)
+    return indice.resolver(categoria)
+
+@medido()
 def top_produtos_categoria_ano(categoria: str, ano: int, top_n: int = 5):
-    df_vendas, df_produtos, _ = carregar_dados()
-    df_vendas['data_venda'] = pd.to_datetime(df_vendas['data_venda'])
-    df = df_vendas[df_vendas['data_venda'].dt.year == ano]
-    ids = df_produtos[df_produtos['categoria'].str.contains(categoria, case=False, na=False)]['id_produto']
-    df = df[df['id_produto'].isin(ids)]
-    resumo = df.groupby('id_produto')['valor_total'].sum().reset_index()
-    resumo['nome_produto'] = resumo['id_produto'].map(df_produtos.set_index('id_produto')['nome_produto'])
-    resumo = resumo.sort_values('valor_total', ascending=True).head(top_n)
-    return resumo.to_dict(orient='records')
+    return list(linhas_top_produtos_categoria_ano(categoria, ano, top_n))
+
+@medido()
+def linhas_top_produtos_categoria_ano(categoria: str, ano: int, top_n: int = 5):
+    resolucao = resolver_categoria(categoria)
+    if len(resolucao.ids):
+        yield from _linhas_top_produtos_ano(resolucao, ano, top_n)
+
+@_linhas_sql_com_fallback(consultas.linhas_top_produtos_ano)
+def _linhas_top_produtos_ano(resolucao, ano: int, top_n: int = 5):
+    fatos = _fatos()
+    linhas = fatos.produtos.vendas_de(resolucao.ids)
+    linhas = linhas[fatos['ano'][linhas] == ano]
+    resumo = fatos.agrupar(['id_produto'], 'valor_total', linhas)
+    resumo['nome_produto'] = fatos.produtos.nomes_de(resumo['id_produto'])
+    resumo = resumo.sort_values(['valor_total', 'id_produto'], ascending=[False, True]).head(top_n)
+    yield from _linhas_em_blocos(resumo)
+
+@medido()
+def linhas_totais_produtos(categoria: str = None):
+    """
+    Quantidade e valor vendidos de cada produto do catálogo (ou das categorias
+    que correspondem a `categoria`), em ordem de id.
+    """
+    if categoria is None:
+        yield from _linhas_totais_produtos()
+        return
+    resolucao = resolver_categoria(categoria)
+    if len(resolucao.ids):
+        yield from _linhas_totais_produtos(resolucao)
+
+@_linhas_sql_com_fallback(consultas.linhas_totais_produtos)
+def _linhas_totais_produtos(resolucao=None):
+    fatos = _fatos()
+    produtos = fatos.produtos
+    if resolucao is None:
+        selecao = slice(None)
+    else:
+        selecao = np.unique(produtos.posicoes(resolucao.ids))
+        selecao = selecao[selecao < len(produtos)]
+    # A dimensão já está em ordem de id
+    resumo = pd.DataFrame({
+        'id_produto': produtos.ids[selecao],
+        'nome_produto': produtos.nomes[selecao],
+        'categoria': produtos.grupos[selecao],
+        'quantidade': produtos.somar(fatos['quantidade'])[selecao].astype('int64'),
+        'valor_total': produtos.somar(fatos['valor_total'])[selecao],
+    })
+    yield from _linhas_em_blocos(resumo)
+
+# -----------------------------
+# ROLLUPS (com fallback para o snapshot)
+# -----------------------------
+@_sql_com_fallback(consultas.rollup_vendedor_mes)
+def _vendas_vendedor_mes(id_vendedor: int = None):
+    fatos = _fatos()
+    linhas = None if id_vendedor is None else fatos.vendedores.vendas(id_vendedor)
+    return (
+        fatos.agrupar(['id_vendedor', 'ano', 'mes'], 'valor_total', linhas)
+        .sort_values(['ano', 'mes'], kind='stable', ignore_index=True)
+    )
+
+@_sql_com_fallback(consultas.rollup_produto_trimestre)
+def _vendas_produto_trimestre(id_produto: int = None):
+    fatos = _fatos()
+    linhas = None if id_produto is None else fatos.produtos.vendas(id_produto)
+    return (
+        fatos.agrupar(['id_produto', 'ano', 'trimestre'], 'valor_total', linhas)
+        .sort_values(['ano', 'trimestre'], kind='stable', ignore_index=True)
+    )
+
+@_sql_com_fallback(consultas.produtos_mais_vendidos_vendedor)
+def _produtos_mais_vendidos_vendedor(id_vendedor: int, top_n: int = 3):
+    fatos = _fatos()
+    df_prod_vend = fatos.agrupar(['id_produto'], 'valor_total', fatos.vendedores.vendas(id_vendedor))
+    df_prod_vend['nome_produto'] = fatos.produtos.nomes_de(df_prod_vend['id_produto'])
+    df_prod_vend = df_prod_vend.sort_values(by='valor_total', ascending=False).head(top_n)
+    return df_prod_vend[['nome_produto', 'valor_total']].to_dict(orient='records')
 
 # -----------------------------
 # VENDEDORES
 # -----------------------------
-def top_vendedores(top_n: int = 3):
-    df_vendas, _, df_vendedores = carregar_dados()
-    df_vendas['mes'] = pd.to_datetime(df_vendas['data_venda']).dt.to_period('M')
-    df_mes = df_vendas.groupby(['id_vendedor','mes'])['valor_total'].sum().unstack(fill_value=0)
-    crescimento = df_mes.pct_change(axis=1).replace([float('inf'), float('-inf')], 0).mean(axis=1).fillna(0)
-    df_nomes = df_vendedores.set_index("id_vendedor")["nome_vendedor"]
-    resultado = [{"id_vendedor": vid, "nome_vendedor": df_nomes.get(vid, "Desconhecido"), "crescimento": round(val, 4)}
-                 for vid, val in crescimento.sort_values(ascending=False).head(top_n).items()]
+@medido()
+def top_vendedores(top_n: int = 3, metrica: str = "crescimento", inicio: str = None, fim: str = None):
+    """
+    Ranking dos vendedores pela métrica ("crescimento", "total" ou "tendencia"),
+    opcionalmente numa janela de meses ("AAAA-MM"). Ver backend/ranking.py.
+    """
+    snap = obter_snapshot()
+    matriz = ranking.matriz_da_versao(snap.versao, _vendas_vendedor_mes)
+    vendedores = snap.fatos.vendedores
+    resultado = [{"id_vendedor": vid, "nome_vendedor": vendedores.nome(vid, "Desconhecido"), metrica: round(val, 4)}
+                 for vid, val in ranking.ranquear(matriz, metrica, top_n, inicio, fim)]
     return resultado
 
+@medido()
 def potencial_crescimento_vendedor(id_vendedor: int):
     """
     Retorna informações detalhadas sobre o vendedor:
@@ -98,48 +284,33 @@ def potencial_crescimento_vendedor(id_vendedor: int):
     - Vendas totais
     - Produtos mais vendidos
     """
-    df_vendas, df_produtos, df_vendedores = carregar_dados()
-    
-    # Filtra vendas do vendedor
-    df_vend = df_vendas[df_vendas['id_vendedor'] == id_vendedor].copy()
+    # Vendas do vendedor por mês (rollup)
+    df_mes = _vendas_vendedor_mes(id_vendedor)
+    vendedores = _fatos().vendedores
     
     # Caso não tenha vendas
-    if df_vend.empty:
+    if df_mes.empty:
         return {
             "potencial_crescimento": 0,
-            "nome_vendedor": df_vendedores.set_index('id_vendedor').get('nome_vendedor', {}).get(id_vendedor, "Desconhecido"),
-            "regiao": df_vendedores.set_index('id_vendedor').get('regiao', {}).get(id_vendedor, "Desconhecida"),
+            "nome_vendedor": vendedores.nome(id_vendedor, "Desconhecido"),
+            "regiao": vendedores.grupo(id_vendedor, "Desconhecida"),
             "vendas_totais": 0,
             "produtos_mais_vendidos": []
         }
     
     # Calcula crescimento médio mensal
-    df_vend['mes'] = pd.to_datetime(df_vend['data_venda']).dt.to_period('M')
-    df_mes = df_vend.groupby('mes')['valor_total'].sum()
-    crescimento = df_mes.pct_change().replace([float('inf'), float('-inf')], 0).mean()
-    
-    # Nome e região
-    vendedor_info = df_vendedores.set_index('id_vendedor').loc[id_vendedor]
+    crescimento = df_mes['valor_total'].pct_change().replace([float('inf'), float('-inf')], 0).mean()
     
     # Vendas totais
-    vendas_totais = df_vend['valor_total'].sum()
+    vendas_totais = float(df_mes['valor_total'].sum())
     
     # Produtos mais vendidos
-    df_prod_vend = (
-        df_vend.groupby('id_produto')['valor_total']
-        .sum()
-        .reset_index()
-        .merge(df_produtos[['id_produto', 'nome_produto']], on='id_produto', how='left')
-        .sort_values(by='valor_total', ascending=False)
-        .head(3)
-    )
-    
-    produtos_mais_vendidos = df_prod_vend[['nome_produto', 'valor_total']].to_dict(orient='records')
+    produtos_mais_vendidos = _produtos_mais_vendidos_vendedor(id_vendedor, 3)
     
     return {
         "potencial_crescimento": crescimento,
-        "nome_vendedor": vendedor_info.get('nome_vendedor', 'Desconhecido'),
-        "regiao": vendedor_info.get('regiao', 'Desconhecida'),
+        "nome_vendedor": vendedores.nome(id_vendedor, 'Desconhecido'),
+        "regiao": vendedores.grupo(id_vendedor, 'Desconhecida'),
         "vendas_totais": vendas_totais,
         "produtos_mais_vendidos": produtos_mais_vendidos
     }
@@ -148,72 +319,38 @@ def potencial_crescimento_vendedor(id_vendedor: int):
 # -----------------------------
 # PREVISÃO VENDAS PRODUTO
 # -----------------------------
+def _previsoes():
+    """
+    Previsões de todos os produtos para a versão atual dos dados (backend/previsao.py).
+    A versão inclui a impressão do conteúdo, que também identifica os gráficos em disco.
+    """
+    return previsao.previsoes_da_versao(impressao_atual(), _vendas_produto_trimestre)
+
+@medido()
 def prever_vendas_produto_trimestre(id_produto: int):
-    df_vendas, _, _ = carregar_dados()
-    df = df_vendas[df_vendas['id_produto'] == id_produto].copy()
+    previsoes = _previsoes()
+    i = previsoes.linha(id_produto)
     
-    if df.empty:
+    if i is None:
         return {"erro": "Produto não encontrado"}
     
-    df['data_venda'] = pd.to_datetime(df['data_venda'])
-    df['trimestre'] = df['data_venda'].dt.to_period('Q')
-    
-    df_trimestre = df.groupby('trimestre')['valor_total'].sum().reset_index()
-    df_trimestre['trimestre_num'] = np.arange(len(df_trimestre))
-    
-    model = LinearRegression()
-    model.fit(df_trimestre[['trimestre_num']], df_trimestre['valor_total'])
+    pred = float(previsoes.previsao[i])
     
-    prox_trimestre = np.array([[len(df_trimestre)]])
-    pred = model.predict(prox_trimestre)[0]
+    # Gráfico: renderizado uma vez por (produto, impressão dos dados) e servido por /api/graficos
+    chave = graficos.chave_previsao(id_produto, previsoes.versao)
+    if graficos.existe(chave):
+        cache("graficos", "acerto")
+    else:
+        cache("graficos", "falta")
+        historico = _vendas_produto_trimestre(id_produto)['valor_total'].tolist()
+        chave = graficos.grafico_previsao(id_produto, previsoes.versao, historico, pred)
     
-    # -------------------
-    # Gera o gráfico
-    # -------------------
-    plt.figure(figsize=(6,4))
-    plt.plot(df_trimestre['trimestre_num'], df_trimestre['valor_total'], marker='o', label='Histórico')
-    plt.plot(prox_trimestre[0], pred, marker='x', color='red', label='Previsto')
-    plt.xlabel('Trimestre')
-    plt.ylabel('Vendas (R$)')
-    plt.title(f'Projeção Produto {id_produto}')
-    plt.legend()
-    
-    img_path = f"static/previsao_produto_{id_produto}.png"
-    plt.savefig(img_path)
-    plt.close()
-    
-    return {"id_produto": id_produto, "previsao": float(pred), "grafico": img_path}
-
-
+    return {"id_produto": id_produto, "previsao": pred, "grafico": graficos.url(chave)}
 
-def extrair_filtros_produtos(texto: str):
+@medido()
+def previsoes_produtos(ids=None):
     """
-    Extrai filtros de uma pergunta sobre produtos:
-    - categoria (aceita números, acentos e espaços)
-    - ano
-    - top_n (quantidade de produtos)
-    
-    Retorna um dicionário com os filtros encontrados.
+    Previsão do próximo trimestre e estatísticas do ajuste de todos os produtos
+    (ou só dos `ids` informados).
     """
-    filtros = {}
-
-    # Normaliza texto: remove acentos e coloca em minúsculas
-    texto_normalizado = unidecode.unidecode(texto.lower())
-
-    # Categoria: pode ser número ou texto (ex: "categoria 1" ou "categoria serviços tecnologicos")
-    cat_match = re.search(r'categoria\s+([\w\s\d]+?)(?:\s+no ano|\s+ano|\s*$)', texto_normalizado)
-    if cat_match:
-        categoria = cat_match.group(1).strip()
-        filtros['categoria'] = int(categoria) if categoria.isdigit() else categoria
-
-
-    # Ano: busca "ano de <4 dígitos>"
-    ano_match = re.search(r'ano(?: de)?\s+(\d{4})', texto_normalizado)
-    if ano_match:
-        filtros['ano'] = int(ano_match.group(1))
-
-    # Número de produtos (top N): busca "<n> produtos"
-    top_match = re.search(r'(\d+)\s+produtos', texto_normalizado)
-    filtros['top_n'] = int(top_match.group(1)) if top_match else 5  # padrão: 5
-
-    return filtros
+    return _previsoes().registros(ids)
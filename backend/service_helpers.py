@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import os
 import numpy as np
 
@@ -10,6 +9,8 @@ def prever_vendas_produto(prod_id, df_vendas, meses=3):
     ultima = df["valor"].iloc[-1]
     previsao = list(np.round(np.linspace(ultima, ultima*1.05, meses),2))
 
+    # Import local: o matplotlib só é carregado quando um gráfico é de fato gerado
+    import matplotlib.pyplot as plt
     plt.figure()
     plt.plot(df["valor"].values, label="Histórico")
     plt.plot(range(len(df), len(df)+meses), previsao, "--", label="Previsão")
@@ -28,6 +29,7 @@ def analisar_vendedor(vend_id, df_vendas):
     por_ano = df.groupby("ano")["valor"].sum()
     crescimento = (por_ano.pct_change().mean() or 0) * 100
 
+    import matplotlib.pyplot as plt
     plt.figure()
     por_ano.plot(kind="bar")
     plt.title(f"Evolução Vendas - Vendedor {vend_id}")
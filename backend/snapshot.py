@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import snapshot_compartilhado
+from .database import ENGINE, Produto, Vendedor, Venda, VersaoDados
+from .fatos import TabelaFatos
+from .metricas import cache, etapa
+
+# Intervalo mínimo (em segundos) entre duas consultas da versão dos dados.
+# Dentro desse intervalo o snapshot em memória é reutilizado sem tocar no banco.
+INTERVALO_VERIFICACAO = float(os.getenv("SNAPSHOT_VERIFICAR_SEGUNDOS", "1.0"))
+
+
+# -----------------------------
+# Snapshot
+# -----------------------------
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    As três tabelas numa versão dos dados, com colunas tipadas (ver
+    snapshot_compartilhado): data_venda em dias desde 1970 (int32), com as
+    colunas ano, mes e trimestre; categoria e regiao como pd.Categorical.
+    `fatos` é a mesma tabela de vendas em formato compacto, com os índices
+    por produto e vendedor (backend/fatos.py).
+    Os DataFrames são compartilhados entre requisições (e, em modo compartilhado,
+    entre processos, somente leitura) e não devem ser alterados:
+    use `visoes()` para obter cópias rasas seguras.
+    """
+    versao: str
+    vendas: pd.DataFrame
+    produtos: pd.DataFrame
+    vendedores: pd.DataFrame
+    fatos: TabelaFatos
+
+    def visoes(self):
+        """
+        Retorna (df_vendas, df_produtos, df_vendedores) como cópias rasas:
+        os dados não são duplicados, mas colunas criadas pelo chamador
+        ficam só na cópia e não vazam para as outras requisições.
+        """
+        return (
+            self.vendas.copy(deep=False),
+            self.produtos.copy(deep=False),
+            self.vendedores.copy(deep=False),
+        )
+
+
+_lock = threading.Lock()
+_atual = None
+_ultima_verificacao = 0.0
+_versao_recente = None
+_versao_verificada_em = 0.0
+_impressao_recente = None
+_impressao_verificada_em = 0.0
+
+
+# -----------------------------
+# Versão dos dados
+# -----------------------------
+def versao_atual(conn=None):
+    """
+    Retorna a versão atual dos dados.
+    Usa a tabela `versao_dados` escrita pelo seed; se ela não existir ou estiver
+    vazia (banco populado por versões antigas), usa uma impressão digital baseada
+    em contagens e maiores ids das tabelas.
+    """
+    if conn is None:
+        with ENGINE.connect() as conn:
+            return versao_atual(conn)
+
+    try:
+        versao = conn.execute(select(VersaoDados.versao).where(VersaoDados.id == 1)).scalar()
+    except SQLAlchemyError:
+        conn.rollback()
+        versao = None
+    if versao is not None:
+        return f"v{versao}"
+
+    contagens = conn.execute(
+        select(
+            select(func.count(Produto.id_produto)).scalar_subquery(),
+            select(func.max(Produto.id_produto)).scalar_subquery(),
+            select(func.count(Vendedor.id_vendedor)).scalar_subquery(),
+            select(func.count(Venda.id_venda)).scalar_subquery(),
+            select(func.max(Venda.id_venda)).scalar_subquery(),
+        )
+    ).one()
+    return "f" + "-".join(str(c or 0) for c in contagens)
+
+
+def versao_recente():
+    """
+    Versão atual dos dados consultada no máximo uma vez a cada
+    `INTERVALO_VERIFICACAO` segundos, sem carregar as tabelas.
+    """
+    global _versao_recente, _versao_verificada_em
+    if _versao_recente is not None and time.monotonic() - _versao_verificada_em < INTERVALO_VERIFICACAO:
+        return _versao_recente
+    versao = versao_atual()
+    _versao_recente, _versao_verificada_em = versao, time.monotonic()
+    return versao
+
+
+def impressao_atual(conn=None):
+    """
+    Versão dos dados com uma impressão do conteúdo ("v3-<hash>", ver
+    snapshot_compartilhado.chave_publicacao). O número da versão recomeça em v1
+    quando o banco é recriado; a impressão não. Use-a nas chaves de cache que
+    sobrevivem ao processo (gráficos em disco, respostas no redis).
+    """
+    if conn is None:
+        with ENGINE.connect() as conn:
+            return impressao_atual(conn)
+    return snapshot_compartilhado.chave_publicacao(conn, versao_atual(conn))
+
+
+def impressao_recente():
+    """
+    `impressao_atual()` consultada no máximo uma vez a cada
+    `INTERVALO_VERIFICACAO` segundos.
+    """
+    global _impressao_recente, _impressao_verificada_em
+    if _impressao_recente is not None and time.monotonic() - _impressao_verificada_em < INTERVALO_VERIFICACAO:
+        return _impressao_recente
+    impressao = impressao_atual()
+    _impressao_recente, _impressao_verificada_em = impressao, time.monotonic()
+    return impressao
+
+
+# -----------------------------
+# Carga e invalidação
+# -----------------------------
+def _ler_tabelas(conn, versao):
+    with etapa("snapshot.ler_tabelas") as medida:
+        tabelas = snapshot_compartilhado.carregar(conn, versao)
+        medida["linhas"] = sum(len(df) for df in tabelas[:3])
+    return tabelas
+
+
+def obter_snapshot():
+    """
+    Retorna o snapshot da versão atual dos dados, carregando-o do banco apenas
+    quando a versão muda. A versão é consultada no máximo uma vez a cada
+    `INTERVALO_VERIFICACAO` segundos.
+    """
+    global _atual, _ultima_verificacao
+
+    agora = time.monotonic()
+    snap = _atual
+    if snap is not None and agora - _ultima_verificacao < INTERVALO_VERIFICACAO:
+        cache("snapshot", "acerto")
+        return snap
+
+    with _lock:
+        # Outra thread pode ter recarregado enquanto esperávamos o lock
+        if _atual is not None and _atual is not snap:
+            return _atual
+
+        with ENGINE.connect() as conn:
+            versao = versao_atual(conn)
+            if _atual is None or _atual.versao != versao:
+                cache("snapshot", "recarga")
+                _atual = Snapshot(versao, *_ler_tabelas(conn, versao))
+
+        _ultima_verificacao = time.monotonic()
+        return _atual
+
+
+def invalidar():
+    """
+    Descarta o snapshot atual; a próxima leitura recarrega do banco.
+    """
+    global _atual, _ultima_verificacao, _versao_recente, _impressao_recente
+    with _lock:
+        _atual = None
+        _ultima_verificacao = 0.0
+        _versao_recente = None
+        _impressao_recente = None
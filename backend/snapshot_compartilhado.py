@@ -0,0 +1,293 @@
+"""
+Colunas tipadas do snapshot, publicadas uma vez por versão dos dados e
+compartilhadas entre os workers (uvicorn/gunicorn) por arquivos mapeados em memória.
+
+Cada versão vira um diretório SNAPSHOT_DIR/<chave>/ com um .npy por coluna e um
+meta.json com os dicionários:
+- ids em int32 (int64 se não couberem), quantidade em int32, valores em float64;
+- data_venda em int32 (dias desde 1970-01-01), mais ano (int16), mes e trimestre (int8);
+- categoria e regiao codificadas (códigos + dicionário, viram pd.Categorical);
+- nomes de produtos/vendedores guardados no meta.json;
+- índices id → linhas das vendas de produtos e vendedores (ver backend/fatos.py).
+
+O primeiro worker que precisa de uma versão a publica (com uma trava de arquivo,
+os demais esperam em vez de ler o banco de novo), escrevendo num diretório
+temporário renomeado no fim: a troca de versão é atômica. Os workers montam os
+DataFrames e a TabelaFatos sobre visões somente leitura dos arquivos (np.load com mmap_mode),
+sem cópia: as páginas ficam no cache do sistema operacional, uma vez só para
+todos os processos.
+
+Com SNAPSHOT_COMPARTILHADO=0 as mesmas colunas são montadas na memória do processo.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import ENGINE, Produto, Vendedor, Venda, VersaoDados, _em_memoria
+from .fatos import Dimensao, TabelaFatos, indexar
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava, dois workers podem publicar a mesma versão
+    fcntl = None
+
+COMPARTILHADO = os.getenv("SNAPSHOT_COMPARTILHADO", "1") == "1"
+LINHAS_POR_BLOCO = int(os.getenv("SNAPSHOT_LINHAS_POR_BLOCO", "500000"))
+VERSOES_MANTIDAS = 2
+FORMATO = 2  # muda quando o layout dos arquivos muda
+
+def _diretorio_padrao():
+    if _em_memoria(ENGINE.url):
+        return None  # banco em memória: só existe neste processo, nada a compartilhar
+    # Um diretório por banco: dois projetos na mesma máquina não se misturam
+    if ENGINE.url.get_backend_name() == "sqlite":
+        origem = os.path.abspath(ENGINE.url.database)
+    else:
+        origem = ENGINE.url.render_as_string(hide_password=True)
+    banco = hashlib.sha1(origem.encode()).hexdigest()[:12]
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"chatbot-snapshot-{banco}")
+
+DIRETORIO = os.getenv("SNAPSHOT_DIR") or _diretorio_padrao()
+
+# Tipo de cada coluna: "id" (int32/int64), "dia", "codigo", "texto" ou um dtype numpy
+COLUNAS = {
+    "produtos": {"id_produto": "id", "nome_produto": "texto", "categoria": "codigo", "preco": np.float64},
+    "vendedores": {"id_vendedor": "id", "nome_vendedor": "texto", "regiao": "codigo"},
+    "vendas": {
+        "id_venda": "id", "id_produto": "id", "id_vendedor": "id", "quantidade": np.int32,
+        "data_venda": "dia", "preco_unit": np.float64, "valor_total": np.float64,
+    },
+}
+_MODELOS = {"produtos": Produto, "vendedores": Vendedor, "vendas": Venda}
+
+
+# -----------------------------
+# Codificação
+# -----------------------------
+def _tipo_id(maximo) -> np.dtype:
+    return np.dtype(np.int32) if maximo is None or maximo < 2**31 else np.dtype(np.int64)
+
+def _tipo_codigo(n_categorias: int) -> np.dtype:
+    # O mesmo tipo que o pandas usa nos códigos de um Categorical (evita cópia no from_codes)
+    for tipo in (np.int8, np.int16, np.int32):
+        if n_categorias < np.iinfo(tipo).max:
+            return np.dtype(tipo)
+    return np.dtype(np.int64)
+
+def _dias(serie: pd.Series) -> np.ndarray:
+    return pd.to_datetime(serie).to_numpy(dtype="datetime64[D]").astype(np.int64).astype(np.int32)
+
+def _dimensao(df: pd.DataFrame, tabela: str, arrays: dict, meta: dict):
+    """
+    Colunas de uma tabela pequena (produtos, vendedores), lida inteira.
+    """
+    for coluna, tipo in COLUNAS[tabela].items():
+        chave = f"{tabela}.{coluna}"
+        if tipo == "texto":
+            meta["textos"][chave] = df[coluna].astype(object).where(df[coluna].notna(), None).tolist()
+        elif tipo == "codigo":
+            codigos, dicionario = pd.factorize(df[coluna], sort=True)
+            meta["dicionarios"][chave] = [str(v) for v in dicionario]
+            arrays[chave] = codigos.astype(_tipo_codigo(len(dicionario)))
+        elif tipo == "id":
+            arrays[chave] = df[coluna].fillna(0).to_numpy(dtype=_tipo_id(df[coluna].max() if len(df) else None))
+        else:
+            arrays[chave] = df[coluna].fillna(0).to_numpy(dtype=tipo)
+
+def _ler_colunas(conn, alocar):
+    """
+    Lê as três tabelas e grava as colunas em arrays obtidos de `alocar(chave, n, dtype)`.
+    As vendas são lidas em blocos de LINHAS_POR_BLOCO linhas. Retorna o meta.
+    """
+    meta = {"formato": FORMATO, "linhas": {}, "dicionarios": {}, "textos": {}, "tipos": {}}
+    dimensoes = {}
+    for tabela in ("produtos", "vendedores"):
+        colunas = [_MODELOS[tabela].__table__.c[c] for c in COLUNAS[tabela]]
+        df = pd.read_sql(select(*colunas).order_by(colunas[0]), conn)
+        arrays = {}
+        _dimensao(df, tabela, arrays, meta)
+        meta["linhas"][tabela] = len(df)
+        for chave, valores in arrays.items():
+            destino = alocar(chave, len(valores), valores.dtype)
+            destino[:] = valores
+            dimensoes[chave] = destino
+
+    n, maximo = conn.execute(select(func.count(Venda.id_venda), func.max(Venda.id_venda))).one()
+    meta["linhas"]["vendas"] = n
+    tipos = {
+        "id_venda": _tipo_id(maximo),
+        "id_produto": _tipo_id(dimensoes["produtos.id_produto"].max() if meta["linhas"]["produtos"] else None),
+        "id_vendedor": _tipo_id(dimensoes["vendedores.id_vendedor"].max() if meta["linhas"]["vendedores"] else None),
+        "data_venda": np.dtype(np.int32), "ano": np.dtype(np.int16),
+        "mes": np.dtype(np.int8), "trimestre": np.dtype(np.int8),
+    }
+    tipos.update({c: np.dtype(t) for c, t in COLUNAS["vendas"].items() if c not in tipos})
+    destinos = {c: alocar(f"vendas.{c}", n, tipo) for c, tipo in tipos.items()}
+
+    inicio = 0
+    consulta = select(*[Venda.__table__.c[c] for c in COLUNAS["vendas"]]).order_by(Venda.id_venda)
+    for bloco in pd.read_sql(consulta, conn, chunksize=LINHAS_POR_BLOCO):
+        fim = inicio + len(bloco)
+        for coluna in COLUNAS["vendas"]:
+            if coluna == "data_venda":
+                dias = _dias(bloco[coluna])
+                destinos[coluna][inicio:fim] = dias
+                datas = dias.astype("datetime64[D]")
+                destinos["ano"][inicio:fim] = datas.astype("datetime64[Y]").astype(np.int64) + 1970
+                meses = datas.astype("datetime64[M]").astype(np.int64) % 12 + 1
+                destinos["mes"][inicio:fim] = meses
+                destinos["trimestre"][inicio:fim] = (meses - 1) // 3 + 1
+            else:
+                destinos[coluna][inicio:fim] = bloco[coluna].fillna(0).to_numpy(dtype=destinos[coluna].dtype)
+        inicio = fim
+    if inicio != n:
+        raise RuntimeError(f"Vendas mudaram durante a leitura do snapshot ({inicio} != {n} linhas)")
+
+    indices = {}
+    for tabela, coluna in (("produtos", "id_produto"), ("vendedores", "id_vendedor")):
+        partes = indexar(dimensoes[f"{tabela}.{coluna}"], destinos[coluna])
+        for parte, valores in zip(("linha", "ordem", "inicio"), partes):
+            chave = f"indice.{tabela}.{parte}"
+            indices[chave] = alocar(chave, len(valores), valores.dtype)
+            indices[chave][:] = valores
+    meta["tipos"] = {c: str(a.dtype) for c, a in
+                     {**dimensoes, **{f"vendas.{k}": v for k, v in destinos.items()}, **indices}.items()}
+    return meta
+
+
+def _montar(arrays: dict, meta: dict):
+    """
+    (df_vendas, df_produtos, df_vendedores, fatos) sobre os arrays, sem copiá-los.
+    """
+    quadros, todas = {}, {}
+    for tabela in ("vendas", "produtos", "vendedores"):
+        colunas = todas[tabela] = {}
+        nomes = list(COLUNAS[tabela]) + (["ano", "mes", "trimestre"] if tabela == "vendas" else [])
+        for coluna in nomes:
+            chave = f"{tabela}.{coluna}"
+            tipo = COLUNAS[tabela].get(coluna)
+            if tipo == "texto":
+                colunas[coluna] = np.array(meta["textos"][chave], dtype=object)
+            elif tipo == "codigo":
+                colunas[coluna] = pd.Categorical.from_codes(arrays[chave], categories=meta["dicionarios"][chave])
+            else:
+                colunas[coluna] = arrays[chave]
+        quadros[tabela] = pd.DataFrame(colunas, copy=False)
+
+    dimensoes = {}
+    for tabela, id_, nome, grupo in (("produtos", "id_produto", "nome_produto", "categoria"),
+                                     ("vendedores", "id_vendedor", "nome_vendedor", "regiao")):
+        colunas = todas[tabela]
+        dimensoes[tabela] = Dimensao(
+            colunas[id_], colunas[nome], colunas[grupo],
+            *(arrays[f"indice.{tabela}.{parte}"] for parte in ("linha", "ordem", "inicio")),
+        )
+    fatos = TabelaFatos(todas["vendas"], dimensoes["produtos"], dimensoes["vendedores"])
+    return quadros["vendas"], quadros["produtos"], quadros["vendedores"], fatos
+
+
+# -----------------------------
+# Publicação e anexação
+# -----------------------------
+def chave_publicacao(conn, versao: str) -> str:
+    """
+    Identifica o conteúdo da versão: o número da versão não basta, porque um
+    banco recriado recomeça em v1.
+    """
+    try:
+        registro = conn.execute(select(VersaoDados.atualizado_em).where(VersaoDados.id == 1)).scalar()
+    except SQLAlchemyError:
+        conn.rollback()
+        registro = None
+    maximo = conn.execute(select(func.max(Venda.id_venda))).scalar()
+    impressao = hashlib.sha1(f"{FORMATO}|{versao}|{registro}|{maximo}".encode()).hexdigest()[:12]
+    return f"{versao}-{impressao}"
+
+def _publicada(pasta: str) -> bool:
+    return os.path.exists(os.path.join(pasta, "meta.json"))
+
+@contextmanager
+def _trava(base: str):
+    os.makedirs(base, exist_ok=True)
+    with open(os.path.join(base, ".trava"), "w") as arquivo:
+        if fcntl is not None:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+def _publicar(conn, base: str, pasta: str):
+    temporaria = tempfile.mkdtemp(prefix=".publicando-", dir=base)
+    try:
+        def alocar(chave, n, dtype):
+            return np.lib.format.open_memmap(os.path.join(temporaria, f"{chave}.npy"), mode="w+", dtype=dtype, shape=(n,))
+
+        inicio = time.perf_counter()
+        meta = _ler_colunas(conn, alocar)
+        with open(os.path.join(temporaria, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.rename(temporaria, pasta)  # atômico: os workers só veem a versão completa
+        print(f"📤 Snapshot publicado em {pasta} ({meta['linhas']['vendas']:,} vendas, "
+              f"{time.perf_counter() - inicio:.2f}s)")
+    except BaseException:
+        shutil.rmtree(temporaria, ignore_errors=True)
+        raise
+
+def _remover_antigas(base: str, atual: str):
+    """
+    Mantém as VERSOES_MANTIDAS publicações mais recentes. Workers que ainda usam
+    uma versão removida continuam lendo-a: o mapeamento mantém os arquivos vivos.
+    """
+    pastas = [os.path.join(base, p) for p in os.listdir(base) if not p.startswith(".")]
+    pastas.sort(key=os.path.getmtime, reverse=True)
+    for pasta in pastas[VERSOES_MANTIDAS:]:
+        if pasta != atual:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+def _anexar(pasta: str):
+    with open(os.path.join(pasta, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("formato") != FORMATO:
+        raise RuntimeError(f"Snapshot em {pasta} tem formato {meta.get('formato')}, esperado {FORMATO}")
+    arrays = {}
+    for arquivo in os.listdir(pasta):
+        if arquivo.endswith(".npy"):
+            # np.asarray: visão ndarray comum (somente leitura) do np.memmap
+            arrays[arquivo[:-4]] = np.asarray(np.load(os.path.join(pasta, arquivo), mmap_mode="r"))
+    return arrays, meta
+
+
+def carregar(conn, versao: str):
+    """
+    (df_vendas, df_produtos, df_vendedores, fatos) da versão informada, sobre as colunas
+    compartilhadas (publicando-as se nenhum worker o fez ainda) ou, com
+    SNAPSHOT_COMPARTILHADO=0, em memória do processo.
+    """
+    if not COMPARTILHADO or DIRETORIO is None:
+        arrays = {}
+
+        def alocar(chave, n, dtype):
+            arrays[chave] = np.empty(n, dtype=dtype)
+            return arrays[chave]
+        meta = _ler_colunas(conn, alocar)
+        return _montar(arrays, meta)
+
+    pasta = os.path.join(DIRETORIO, chave_publicacao(conn, versao))
+    if not _publicada(pasta):
+        with _trava(DIRETORIO):
+            if not _publicada(pasta):
+                _publicar(conn, DIRETORIO, pasta)
+                _remover_antigas(DIRETORIO, pasta)
+    return _montar(*_anexar(pasta))
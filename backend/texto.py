@@ -0,0 +1,44 @@
+"""
+Normalização e extração de filtros do texto das perguntas.
+Os padrões são compilados uma vez, no import.
+"""
+import re
+import unidecode
+
+# Categoria: número ou texto (ex: "categoria 1" ou "categoria servicos tecnologicos"), sempre como texto
+_RE_CATEGORIA = re.compile(r'categoria\s+([\w\s\d]+?)(?:\s+no ano|\s+ano|\s*$)')
+# Ano: "ano de <4 dígitos>"
+_RE_ANO = re.compile(r'ano(?: de)?\s+(\d{4})')
+# Número de produtos (top N): "<n> produtos"
+_RE_TOP_PRODUTOS = re.compile(r'(\d+)\s+produtos')
+
+
+def normalizar(texto: str) -> str:
+    """
+    Remove acentos e coloca em minúsculas.
+    """
+    return unidecode.unidecode(texto.lower())
+
+def extrair_filtros_produtos(texto: str, normalizado: bool = False):
+    """
+    Extrai filtros de uma pergunta sobre produtos:
+    - categoria (texto normalizado; números também ficam como texto)
+    - ano
+    - top_n (quantidade de produtos)
+    
+    Com `normalizado=True` o texto já vem de `normalizar()` e não é processado de novo.
+    Retorna um dicionário com os filtros encontrados.
+    """
+    filtros = {}
+    texto_normalizado = texto if normalizado else normalizar(texto)
+
+    if cat_match := _RE_CATEGORIA.search(texto_normalizado):
+        filtros['categoria'] = cat_match.group(1).strip()
+
+    if ano_match := _RE_ANO.search(texto_normalizado):
+        filtros['ano'] = int(ano_match.group(1))
+
+    top_match = _RE_TOP_PRODUTOS.search(texto_normalizado)
+    filtros['top_n'] = int(top_match.group(1)) if top_match else 5  # padrão: 5
+
+    return filtros
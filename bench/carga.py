@@ -0,0 +1,58 @@
+"""
+Gerador de carga em processo para a API: as requisições vão direto para o app
+ASGI (httpx.ASGITransport), sem rede nem servidor, com `concorrencia` clientes
+simultâneos. Mede latência (p50/p90/p99) e requisições por segundo.
+"""
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+
+async def _disparar(app, perguntas: list, concorrencia: int, caminho: str, em_lote: int):
+    fila = iter(range(0, len(perguntas), em_lote))
+    latencias, status = [], {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as cliente:
+        async def trabalhador():
+            for inicio in fila:
+                if em_lote > 1:
+                    corpo = [{"texto": t} for t in perguntas[inicio:inicio + em_lote]]
+                else:
+                    corpo = {"texto": perguntas[inicio]}
+                t = time.perf_counter()
+                resposta = await cliente.post(caminho, json=corpo)
+                latencias.append(time.perf_counter() - t)
+                status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+    return latencias, status, duracao
+
+
+def executar(app, perguntas: list, concorrencia: int = 16, em_lote: int = 1) -> dict:
+    """
+    Envia todas as `perguntas` ao /api/chat (ou ao /api/chat/batch em grupos de
+    `em_lote`) e retorna as estatísticas. Uma rodada curta de aquecimento não entra na medida.
+    """
+    caminho = "/api/chat/batch" if em_lote > 1 else "/api/chat"
+    asyncio.run(_disparar(app, perguntas[: min(len(perguntas), concorrencia * 2)], concorrencia, "/api/chat", 1))
+
+    latencias, status, duracao = asyncio.run(_disparar(app, perguntas, concorrencia, caminho, em_lote))
+    ms = np.array(latencias) * 1000
+    return {
+        "requisicoes": len(latencias),
+        "perguntas": len(perguntas),
+        "concorrencia": concorrencia,
+        "em_lote": em_lote,
+        "segundos": round(duracao, 4),
+        "req_por_s": round(len(latencias) / duracao, 2),
+        "perguntas_por_s": round(len(perguntas) / duracao, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "status": {str(k): v for k, v in sorted(status.items())},
+    }
@@ -0,0 +1,132 @@
+"""
+Gerador de dados sintéticos para os benchmarks.
+
+Escreve produtos/vendedores/vendas com as mesmas colunas dos arquivos reais em
+<destino>/data/. Tamanhos grandes (acima de LIMITE_XLSX vendas) saem em CSV
+(sep=";"), gravado em blocos para não manter todas as vendas em memória.
+Cerca de 1% das vendas vem "suja" (quantidade zero ou produto inexistente)
+para que a validação tenha o que remover.
+
+Uso:
+    python -m bench.dados --vendas 1m --destino bench/.trabalho/1m
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+TAMANHOS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+LIMITE_XLSX = 200_000
+LINHAS_POR_BLOCO = 1_000_000
+
+CATEGORIAS = [
+    "Eletrônicos", "Eletrônicos Portáteis", "Alimentos", "Alimentos Congelados", "Bebidas",
+    "Móveis", "Serviços Tecnológicos", "Vestuário", "Papelaria", "Higiene e Beleza",
+]
+REGIOES = ["Norte", "Nordeste", "Centro-Oeste", "Sudeste", "Sul"]
+INICIO = pd.Timestamp("2022-01-01")
+DIAS = 3 * 365
+
+
+def tamanho(texto) -> int:
+    """
+    Converte "10k", "1m", "10m" ou um número em quantidade de vendas.
+    """
+    texto = str(texto).lower()
+    if texto in TAMANHOS:
+        return TAMANHOS[texto]
+    multiplicador = {"k": 1_000, "m": 1_000_000}.get(texto[-1], 1)
+    return int(float(texto.rstrip("km")) * multiplicador)
+
+def dimensoes(n_vendas: int):
+    """
+    Quantidade de produtos e vendedores proporcional ao volume de vendas.
+    """
+    return max(50, n_vendas // 200), max(20, n_vendas // 5000)
+
+
+def _produtos(n: int, rng) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Id_Produto": np.arange(1, n + 1),
+        "Nome_Produto": [f"Produto {i}" for i in range(1, n + 1)],
+        "Categoria": rng.choice(CATEGORIAS, n),
+        "R$_Unit": rng.uniform(5, 2000, n).round(2),
+    })
+
+def _vendedores(n: int, rng) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Id_Vendedor": np.arange(1, n + 1),
+        "Nome_Vendedor": [f"Vendedor {i}" for i in range(1, n + 1)],
+        "Região": rng.choice(REGIOES, n),
+    })
+
+def _vendas(primeiro_id: int, n: int, precos: np.ndarray, n_vendedores: int, rng) -> pd.DataFrame:
+    n_produtos = len(precos)
+    # Popularidade desigual entre produtos (poucos muito vendidos)
+    id_produto = np.minimum(rng.zipf(1.3, n), n_produtos).astype(np.int64)
+    id_produto = (id_produto * 7919) % n_produtos + 1
+    quantidade = rng.integers(1, 20, n)
+
+    sujas = rng.random(n) < 0.01
+    quantidade[sujas & (rng.random(n) < 0.5)] = 0
+    id_produto[sujas & (quantidade > 0)] = n_produtos + 1  # produto inexistente
+
+    preco = precos[np.minimum(id_produto, n_produtos) - 1]
+    return pd.DataFrame({
+        "Id_Venda": np.arange(primeiro_id, primeiro_id + n),
+        "Id_Produto": id_produto,
+        "Id_Vendedor": rng.integers(1, n_vendedores + 1, n),
+        "Quantidade": quantidade,
+        "Data_Venda": (INICIO + pd.to_timedelta(rng.integers(0, DIAS, n), unit="D")).strftime("%Y-%m-%d"),
+        "R$_Unit": preco,
+        "R$_Total": (preco * quantidade).round(2),
+    })
+
+
+def gerar(n_vendas: int, destino: str, formato: str = "auto", semente: int = 42) -> dict:
+    """
+    Gera os três arquivos e retorna {"produtos": caminho, "vendedores": ..., "vendas": ...},
+    no formato esperado por executar_pipeline/validar_dados.
+    """
+    if formato == "auto":
+        formato = "xlsx" if n_vendas <= LIMITE_XLSX else "csv"
+    if formato == "xlsx" and n_vendas > 1_048_575:
+        raise ValueError("O Excel comporta no máximo 1.048.575 linhas de dados: use --formato csv")
+
+    rng = np.random.default_rng(semente)
+    n_produtos, n_vendedores = dimensoes(n_vendas)
+    pasta = os.path.join(destino, "data")
+    os.makedirs(pasta, exist_ok=True)
+    arquivos = {nome: os.path.join(pasta, f"{nome}.{formato}") for nome in ("produtos", "vendedores", "vendas")}
+
+    inicio = time.perf_counter()
+    df_produtos = _produtos(n_produtos, rng)
+    df_vendedores = _vendedores(n_vendedores, rng)
+    precos = df_produtos["R$_Unit"].to_numpy()
+
+    if formato == "xlsx":
+        df_produtos.to_excel(arquivos["produtos"], index=False)
+        df_vendedores.to_excel(arquivos["vendedores"], index=False)
+        _vendas(1, n_vendas, precos, n_vendedores, rng).to_excel(arquivos["vendas"], index=False)
+    else:
+        df_produtos.to_csv(arquivos["produtos"], sep=";", index=False)
+        df_vendedores.to_csv(arquivos["vendedores"], sep=";", index=False)
+        for primeiro in range(0, n_vendas, LINHAS_POR_BLOCO):
+            bloco = _vendas(primeiro + 1, min(LINHAS_POR_BLOCO, n_vendas - primeiro), precos, n_vendedores, rng)
+            bloco.to_csv(arquivos["vendas"], sep=";", index=False, mode="w" if primeiro == 0 else "a", header=primeiro == 0)
+
+    print(f"📦 {n_vendas:,} vendas, {n_produtos:,} produtos, {n_vendedores:,} vendedores "
+          f"({formato}) em {time.perf_counter() - inicio:.1f}s -> {pasta}")
+    return arquivos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de vendas")
+    parser.add_argument("--vendas", default="10k", help="10k, 1m, 10m ou um número")
+    parser.add_argument("--destino", default="bench/.trabalho")
+    parser.add_argument("--formato", choices=["auto", "xlsx", "csv"], default="auto")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    gerar(tamanho(args.vendas), os.path.join(args.destino), args.formato, args.semente)
@@ -0,0 +1,225 @@
+"""
+Executor dos benchmarks: gera os dados, carrega um banco próprio, roda os
+microbenchmarks e o teste de carga do chat e grava tudo em JSON.
+
+Roda offline, num diretório de trabalho separado (bench/.trabalho/<tamanho>),
+sem tocar no chatbot.db nem em data/ do projeto.
+
+Uso:
+    python -m bench.executar --vendas 10k
+    python -m bench.executar --vendas 1m --requisicoes 5000 --concorrencia 32
+    python -m bench.executar --vendas 10k --pandas          # serviço sem as consultas SQL
+    python -m bench.executar --comparar antes.json depois.json [--limite 1.15]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+from bench import dados  # noqa: E402  (não importa o backend)
+
+
+def _commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "desconhecido"
+    return f"{sha}-sujo" if sha and sujo else (sha or "desconhecido")
+
+
+def preparar(args) -> dict:
+    """
+    Gera os arquivos (se ainda não existirem), apaga o banco de trabalho e
+    aponta o projeto para o diretório de trabalho. Deve rodar antes de
+    qualquer import do backend.
+    """
+    n_vendas = dados.tamanho(args.vendas)
+    trabalho = Path(args.trabalho or RAIZ / "bench" / ".trabalho" / args.vendas).resolve()
+    formato = args.formato if args.formato != "auto" else ("xlsx" if n_vendas <= dados.LIMITE_XLSX else "csv")
+    arquivos = {nome: str(trabalho / "data" / f"{nome}.{formato}") for nome in ("produtos", "vendedores", "vendas")}
+    if args.regerar or not all(os.path.exists(p) for p in arquivos.values()):
+        arquivos = dados.gerar(n_vendas, str(trabalho), formato, args.semente)
+
+    for sufixo in ("", "-wal", "-shm"):
+        (trabalho / f"chatbot.db{sufixo}").unlink(missing_ok=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{trabalho / 'chatbot.db'}"
+    os.environ["GRAFICOS_DIR"] = str(trabalho / "graficos")
+    if args.pandas:
+        os.environ["CONSULTAS_SQL"] = "0"
+    os.chdir(trabalho)
+    return arquivos
+
+
+def amostra(semente: int = 1, tamanho: int = 200) -> dict:
+    """
+    Ids, categorias e anos existentes no banco carregado, para montar as chamadas.
+    """
+    from sqlalchemy import select
+    from backend.database import ENGINE, Produto, VendaProdutoTrimestre, Vendedor
+
+    with ENGINE.connect() as conn:
+        produtos = list(conn.execute(select(VendaProdutoTrimestre.id_produto).distinct()).scalars())
+        vendedores = list(conn.execute(select(Vendedor.id_vendedor)).scalars())
+        categorias = sorted(conn.execute(select(Produto.categoria).distinct()).scalars())
+        anos = sorted(conn.execute(select(VendaProdutoTrimestre.ano).distinct()).scalars())
+    rng = random.Random(semente)
+    return {
+        "produtos": rng.sample(produtos, min(tamanho, len(produtos))),
+        "vendedores": rng.sample(vendedores, min(tamanho, len(vendedores))),
+        "categorias": categorias,
+        "anos": anos,
+    }
+
+
+def rodar(args) -> dict:
+    arquivos = preparar(args)
+
+    from backend.cache_respostas import cache_respostas
+    from backend.despacho import despachante
+    from backend.ingestao import executar_pipeline
+    from backend.snapshot import obter_snapshot
+    from bench import carga, micro
+    from bench.perguntas import montar
+
+    resultado = {
+        "commit": _commit(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "vendas": dados.tamanho(args.vendas),
+        "formato": Path(arquivos["vendas"]).suffix.lstrip("."),
+        "consultas_sql": not args.pandas,
+    }
+
+    print("⏱️ Ingestão")
+    inicio = time.perf_counter()
+    validacao = executar_pipeline(arquivos, carregar_banco=False)
+    if not validacao.ok:
+        raise SystemExit("Os dados gerados não passaram na validação.")
+    resultado["ingestao"] = {
+        "etapas": validacao.etapas,
+        "seed_db_from_files": micro.medir_carga(validacao.frames),
+    }
+    resultado["ingestao"]["total_segundos"] = round(time.perf_counter() - inicio, 4)
+    del validacao
+
+    base = amostra()
+    print("⏱️ Microbenchmarks")
+    resultado["micro"] = micro.executar(arquivos, base, args.repeticoes, args.tempo_max)
+
+    snap = obter_snapshot()
+    resultado["memoria"] = {
+        "fatos_bytes": snap.fatos.bytes(),
+        "dataframes_bytes": int(sum(df.memory_usage(deep=True).sum() for df in (snap.vendas, snap.produtos, snap.vendedores))),
+    }
+    print(f"   snapshot: tabela de fatos {resultado['memoria']['fatos_bytes'] / 2**20:.1f} MiB, "
+          f"DataFrames {resultado['memoria']['dataframes_bytes'] / 2**20:.1f} MiB")
+
+    if args.requisicoes:
+        import main
+
+        resultado["carga"] = {}
+        cenarios = [(mistura, 1) for mistura in args.misturas] + [("misto", args.lote)]
+        for mistura, em_lote in cenarios:
+            nome = mistura if em_lote == 1 else f"{mistura}_lote{em_lote}"
+            cache_respostas.limpar()
+            perguntas = montar(mistura, args.requisicoes, base)
+            print(f"⏱️ Carga: {nome} ({len(perguntas)} perguntas, {args.concorrencia} clientes)")
+            resultado["carga"][nome] = estatisticas = carga.executar(main.app, perguntas, args.concorrencia, em_lote)
+            print(f"   {estatisticas['perguntas_por_s']:.0f} perguntas/s, p50 {estatisticas['p50_ms']:.2f} ms, "
+                  f"p99 {estatisticas['p99_ms']:.2f} ms, status {estatisticas['status']}")
+        resultado["cache_respostas"] = cache_respostas.estatisticas()
+    despachante.desligar()
+
+    if args.partida:
+        from backend.ingestao import registrar_fontes
+        from bench import partida
+
+        # O banco reflete os arquivos gerados: mede a partida de um worker novo (carga pulada)
+        registrar_fontes(arquivos)
+        print("⏱️ Partida")
+        resultado["partida"] = partida.medir(os.getcwd(), f"total de vendas do produto {base['produtos'][0]}")
+        print(f"   import {resultado['partida']['import']:.2f}s, primeira resposta "
+              f"{resultado['partida']['primeira_resposta']:.2f}s, pronto {resultado['partida']['pronto']:.2f}s")
+    return resultado
+
+
+# -----------------------------
+# Comparação entre execuções
+# -----------------------------
+def comparar(antes: dict, depois: dict, limite: float) -> bool:
+    """
+    Imprime a razão depois/antes de cada medida e retorna True se nenhuma piorou
+    mais que `limite` (tempos maiores ou vazão menor).
+    """
+    linhas = []
+    for nome, medida in depois.get("micro", {}).items():
+        if nome in antes.get("micro", {}):
+            linhas.append((f"micro {nome} p50", antes["micro"][nome]["p50_ms"], medida["p50_ms"], False))
+    for nome, medida in depois.get("carga", {}).items():
+        if nome in antes.get("carga", {}):
+            anterior = antes["carga"][nome]
+            linhas.append((f"carga {nome} p50", anterior["p50_ms"], medida["p50_ms"], False))
+            linhas.append((f"carga {nome} p99", anterior["p99_ms"], medida["p99_ms"], False))
+            linhas.append((f"carga {nome} perguntas/s", anterior["perguntas_por_s"], medida["perguntas_por_s"], True))
+    for nome in ("import", "primeira_resposta", "pronto"):
+        if nome in antes.get("partida", {}) and nome in depois.get("partida", {}):
+            linhas.append((f"partida {nome} (s)", antes["partida"][nome], depois["partida"][nome], False))
+    for nome in ("fatos_bytes", "dataframes_bytes"):
+        if nome in antes.get("memoria", {}) and nome in depois.get("memoria", {}):
+            linhas.append((f"memória {nome} (MiB)", antes["memoria"][nome] / 2**20, depois["memoria"][nome] / 2**20, False))
+    if "ingestao" in antes and "ingestao" in depois:
+        linhas.append(("ingestão total (s)", antes["ingestao"]["total_segundos"], depois["ingestao"]["total_segundos"], False))
+
+    print(f"antes: {antes.get('commit')} ({antes.get('vendas')} vendas)  depois: {depois.get('commit')} ({depois.get('vendas')} vendas)")
+    ok = True
+    for nome, a, d, maior_melhor in linhas:
+        razao = d / a if a else float("inf")
+        piorou = razao < 1 / limite if maior_melhor else razao > limite
+        ok &= not piorou
+        print(f"{'❌' if piorou else '  '} {nome:<55} {a:>12.3f} -> {d:>12.3f}  ({razao:.2f}x)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do serviço e da API do chat")
+    parser.add_argument("--vendas", default="10k", help="10k, 1m, 10m ou um número")
+    parser.add_argument("--formato", choices=["auto", "xlsx", "csv"], default="auto")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--trabalho", help="diretório de trabalho (padrão: bench/.trabalho/<vendas>)")
+    parser.add_argument("--regerar", action="store_true", help="gera os arquivos de novo mesmo se já existirem")
+    parser.add_argument("--pandas", action="store_true", help="desliga as consultas SQL (CONSULTAS_SQL=0)")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--tempo-max", type=float, default=5.0, help="segundos máximos por microbenchmark")
+    parser.add_argument("--requisicoes", type=int, default=2000, help="perguntas por cenário de carga (0 desliga)")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--lote", type=int, default=50, help="perguntas por requisição no cenário em lote")
+    parser.add_argument("--misturas", nargs="+", default=["misto", "repetido", "pontual"])
+    parser.add_argument("--sem-partida", dest="partida", action="store_false", help="não mede a partida do servidor")
+    parser.add_argument("--saida", default=str(RAIZ / "bench" / "resultados"))
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    parser.add_argument("--limite", type=float, default=1.15, help="razão acima da qual a comparação acusa piora")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0]) as a, open(args.comparar[1]) as d:
+            sys.exit(0 if comparar(json.load(a), json.load(d), args.limite) else 1)
+
+    saida = Path(args.saida).resolve()
+    resultado = rodar(args)
+    saida.mkdir(parents=True, exist_ok=True)
+    arquivo = saida / f"{args.vendas}-{resultado['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    arquivo.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"📄 Resultados em {arquivo}")
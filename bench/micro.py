@@ -0,0 +1,139 @@
+"""
+Microbenchmarks das funções do serviço, da carga, da validação e do roteador do chat.
+
+Importar este módulo cria a engine do banco: o executor (bench/executar.py)
+define DATABASE_URL e o diretório de trabalho antes.
+"""
+import contextlib
+import gc
+import inspect
+import io
+import time
+
+import numpy as np
+
+from backend import service
+from backend.seed import seed_db_from_files
+from data_test.valida_dados import validar_dados
+from frontend.roteador import roteador
+
+from .perguntas import montar
+
+
+def medir(func, repeticoes: int = 50, tempo_max: float = 5.0) -> dict:
+    """
+    Chama `func(i)` até `repeticoes` vezes (ou até `tempo_max` segundos) e
+    retorna as estatísticas em milissegundos. A primeira chamada (fria) é
+    reportada à parte e não entra nas demais.
+    """
+    gc.collect()
+    inicio = time.perf_counter()
+    func(0)
+    frio = time.perf_counter() - inicio
+
+    tempos = []
+    limite = time.perf_counter() + tempo_max
+    for i in range(1, repeticoes + 1):
+        t = time.perf_counter()
+        func(i)
+        tempos.append(time.perf_counter() - t)
+        if time.perf_counter() > limite:
+            break
+    ms = np.array(tempos or [frio]) * 1000
+    return {
+        "n": len(tempos),
+        "frio_ms": round(frio * 1000, 4),
+        "min_ms": round(float(ms.min()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "media_ms": round(float(ms.mean()), 4),
+    }
+
+
+def casos(ids_produto, ids_vendedor, ano: int, categoria: str) -> dict:
+    """
+    Uma chamada por função pública do serviço; os ids variam a cada repetição.
+    """
+    def produto(i):
+        return int(ids_produto[i % len(ids_produto)])
+
+    def vendedor(i):
+        return int(ids_vendedor[i % len(ids_vendedor)])
+
+    lote_produtos = [int(p) for p in ids_produto[:100]]
+    lote_vendedores = [int(v) for v in ids_vendedor[:100]]
+    return {
+        "carregar_dados": lambda i: service.carregar_dados(),
+        "total_vendas_produto": lambda i: service.total_vendas_produto(produto(i)),
+        "total_vendas_vendedor": lambda i: service.total_vendas_vendedor(vendedor(i)),
+        "totais_vendas_produtos": lambda i: service.totais_vendas_produtos(lote_produtos),
+        "totais_vendas_vendedores": lambda i: service.totais_vendas_vendedores(lote_vendedores),
+        "vendas_por_regiao": lambda i: service.vendas_por_regiao(),
+        "linhas_vendas_por_regiao": lambda i: sum(1 for _ in service.linhas_vendas_por_regiao()),
+        "detalhes_produto": lambda i: service.detalhes_produto(produto(i)),
+        "detalhes_produtos": lambda i: service.detalhes_produtos(lote_produtos),
+        "resolver_categoria": lambda i: service.resolver_categoria(categoria),
+        "top_produtos_categoria_ano": lambda i: service.top_produtos_categoria_ano(categoria, ano, 5),
+        "linhas_top_produtos_categoria_ano": lambda i: sum(1 for _ in service.linhas_top_produtos_categoria_ano(categoria, ano, 5)),
+        "linhas_totais_produtos": lambda i: sum(1 for _ in service.linhas_totais_produtos()),
+        "top_vendedores": lambda i: service.top_vendedores(5),
+        "potencial_crescimento_vendedor": lambda i: service.potencial_crescimento_vendedor(vendedor(i)),
+        "prever_vendas_produto_trimestre": lambda i: service.prever_vendas_produto_trimestre(produto(i)),
+        "previsoes_produtos": lambda i: service.previsoes_produtos(),
+        "extrair_filtros_produtos": lambda i: service.extrair_filtros_produtos(
+            f"top 3 produtos da categoria {categoria} no ano de {ano}"
+        ),
+    }
+
+
+def nao_cobertas(tabela: dict) -> list:
+    """
+    Funções públicas de backend.service que não têm caso em `tabela`.
+    """
+    publicas = {
+        nome for nome, obj in inspect.getmembers(service, inspect.isfunction)
+        if not nome.startswith("_") and obj.__module__ == service.__name__
+    }
+    return sorted(publicas - set(tabela))
+
+
+# -----------------------------
+# Execução
+# -----------------------------
+def medir_carga(frames: dict) -> dict:
+    """
+    Tempo de seed_db_from_files com os frames já validados, num banco vazio
+    (executado uma vez: é a carga usada pelos demais benchmarks).
+    """
+    inicio = time.perf_counter()
+    seed_db_from_files(frames)
+    return {"n": 1, "segundos": round(time.perf_counter() - inicio, 4)}
+
+
+def executar(arquivos: dict, amostra: dict, repeticoes: int = 50, tempo_max: float = 5.0) -> dict:
+    """
+    Roda os microbenchmarks (o banco já deve estar carregado) e retorna {nome: estatísticas}.
+    `amostra` é a mesma usada para montar as perguntas (bench/perguntas.py).
+    """
+    ano, categoria = amostra["anos"][0], amostra["categorias"][0]
+    tabela = casos(amostra["produtos"], amostra["vendedores"], ano, categoria)
+    faltando = nao_cobertas(tabela)
+    if faltando:
+        print(f"⚠️ Funções do serviço sem benchmark: {', '.join(faltando)}")
+
+    resultados = {}
+    for nome, func in tabela.items():
+        resultados[f"service.{nome}"] = medir(func, repeticoes, tempo_max)
+        print(f"   service.{nome}: p50 {resultados[f'service.{nome}']['p50_ms']:.3f} ms")
+
+    textos = montar("misto", 1000, amostra)
+    resultados["roteador.rotear"] = medir(lambda i: roteador.rotear(textos[i % len(textos)]), repeticoes * 20, tempo_max)
+    print(f"   roteador.rotear: p50 {resultados['roteador.rotear']['p50_ms']:.4f} ms")
+
+    def validar(i):
+        with contextlib.redirect_stdout(io.StringIO()):
+            validar_dados(arquivos=arquivos)
+
+    resultados["validar_dados"] = medir(validar, min(repeticoes, 3), tempo_max)
+    print(f"   validar_dados: p50 {resultados['validar_dados']['p50_ms']:.1f} ms")
+    return resultados
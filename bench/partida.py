@@ -0,0 +1,114 @@
+"""
+Tempo de partida do servidor, medido num processo novo:
+- import: `import main` (o que todo worker paga antes de escutar);
+- primeira_resposta: do início do lifespan até a primeira pergunta respondida com 200;
+- pronto: do início do lifespan até /api/pronto responder 200 (após o aquecimento).
+
+Os tempos são comparados com um orçamento e o comando sai com código 1 se
+algum for excedido.
+
+Uso:
+    python -m bench.partida --dir bench/.trabalho/10k
+    python -m bench.partida --dir . --orcamento-import 1.5 --detalhar
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+ORCAMENTO = {
+    "import": float(os.getenv("PARTIDA_ORCAMENTO_IMPORT", "2.0")),
+    "primeira_resposta": float(os.getenv("PARTIDA_ORCAMENTO_PRIMEIRA", "3.0")),
+    "pronto": float(os.getenv("PARTIDA_ORCAMENTO_PRONTO", "15.0")),
+}
+
+# Executado no processo filho, com o diretório de trabalho já definido
+_FILHO = """
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+import main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+
+tempos = {{"import": importado - inicio}}
+with TestClient(main.app) as cliente:
+    partida = time.perf_counter()
+    while True:
+        r = cliente.post("/api/chat", json={{"texto": {pergunta!r}}})
+        if r.status_code != 503:
+            break
+        time.sleep(0.005)
+    tempos["primeira_resposta"] = time.perf_counter() - partida
+    tempos["status_primeira"] = r.status_code
+    while True:
+        pronto = cliente.get("/api/pronto")
+        if pronto.status_code == 200 or pronto.json()["fase"] == "falhou":
+            break
+        time.sleep(0.01)
+    tempos["pronto"] = time.perf_counter() - partida
+    tempos["estado"] = pronto.json()
+print("PARTIDA " + json.dumps(tempos))
+"""
+
+
+def medir(diretorio: str, pergunta: str = "total de vendas do produto 1", env: dict = None) -> dict:
+    """
+    Sobe a aplicação num processo novo em `diretorio` e retorna os tempos (segundos).
+    """
+    codigo = _FILHO.format(raiz=str(RAIZ), pergunta=pergunta)
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=diretorio, capture_output=True, text=True,
+        env={**os.environ, **(env or {})},
+    )
+    for linha in saida.stdout.splitlines():
+        if linha.startswith("PARTIDA "):
+            tempos = json.loads(linha[len("PARTIDA "):])
+            return {k: round(v, 4) if isinstance(v, float) else v for k, v in tempos.items()}
+    raise RuntimeError(f"A aplicação não subiu:\n{saida.stdout[-2000:]}\n{saida.stderr[-2000:]}")
+
+def detalhar_imports(diretorio: str, n: int = 15) -> list:
+    """
+    Os `n` módulos com maior tempo acumulado de import (python -X importtime).
+    """
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {str(RAIZ)!r}); import main"],
+        cwd=diretorio, capture_output=True, text=True,
+    )
+    modulos = []
+    for linha in saida.stderr.splitlines():
+        partes = linha.split("|")
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            modulos.append((int(partes[1]) / 1e6, partes[2].rstrip()))
+    return sorted(modulos, reverse=True)[:n]
+
+def conferir(tempos: dict, orcamento: dict = ORCAMENTO) -> bool:
+    ok = True
+    for nome, limite in orcamento.items():
+        excedeu = tempos[nome] > limite
+        ok &= not excedeu
+        print(f"{'❌' if excedeu else '✅'} {nome}: {tempos[nome]:.3f}s (orçamento {limite:g}s)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo de partida do servidor")
+    parser.add_argument("--dir", default=".", help="diretório de trabalho (com data/ e o banco)")
+    parser.add_argument("--orcamento-import", type=float, default=ORCAMENTO["import"])
+    parser.add_argument("--orcamento-primeira", type=float, default=ORCAMENTO["primeira_resposta"])
+    parser.add_argument("--orcamento-pronto", type=float, default=ORCAMENTO["pronto"])
+    parser.add_argument("--detalhar", action="store_true", help="lista os imports mais lentos")
+    args = parser.parse_args()
+
+    tempos = medir(args.dir)
+    print(f"carga pulada: {tempos['estado'].get('carga_pulada')}  etapas: {tempos['estado'].get('etapas')}")
+    if args.detalhar:
+        for segundos, modulo in detalhar_imports(args.dir):
+            print(f"   {segundos:7.3f}s {modulo}")
+    orcamento = {"import": args.orcamento_import, "primeira_resposta": args.orcamento_primeira,
+                 "pronto": args.orcamento_pronto}
+    sys.exit(0 if conferir(tempos, orcamento) else 1)
@@ -0,0 +1,51 @@
+"""
+Misturas de perguntas do chat usadas no roteador e no teste de carga.
+Cada modelo tem um peso; {id_produto}, {id_vendedor}, {categoria} e {ano}
+são sorteados da amostra de dados do benchmark.
+"""
+import random
+
+PERGUNTAS = {
+    # Tráfego típico do painel
+    "misto": [
+        ("vendas do produto {id_produto}", 4),
+        ("total de vendas do vendedor {id_vendedor}", 3),
+        ("vendas por região", 3),
+        ("detalhes do produto {id_produto}", 2),
+        ("top 5 vendedores", 2),
+        ("me fale do vendedor {id_vendedor}", 1),
+        ("top 3 produtos da categoria {categoria} no ano de {ano}", 1),
+        ("previsão de vendas do produto {id_produto}", 1),
+        ("bom dia", 1),
+    ],
+    # Poucas perguntas repetidas (mede o cache de respostas)
+    "repetido": [
+        ("vendas por região", 1),
+        ("top 5 vendedores", 1),
+        ("vendas do produto 1", 1),
+    ],
+    # Só consultas pontuais por id (mede o banco e os índices)
+    "pontual": [
+        ("vendas do produto {id_produto}", 1),
+        ("total de vendas do vendedor {id_vendedor}", 1),
+        ("detalhes do produto {id_produto}", 1),
+    ],
+}
+
+
+def montar(mistura: str, n: int, amostra: dict, semente: int = 7) -> list:
+    """
+    Lista de `n` perguntas sorteadas da mistura, com os slots preenchidos
+    a partir de `amostra` ({"produtos": [...], "vendedores": [...], "categorias": [...], "anos": [...]}).
+    """
+    rng = random.Random(semente)
+    modelos, pesos = zip(*PERGUNTAS[mistura])
+    perguntas = []
+    for modelo in rng.choices(modelos, weights=pesos, k=n):
+        perguntas.append(modelo.format(
+            id_produto=rng.choice(amostra["produtos"]),
+            id_vendedor=rng.choice(amostra["vendedores"]),
+            categoria=rng.choice(amostra["categorias"]),
+            ano=rng.choice(amostra["anos"]),
+        ))
+    return perguntas
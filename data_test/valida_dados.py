@@ -1,83 +1,111 @@
 import pandas as pd
 import os
+from backend.cache_fontes import ler_fonte
+from backend.seed import renomear_colunas
 
-def validar_dados():
-    arquivos = {
-        "Produtos": "data/produtos.xlsx",
-        "Vendedores": "data/vendedores.xlsx",
-        "Vendas": "data/vendas.xlsx"
-    }
+ARQUIVOS = {
+    "produtos": "data/produtos.xlsx",
+    "vendedores": "data/vendedores.xlsx",
+    "vendas": "data/vendas.xlsx"
+}
 
-    erros = []
-    log = []
+# Arquivos de vendas a partir deste tamanho são validados em blocos (data_test/valida_em_blocos.py)
+LIMITE_EM_BLOCOS_MB = float(os.getenv("VALIDACAO_EM_BLOCOS_MB", "200"))
 
-    # Verificar existência dos arquivos
-    for nome, path in arquivos.items():
-        if not os.path.exists(path):
-            erros.append(f"Arquivo não encontrado: {path}")
-    
-    if erros:
-        print("Erro(s) crítico(s) de arquivos:")
-        for e in erros:
-            print("-", e)
-        return False
+# Colunas (esquema ORM) sem as quais a linha é descartada
+COLUNAS_CRITICAS = {
+    "produtos": ["id_produto", "preco"],
+    "vendedores": ["id_vendedor"],
+    "vendas": ["id_venda", "id_produto", "id_vendedor", "quantidade", "data_venda", "preco_unit", "valor_total"]
+}
 
-    # Carregar arquivos
-    df_produtos = pd.read_excel(arquivos["Produtos"])
-    df_vendedores = pd.read_excel(arquivos["Vendedores"])
-    df_vendas = pd.read_excel(arquivos["Vendas"])
-
-    # Valores ausentes: remover ou preencher
-    for df, nome, criticas in zip(
-        [df_produtos, df_vendedores, df_vendas],
-        ["Produtos", "Vendedores", "Vendas"],
-        [["Id_Produto","R$_Unit"], ["Id_Vendedor"], ["Id_Venda","Id_Produto","Id_Vendedor","Quantidade","R$_Unit"]]
-    ):
-        # Contar NaN
-        n_nan = df[criticas].isna().sum().sum()
-        if n_nan > 0:
-            log.append(f"{nome}: {n_nan} valores ausentes em colunas críticas, serão removidos")
-            df.dropna(subset=criticas, inplace=True)
+def verificar_arquivos(arquivos: dict = ARQUIVOS):
+    """
+    Retorna a lista de erros de arquivos inexistentes.
+    """
+    return [f"Arquivo não encontrado: {path}" for path in arquivos.values() if not os.path.exists(path)]
 
-    # Corrigir tipos
+def converter_tipos_vendas(df_vendas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte quantidade, valores e data das vendas (valores inválidos viram NaN/NaT).
+    """
+    df_vendas["quantidade"] = pd.to_numeric(df_vendas["quantidade"], errors="coerce")
+    df_vendas["preco_unit"] = pd.to_numeric(df_vendas["preco_unit"], errors="coerce").astype(float)
+    df_vendas["valor_total"] = pd.to_numeric(df_vendas["valor_total"], errors="coerce").astype(float)
+    df_vendas["data_venda"] = pd.to_datetime(df_vendas["data_venda"], errors="coerce")
+    return df_vendas
+
+def mascara_invalidas(df_vendas: pd.DataFrame) -> pd.Series:
+    """
+    Vendas com quantidade ou preço <= 0 (outliers básicos).
+    """
+    return (df_vendas["quantidade"] <= 0) | (df_vendas["preco_unit"] <= 0)
+
+def limpar_dados(frames: dict):
+    """
+    Valida e limpa os DataFrames já renomeados para o esquema ORM
+    ({"produtos", "vendedores", "vendas"}).
+    Retorna (frames_limpos, log, erros).
+    """
+    erros = []
+    log = []
+    df_produtos = frames["produtos"].copy()
+    df_vendedores = frames["vendedores"].copy()
+    df_vendas = frames["vendas"].copy()
+
+    # Corrigir tipos (valores inválidos viram NaN e são tratados abaixo)
     try:
-        df_produtos["R$_Unit"] = pd.to_numeric(df_produtos["R$_Unit"], errors="coerce")
-        df_vendas["Quantidade"] = pd.to_numeric(df_vendas["Quantidade"], errors="coerce").astype(int)
-        df_vendas["R$_Unit"] = pd.to_numeric(df_vendas["R$_Unit"], errors="coerce")
-        df_vendas["R$_Total"] = pd.to_numeric(df_vendas["R$_Total"], errors="coerce")
-        df_vendas["Data_Venda"] = pd.to_datetime(df_vendas["Data_Venda"], errors="coerce")
+        df_produtos["preco"] = pd.to_numeric(df_produtos["preco"], errors="coerce").astype(float)
+        converter_tipos_vendas(df_vendas)
     except Exception as e:
         erros.append(f"Problema de tipo: {e}")
 
+    # Valores ausentes em colunas críticas: remover
+    limpos = {}
+    for nome, df in [("produtos", df_produtos), ("vendedores", df_vendedores), ("vendas", df_vendas)]:
+        criticas = [c for c in COLUNAS_CRITICAS[nome] if c in df.columns]
+        faltando = set(COLUNAS_CRITICAS[nome]) - set(criticas)
+        if faltando:
+            erros.append(f"{nome.capitalize()}: colunas ausentes {sorted(faltando)}")
+        n_nan = df[criticas].isna().any(axis=1).sum()
+        if n_nan > 0:
+            log.append(f"{nome.capitalize()}: {n_nan} linhas com valores ausentes ou inválidos em colunas críticas, serão removidas")
+            df = df.dropna(subset=criticas)
+        limpos[nome] = df
+    df_produtos, df_vendedores, df_vendas = limpos["produtos"], limpos["vendedores"], limpos["vendas"]
+
+    if erros:
+        return limpos, log, erros
+    df_vendas = df_vendas.astype({"quantidade": int})
+
     # Integridade: remover vendas com produto ou vendedor inexistente
-    prod_ids = set(df_produtos["Id_Produto"])
-    vend_ids = set(df_vendedores["Id_Vendedor"])
-    mask_prod = df_vendas["Id_Produto"].isin(prod_ids)
-    mask_vend = df_vendas["Id_Vendedor"].isin(vend_ids)
+    mask_prod = df_vendas["id_produto"].isin(set(df_produtos["id_produto"]))
+    mask_vend = df_vendas["id_vendedor"].isin(set(df_vendedores["id_vendedor"]))
     removed = (~mask_prod | ~mask_vend).sum()
     if removed > 0:
         log.append(f"Vendas: {removed} registros removidos por referenciar produto ou vendedor inexistente")
         df_vendas = df_vendas[mask_prod & mask_vend]
 
     # Duplicidades
-    dup = df_vendas["Id_Venda"].duplicated().sum()
+    dup = df_vendas["id_venda"].duplicated().sum()
     if dup > 0:
-        log.append(f"{dup} duplicidades em Id_Venda removidas")
-        df_vendas = df_vendas.drop_duplicates(subset=["Id_Venda"])
+        log.append(f"{dup} duplicidades em id_venda removidas")
+        df_vendas = df_vendas.drop_duplicates(subset=["id_venda"])
 
     # Outliers básicos
-    mask_out = (df_vendas["Quantidade"] <= 0) | (df_vendas["R$_Unit"] <= 0)
-    outliers = df_vendas[mask_out]
-    if not outliers.empty:
-        log.append(f"{len(outliers)} registros com quantidade ou preço <= 0 removidos")
+    mask_out = mascara_invalidas(df_vendas)
+    n_out = mask_out.sum()
+    if n_out > 0:
+        log.append(f"{n_out} registros com quantidade ou preço <= 0 removidos")
         df_vendas = df_vendas[~mask_out]
 
-    # Salvar arquivos limpos (opcional)
-    df_produtos.to_excel("data/produtos_limpo.xlsx", index=False)
-    df_vendedores.to_excel("data/vendedores_limpo.xlsx", index=False)
-    df_vendas.to_excel("data/vendas_limpo.xlsx", index=False)
-    log.append("Arquivos limpos salvos como *_limpo.xlsx na pasta data/")
+    limpos = {"produtos": df_produtos, "vendedores": df_vendedores, "vendas": df_vendas}
+    return limpos, log, erros
 
+def imprimir_log(log: list, erros: list):
+    """
+    Imprime o log de validação e retorna True se não houve erros críticos.
+    """
     print("== LOG DE VALIDAÇÃO E LIMPEZA ==")
     for l in log:
         print("-", l)
@@ -90,3 +118,33 @@ def validar_dados():
 
     print("Dados validados e limpos com sucesso!")
     return True
+
+def validar_dados(salvar_limpos: bool = False, arquivos: dict = ARQUIVOS):
+    """
+    Valida os arquivos de data/ (ou os informados em `arquivos`) sem carregar o banco.
+    Com `salvar_limpos=True` grava também os arquivos limpos como *_limpo.xlsx.
+    Arquivos de vendas com LIMITE_EM_BLOCOS_MB ou mais são lidos em blocos.
+    """
+    erros = verificar_arquivos(arquivos)
+    if erros:
+        print("Erro(s) crítico(s) de arquivos:")
+        for e in erros:
+            print("-", e)
+        return False
+
+    if os.path.getsize(arquivos["vendas"]) >= LIMITE_EM_BLOCOS_MB * 2**20:
+        # Import local: valida_em_blocos importa este módulo
+        from data_test.valida_em_blocos import validar_dados_em_blocos
+        return validar_dados_em_blocos(arquivos, salvar_limpos)[0]
+
+    # Carregar arquivos (do cache colunar quando o arquivo não mudou)
+    frames = renomear_colunas({nome: ler_fonte(path) for nome, path in arquivos.items()})
+    limpos, log, erros = limpar_dados(frames)
+
+    # Salvar arquivos limpos (opcional)
+    if salvar_limpos and not erros:
+        for nome, df in limpos.items():
+            df.to_excel(f"data/{nome}_limpo.xlsx", index=False)
+        log.append("Arquivos limpos salvos como *_limpo.xlsx na pasta data/")
+
+    return imprimir_log(log, erros)
@@ -0,0 +1,299 @@
+"""
+Validação em blocos do arquivo de vendas, para arquivos que não cabem na memória.
+
+Produtos e vendedores (pequenos) são lidos e limpos inteiros, como em
+valida_dados.limpar_dados; deles saem os conjuntos de ids usados na checagem de
+integridade. As vendas são lidas em blocos de `tamanho_bloco` linhas (openpyxl em
+modo somente leitura para .xlsx, read_csv com chunksize para .csv) e cada bloco
+passa pelas mesmas regras, na mesma ordem:
+1. valores ausentes ou inválidos em colunas críticas;
+2. produto ou vendedor inexistente;
+3. id_venda repetido (a primeira ocorrência válida fica), checado num bitmap de
+   1 bit por id (ver IdsVistos);
+4. quantidade ou preço <= 0.
+
+Os blocos limpos e as linhas descartadas (relatório JSONL, uma linha por problema)
+são gravados à medida que o arquivo é lido: o pico de memória depende do tamanho
+do bloco, não do arquivo.
+
+Uso:
+    python -m data_test.valida_em_blocos --bloco 100000 --salvar --problemas data/vendas_problemas.jsonl
+"""
+import argparse
+import json
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from backend.cache_fontes import ler_fonte
+from backend.seed import COLUNAS_VENDAS, renomear_colunas
+from data_test.valida_dados import (
+    ARQUIVOS, COLUNAS_CRITICAS, converter_tipos_vendas, imprimir_log, limpar_dados, mascara_invalidas,
+    verificar_arquivos,
+)
+
+TAMANHO_BLOCO = int(os.getenv("VALIDACAO_TAMANHO_BLOCO", "100000"))
+# Maior id_venda guardado no bitmap (1 bit por id: 2**30 ids = 128 MB); acima disso, num set
+LIMITE_BITMAP = int(os.getenv("VALIDACAO_LIMITE_BITMAP", str(2**30)))
+
+# Motivo de descarte -> mensagem do log (as mesmas de limpar_dados)
+MOTIVOS = {
+    "valor_ausente": "Vendas: {n} linhas com valores ausentes ou inválidos em colunas críticas, serão removidas",
+    "referencia_inexistente": "Vendas: {n} registros removidos por referenciar produto ou vendedor inexistente",
+    "duplicada": "{n} duplicidades em id_venda removidas",
+    "quantidade_ou_preco_invalido": "{n} registros com quantidade ou preço <= 0 removidos",
+}
+
+
+# -----------------------------
+# Leitura em blocos
+# -----------------------------
+def _blocos_xlsx(path: str, tamanho: int):
+    # Import local: o openpyxl só é necessário para ler .xlsx
+    from openpyxl import load_workbook
+
+    livro = load_workbook(path, read_only=True, data_only=True)
+    try:
+        linhas = livro.active.iter_rows(values_only=True)
+        cabecalho = [str(c) if c is not None else "" for c in next(linhas, ())]
+        while True:
+            bloco = list(islice(linhas, tamanho))
+            if not bloco:
+                break
+            yield pd.DataFrame.from_records(bloco, columns=cabecalho)
+    finally:
+        livro.close()
+
+def ler_em_blocos(path: str, tamanho: int = TAMANHO_BLOCO):
+    """
+    Gera o arquivo (.xlsx ou .csv) em DataFrames de até `tamanho` linhas,
+    com os nomes de colunas originais.
+    """
+    if path.endswith(".csv"):
+        yield from pd.read_csv(path, sep=";", chunksize=tamanho)
+    elif path.endswith(".xlsx"):
+        yield from _blocos_xlsx(path, tamanho)
+    else:
+        raise ValueError(f"Formato não suportado: {path}")
+
+
+# -----------------------------
+# Duplicidades
+# -----------------------------
+class IdsVistos:
+    """
+    Conjunto dos id_venda já aceitos. Ids inteiros entre 0 e `limite` ficam num
+    bitmap (1 bit por id, crescido sob demanda); os demais (negativos, enormes
+    ou não numéricos) num set.
+    """
+    def __init__(self, limite: int = LIMITE_BITMAP):
+        self.limite = limite
+        self.bits = np.zeros(0, dtype=np.uint8)
+        self.outros = set()
+
+    def _crescer(self, maior: int):
+        necessario = maior // 8 + 1
+        if necessario > len(self.bits):
+            novo = np.zeros(max(necessario, 2 * len(self.bits)), dtype=np.uint8)
+            novo[:len(self.bits)] = self.bits
+            self.bits = novo
+
+    def marcar(self, ids: pd.Series) -> np.ndarray:
+        """
+        Registra os ids e retorna a máscara dos que são repetidos: já vistos em
+        chamadas anteriores ou repetidos dentro de `ids` (a primeira ocorrência fica).
+        """
+        repetidos = ids.duplicated().to_numpy()
+        numeros = pd.to_numeric(ids, errors="coerce").to_numpy(dtype=float)
+        no_bitmap = np.isfinite(numeros) & (numeros % 1 == 0) & (numeros >= 0) & (numeros < self.limite)
+
+        posicoes = numeros[no_bitmap].astype(np.int64)
+        if len(posicoes):
+            self._crescer(int(posicoes.max()))
+            byte, bit = posicoes >> 3, (1 << (posicoes & 7)).astype(np.uint8)
+            repetidos[no_bitmap] |= (self.bits[byte] & bit) != 0
+            np.bitwise_or.at(self.bits, byte, bit)
+
+        for i in np.flatnonzero(~no_bitmap):
+            valor = ids.iat[i]
+            if valor in self.outros:
+                repetidos[i] = True
+            self.outros.add(valor)
+        return repetidos
+
+    def bytes(self) -> int:
+        return self.bits.nbytes
+
+
+# -----------------------------
+# Relatório
+# -----------------------------
+@dataclass
+class RelatorioValidacao:
+    arquivo: str
+    linhas_lidas: int = 0
+    linhas_validas: int = 0
+    blocos: int = 0
+    removidas: Counter = field(default_factory=Counter)
+    erros: list = field(default_factory=list)
+
+    def log(self) -> list:
+        return [MOTIVOS[motivo].format(n=n) for motivo, n in self.removidas.items() if n]
+
+    def resumo(self) -> dict:
+        return {"arquivo": self.arquivo, "linhas_lidas": self.linhas_lidas, "linhas_validas": self.linhas_validas,
+                "blocos": self.blocos, "removidas": dict(self.removidas), "erros": self.erros}
+
+
+def _registrar_problemas(relatorio: RelatorioValidacao, problemas, bloco: pd.DataFrame, mascara, motivo: str, inicio: int):
+    n = int(mascara.sum())
+    if not n:
+        return
+    relatorio.removidas[motivo] += n
+    if problemas is None:
+        return
+    # linha: número da linha no arquivo (a 1 é o cabeçalho)
+    descartadas = bloco.loc[mascara]
+    for posicao, id_venda in zip(np.flatnonzero(mascara), descartadas.get("id_venda", pd.Series([None] * n))):
+        registro = {"arquivo": relatorio.arquivo, "linha": inicio + int(posicao) + 2,
+                    "id_venda": None if pd.isna(id_venda) else str(id_venda), "motivo": motivo}
+        problemas.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+# -----------------------------
+# Validação
+# -----------------------------
+def limpar_dimensoes(arquivos: dict = ARQUIVOS):
+    """
+    Produtos e vendedores lidos e limpos inteiros (regras de limpar_dados).
+    Retorna (frames, log, erros).
+    """
+    frames = renomear_colunas({
+        "produtos": ler_fonte(arquivos["produtos"]),
+        "vendedores": ler_fonte(arquivos["vendedores"]),
+        "vendas": pd.DataFrame(columns=list(COLUNAS_VENDAS)),
+    })
+    limpos, log, erros = limpar_dados(frames)
+    return {"produtos": limpos["produtos"], "vendedores": limpos["vendedores"]}, log, erros
+
+def validar_vendas_em_blocos(path: str, ids_produtos: set, ids_vendedores: set,
+                             tamanho_bloco: int = TAMANHO_BLOCO, relatorio: RelatorioValidacao = None,
+                             problemas=None):
+    """
+    Gera os blocos limpos do arquivo de vendas (colunas do esquema ORM).
+    As contagens vão para `relatorio`; com `problemas` (arquivo aberto para
+    escrita), cada linha descartada é gravada nele como JSON.
+    """
+    relatorio = relatorio if relatorio is not None else RelatorioValidacao(path)
+    vistos = IdsVistos()
+    inicio = 0
+    for bloco in ler_em_blocos(path, tamanho_bloco):
+        bloco = bloco.rename(columns=COLUNAS_VENDAS).reset_index(drop=True)
+        n = len(bloco)
+        relatorio.blocos += 1
+        relatorio.linhas_lidas += n
+
+        faltando = [c for c in COLUNAS_CRITICAS["vendas"] if c not in bloco.columns]
+        if faltando:
+            relatorio.erros.append(f"Vendas: colunas ausentes {sorted(faltando)}")
+            return
+        try:
+            converter_tipos_vendas(bloco)
+        except Exception as e:
+            relatorio.erros.append(f"Problema de tipo: {e}")
+            return
+
+        # Cada regra só olha as linhas que passaram pelas anteriores
+        ausente = bloco[COLUNAS_CRITICAS["vendas"]].isna().any(axis=1).to_numpy()
+        _registrar_problemas(relatorio, problemas, bloco, ausente, "valor_ausente", inicio)
+        restantes = ~ausente
+
+        orfa = restantes & ~(bloco["id_produto"].isin(ids_produtos) & bloco["id_vendedor"].isin(ids_vendedores)).to_numpy()
+        _registrar_problemas(relatorio, problemas, bloco, orfa, "referencia_inexistente", inicio)
+        restantes &= ~orfa
+
+        duplicada = np.zeros(n, dtype=bool)
+        duplicada[restantes] = vistos.marcar(bloco["id_venda"][restantes])
+        _registrar_problemas(relatorio, problemas, bloco, duplicada, "duplicada", inicio)
+        restantes &= ~duplicada
+
+        invalida = restantes & mascara_invalidas(bloco).to_numpy()
+        _registrar_problemas(relatorio, problemas, bloco, invalida, "quantidade_ou_preco_invalido", inicio)
+        restantes &= ~invalida
+
+        inicio += n
+        limpo = bloco.loc[restantes].astype({"quantidade": int})
+        relatorio.linhas_validas += len(limpo)
+        if problemas is not None:
+            problemas.flush()
+        yield limpo
+
+def validar_dados_em_blocos(arquivos: dict = ARQUIVOS, salvar_limpos: bool = False,
+                            tamanho_bloco: int = TAMANHO_BLOCO, problemas: str = None):
+    """
+    Como valida_dados.validar_dados, lendo as vendas em blocos. Com
+    `salvar_limpos=True` grava data/vendas_limpo.csv (colunas originais, ";")
+    bloco a bloco e os cadastros limpos como *_limpo.xlsx; com `problemas`,
+    grava o relatório das linhas descartadas em JSONL.
+    Retorna (ok, relatorio).
+    """
+    erros = verificar_arquivos(arquivos)
+    if erros:
+        imprimir_log([], erros)
+        return False, None
+
+    dimensoes, log, erros = limpar_dimensoes(arquivos)
+    relatorio = RelatorioValidacao(arquivos["vendas"])
+    if erros:
+        return imprimir_log(log, erros), relatorio
+
+    ids_produtos = set(dimensoes["produtos"]["id_produto"])
+    ids_vendedores = set(dimensoes["vendedores"]["id_vendedor"])
+    originais = {orm: original for original, orm in COLUNAS_VENDAS.items()}
+    saida = "data/vendas_limpo.csv" if salvar_limpos else None
+    arquivo_saida = open(saida + ".tmp", "w", encoding="utf-8", newline="") if saida else None
+    arquivo_problemas = open(problemas, "w", encoding="utf-8") if problemas else None
+    try:
+        primeiro = True
+        for limpo in validar_vendas_em_blocos(arquivos["vendas"], ids_produtos, ids_vendedores,
+                                              tamanho_bloco, relatorio, arquivo_problemas):
+            if arquivo_saida is not None:
+                limpo.rename(columns=originais).to_csv(arquivo_saida, sep=";", index=False,
+                                                      header=primeiro, date_format="%Y-%m-%d")
+                primeiro = False
+    finally:
+        for arquivo in (arquivo_saida, arquivo_problemas):
+            if arquivo is not None:
+                arquivo.close()
+
+    log += relatorio.log()
+    erros += relatorio.erros
+    if saida:
+        if erros:
+            os.remove(saida + ".tmp")
+        else:
+            os.replace(saida + ".tmp", saida)
+            for nome, df in dimensoes.items():
+                df.to_excel(f"data/{nome}_limpo.xlsx", index=False)
+            log.append(f"Arquivos limpos salvos em {saida} e *_limpo.xlsx na pasta data/")
+    if problemas:
+        log.append(f"Linhas descartadas registradas em {problemas}")
+    return imprimir_log(log, erros), relatorio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validação em blocos dos arquivos de data/")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="linhas de vendas por bloco")
+    parser.add_argument("--salvar", action="store_true", help="grava data/vendas_limpo.csv e os cadastros limpos")
+    parser.add_argument("--problemas", help="arquivo JSONL com as linhas descartadas")
+    parser.add_argument("--vendas", default=ARQUIVOS["vendas"], help="arquivo de vendas (.xlsx ou .csv)")
+    args = parser.parse_args()
+
+    ok, relatorio = validar_dados_em_blocos(dict(ARQUIVOS, vendas=args.vendas), args.salvar, args.bloco, args.problemas)
+    if relatorio is not None:
+        print(json.dumps(relatorio.resumo(), ensure_ascii=False))
+    raise SystemExit(0 if ok else 1)
@@ -1,13 +1,219 @@
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from backend import service
+from backend import graficos, inicializacao, metricas, service
+from backend.cache_respostas import cache_respostas, chave
+from backend.despacho import Sobrecarga, TempoEsgotado, despachante
+from backend.snapshot import impressao_recente
+from frontend.roteador import roteador
+import asyncio
+import hmac
+import json
+import os
 import re
 
-router = APIRouter()
+class RotaMedida(APIRoute):
+    """
+    Rota que abre o rastro de métricas da requisição (backend/metricas.py) e
+    registra sua duração. Com METRICAS_CABECALHO=1, ou o header X-Debug-Tempos: 1
+    na requisição, o detalhamento por etapa volta no header Server-Timing.
+    """
+    def get_route_handler(self):
+        tratar = super().get_route_handler()
+        rota = f"{'|'.join(sorted(self.methods))} {self.path_format}"
+
+        async def handler(request: Request):
+            with metricas.requisicao(rota) as rastro:
+                try:
+                    resposta = await tratar(request)
+                except HTTPException as e:
+                    rastro.status = e.status_code
+                    raise
+                except Exception:
+                    rastro.status = 500
+                    raise
+                rastro.status = resposta.status_code
+                if metricas.CABECALHO or request.headers.get("x-debug-tempos") == "1":
+                    resposta.headers["Server-Timing"] = rastro.cabecalho()
+                if isinstance(resposta, StreamingResponse):
+                    # A duração só é conhecida quando o corpo termina de ser enviado
+                    rastro.adiado = True
+                    resposta.body_iterator = metricas.corpo_medido(rastro, resposta.body_iterator)
+                return resposta
+        return handler
+
+router = APIRouter(route_class=RotaMedida)
 
 class Pergunta(BaseModel):
     texto: str
 
+def _exigir_dados():
+    # Enquanto a carga inicial não termina, o banco pode estar vazio ou incompleto
+    if not inicializacao.dados_prontos():
+        raise HTTPException(status_code=503, detail="Servidor iniciando, tente novamente.", headers={"Retry-After": "2"})
+
+async def executar(func, *args, tipo: str = "db", **kwargs):
+    """
+    Roda a função do serviço fora do event loop (ver backend/despacho.py).
+    Antes da carga inicial terminar, fila cheia ou timeout, responde 503/504.
+    """
+    _exigir_dados()
+    try:
+        with metricas.etapa(f"despacho.{tipo}"):
+            return await despachante.executar(func, *args, tipo=tipo, **kwargs)
+    except Sobrecarga:
+        raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente.", headers={"Retry-After": "1"})
+    except TempoEsgotado:
+        raise HTTPException(status_code=504, detail="A consulta demorou demais para responder.")
+
+# -----------------------------
+# Tratadores das intenções (ver frontend/roteador.py)
+# -----------------------------
+TRATADORES = {}
+
+def tratador(intencao: str):
+    def registrar(func):
+        TRATADORES[intencao] = func
+        return func
+    return registrar
+
+def _corpo_total_produto(total: dict):
+    return {"resposta": f"Total de vendas do produto {total['id_produto']}: R$ {total['total_vendas']:.2f}"}
+
+def _corpo_total_vendedor(total: dict):
+    return {"resposta": f"Total de vendas do vendedor {total['id_vendedor']}: R$ {total['total_vendas']:.2f}"}
+
+def _corpo_detalhes_produto(id_prod: int, detalhes):
+    return {"resposta": f"Detalhes do produto {id_prod}:", "dados": detalhes}
+
+@tratador("total_vendas_produto")
+async def _total_vendas_produto(pergunta: str, slots: dict):
+    total = await executar(service.total_vendas_produto, slots["id_produto"])
+    return {"pergunta": pergunta, **_corpo_total_produto(total)}
+
+@tratador("total_vendas_vendedor")
+async def _total_vendas_vendedor(pergunta: str, slots: dict):
+    total = await executar(service.total_vendas_vendedor, slots["id_vendedor"])
+    return {"pergunta": pergunta, **_corpo_total_vendedor(total)}
+
+@tratador("vendas_regiao")
+async def _vendas_regiao(pergunta: str, slots: dict):
+    vendas_regiao = await executar(service.vendas_por_regiao)
+    return {
+        "pergunta": pergunta,
+        "resposta": "Valor total de vendas por região:",
+        "dados": vendas_regiao
+    }
+
+@tratador("prever_produto")
+async def _prever_produto(pergunta: str, slots: dict):
+    # Pool de threads: as previsões e os gráficos já ficam em cache por versão dos dados,
+    # e num processo novo do pool "cpu" cada chamada pagaria a partida e os caches frios
+    resultado = await executar(service.prever_vendas_produto_trimestre, slots["id_produto"])
+    if "erro" in resultado:
+        return {"pergunta": pergunta, "resposta": resultado["erro"]}
+    return {
+        "pergunta": pergunta,
+        "grafico_img": resultado["grafico"]
+    }
+
+@tratador("detalhes_produto")
+async def _detalhes_produto(pergunta: str, slots: dict):
+    id_prod = slots["id_produto"]
+    detalhes = await executar(service.detalhes_produto, id_prod)
+    return {"pergunta": pergunta, **_corpo_detalhes_produto(id_prod, detalhes)}
+
+@tratador("top_produtos_categoria")
+async def _top_produtos_categoria(pergunta: str, slots: dict):
+    if not slots.get("categoria"):
+        return None
+    top_n = slots.get("top_n", 5)
+    categoria = slots["categoria"]
+    produtos = await executar(
+        service.top_produtos_categoria_ano, categoria=categoria, ano=slots.get("ano"), top_n=top_n
+    )
+    return {
+        "pergunta": pergunta,
+        "resposta": f"Top {top_n} produtos da categoria '{categoria}':",
+        "produtos": produtos
+    }
+
+@tratador("top_vendedores")
+async def _top_vendedores(pergunta: str, slots: dict):
+    resultado = await executar(service.top_vendedores, top_n=slots.get("n_vendedores", 3))
+    return {
+        "pergunta": pergunta,
+        "resposta": "Top vendedores:",
+        "dados": resultado,
+        "grafico": {
+            "tipo": "bar",
+            "labels": [r['nome_vendedor'] for r in resultado],
+            "values": [r['crescimento'] for r in resultado]
+        }
+    }
+
+@tratador("info_vendedor")
+async def _info_vendedor(pergunta: str, slots: dict):
+    resultado = await executar(service.potencial_crescimento_vendedor, slots["id_vendedor"])
+    return {
+        "pergunta": pergunta,
+        "resposta": f"Informações do vendedor {resultado['nome_vendedor']}:",
+        "potencial_crescimento": round(resultado['potencial_crescimento'], 4),
+        "regiao": resultado['regiao'],
+        "vendas_totais": resultado['vendas_totais'],
+        "produtos_mais_vendidos": resultado['produtos_mais_vendidos']
+    }
+
+
+# Intenções respondidas em lote: recebem a lista de slots e retornam os corpos
+# das respostas (sem "pergunta") na mesma ordem, com uma única consulta agrupada
+TRATADORES_LOTE = {}
+
+def tratador_lote(intencao: str):
+    def registrar(func):
+        TRATADORES_LOTE[intencao] = func
+        return func
+    return registrar
+
+@tratador_lote("total_vendas_produto")
+async def _lote_total_vendas_produto(lista_slots: list):
+    totais = await executar(service.totais_vendas_produtos, [s["id_produto"] for s in lista_slots])
+    return [_corpo_total_produto(t) for t in totais]
+
+@tratador_lote("total_vendas_vendedor")
+async def _lote_total_vendas_vendedor(lista_slots: list):
+    totais = await executar(service.totais_vendas_vendedores, [s["id_vendedor"] for s in lista_slots])
+    return [_corpo_total_vendedor(t) for t in totais]
+
+@tratador_lote("detalhes_produto")
+async def _lote_detalhes_produto(lista_slots: list):
+    ids = [s["id_produto"] for s in lista_slots]
+    detalhes = await executar(service.detalhes_produtos, ids)
+    return [_corpo_detalhes_produto(i, d) for i, d in zip(ids, detalhes)]
+
+
+def _sem_pergunta(resposta):
+    return None if resposta is None else {k: v for k, v in resposta.items() if k != "pergunta"}
+
+async def responder(rota, pergunta: str, versao: str = None):
+    """
+    Resposta da intenção, reaproveitada do cache quando a mesma intenção com os
+    mesmos slots já foi respondida nesta versão dos dados. O texto da pergunta
+    não faz parte da entrada: ele é recolocado em cada resposta.
+    """
+    tratar = TRATADORES[rota.intencao]
+    if not cache_respostas.ativo:
+        return await tratar(pergunta, rota.slots)
+
+    async def calcular():
+        return _sem_pergunta(await tratar(pergunta, rota.slots))
+
+    versao = versao or await executar(impressao_recente)
+    corpo = await cache_respostas.obter(chave(rota.intencao, rota.slots, versao), calcular)
+    return None if corpo is None else {"pergunta": pergunta, **corpo}
+
+
 # -----------------------------
 # Endpoint de Chat
 # -----------------------------
@@ -15,119 +221,16 @@ class Pergunta(BaseModel):
 async def chat_endpoint(payload: Pergunta):
     pergunta = payload.texto.lower()
 
-    # =====================
-    # VENDAS
-    # =====================
-    if "venda" in pergunta:
-        # Total de vendas de um produto
-        if match := re.search(r'produto (\d+)', pergunta):
-            id_prod = int(match.group(1))
-            total = service.total_vendas_produto(id_prod)
-            return {
-                "pergunta": pergunta,
-                "resposta": f"Total de vendas do produto {id_prod}: R$ {total['total_vendas']:.2f}"
-            }
-
-        # Total de vendas de um vendedor
-        elif match := re.search(r'vendedor (\d+)', pergunta):
-            id_vend = int(match.group(1))
-            total = service.total_vendas_vendedor(id_vend)
-            return {
-                "pergunta": pergunta,
-                "resposta": f"Total de vendas do vendedor {id_vend}: R$ {total['total_vendas']:.2f}"
-            }
-
-        # Vendas por região
-        elif re.search(r"regi[aã]o", pergunta, re.I):
-            vendas_regiao = service.vendas_por_regiao()
-            return {
-                "pergunta": pergunta,
-                "resposta": "Valor total de vendas por região:",
-                "dados": vendas_regiao
-            }
-
-    # =====================
-    # PRODUTOS
-    # =====================
-    if "produto" in pergunta:
-        if "prever" in pergunta or "previsao" in pergunta:
-            if match := re.search(r'produto (\d+)', pergunta):
-                id_prod = int(match.group(1))
-                resultado = service.prever_vendas_produto_trimestre(id_prod)
-                if "erro" in resultado:
-                    return {"pergunta": pergunta, "resposta": resultado["erro"]}
-        
-                return {
-                    "pergunta": pergunta,
-                    "grafico_img": resultado["grafico"]
-                }
-
-        
-
-        # Detalhes do produto
-        elif match := re.search(r'produto (\d+)', pergunta):
-            id_prod = int(match.group(1))
-            detalhes = service.detalhes_produto(id_prod)
-            return {
-                "pergunta": pergunta,
-                "resposta": f"Detalhes do produto {id_prod}:",
-                "dados": detalhes
-            }
-
-        # Top produtos por categoria e ano
-        elif "categoria" in pergunta and "ano" in pergunta:
-            filtros = service.extrair_filtros_produtos(pergunta)
-            if filtros.get("categoria"):
-                top_n = filtros.get("top_n", 5)
-                categoria = filtros["categoria"]
-                ano = filtros.get("ano")
-                produtos = service.top_produtos_categoria_ano(
-                    categoria=categoria, ano=ano, top_n=top_n
-                )
-
-                return {
-                    "pergunta": pergunta,
-                    "resposta": f"Top {top_n} produtos da categoria '{categoria}':",
-                    "produtos": produtos
-                }
-
-        # =====================
-        # VENDEDORES
-        # =====================
-        if "vendedor" in pergunta:
-            # Top vendedores
-            if "top" in pergunta:
-                resultado = service.top_vendedores()
-                return {
-                    "pergunta": pergunta,
-                    "resposta": "Top vendedores:",
-                    "dados": resultado,
-                    "grafico": {
-                        "tipo": "bar",
-                        "labels": [r['nome'] for r in resultado],
-                        "values": [r['crescimento'] for r in resultado]
-                    }
-                }
-
-            elif match := re.search(r'vendedor (\d+)', pergunta):
-                id_vend = int(match.group(1))
-                resultado = service.potencial_crescimento_vendedor(id_vend)
-
-                return {
-                    "pergunta": pergunta,
-                    "resposta": f"Informações do vendedor {resultado['nome_vendedor']}:",
-                    "potencial_crescimento": round(resultado['potencial_crescimento'], 4),
-                    "regiao": resultado['regiao'],
-                    "vendas_totais": resultado['vendas_totais'],
-                    "produtos_mais_vendidos": resultado['produtos_mais_vendidos']
-                }
-
-    
-
-
+    rota = roteador.rotear(payload.texto)
+    if rota is not None:
+        resposta = await responder(rota, pergunta)
+        if resposta is not None:
+            return resposta
 
+    return _nao_entendi(pergunta)
 
 
+def _nao_entendi(pergunta: str):
     # --------------------
     # Pergunta não reconhecida
     # --------------------
@@ -137,8 +240,259 @@ async def chat_endpoint(payload: Pergunta):
     }
 
 
+# -----------------------------
+# Chat em lote
+# -----------------------------
+LOTE_MAXIMO = int(os.getenv("CHAT_LOTE_MAXIMO", "500"))
+# Grupos de um lote respondidos ao mesmo tempo: cada um ocupa uma vaga na fila do
+# despachante, e um lote não deve tomar as vagas das outras requisições
+LOTE_CONCORRENCIA = int(os.getenv("CHAT_LOTE_CONCORRENCIA", "2"))
+
+async def _responder_grupo(intencao: str, rotas: list, versao: str):
+    """
+    Corpos das respostas de um grupo de perguntas com a mesma intenção, por chave
+    de cache. Slots repetidos são respondidos uma vez; intenções com tratador em
+    lote viram uma única consulta, as demais são respondidas uma a uma.
+    """
+    por_chave = {chave(intencao, rota.slots, versao): rota for rota in rotas}
+
+    async def calcular(faltantes):
+        if intencao in TRATADORES_LOTE:
+            return await TRATADORES_LOTE[intencao]([por_chave[c].slots for c in faltantes])
+        tratar = TRATADORES[intencao]
+        return [_sem_pergunta(await tratar(por_chave[c].texto, por_chave[c].slots)) for c in faltantes]
+
+    return await cache_respostas.obter_lote(list(por_chave), calcular)
+
+@router.post("/chat/batch")
+async def chat_batch_endpoint(payload: list[Pergunta]):
+    """
+    Responde várias perguntas numa requisição, na ordem recebida.
+    As perguntas são agrupadas por intenção e todos os grupos usam a mesma
+    versão dos dados; no máximo CHAT_LOTE_CONCORRENCIA grupos por vez.
+    """
+    if len(payload) > LOTE_MAXIMO:
+        raise HTTPException(status_code=413, detail=f"No máximo {LOTE_MAXIMO} perguntas por lote.")
+
+    rotas = [roteador.rotear(p.texto) for p in payload]
+    grupos = {}
+    for rota in rotas:
+        if rota is not None:
+            grupos.setdefault(rota.intencao, []).append(rota)
+
+    versao = await executar(impressao_recente)
+    limite = asyncio.Semaphore(LOTE_CONCORRENCIA)
+
+    async def responder_grupo(intencao, rotas_grupo):
+        async with limite:
+            return await _responder_grupo(intencao, rotas_grupo, versao)
+
+    corpos = {}
+    for resultado in await asyncio.gather(*(responder_grupo(i, g) for i, g in grupos.items())):
+        corpos.update(resultado)
+
+    respostas = []
+    for p, rota in zip(payload, rotas):
+        pergunta = p.texto.lower()
+        corpo = corpos.get(chave(rota.intencao, rota.slots, versao)) if rota is not None else None
+        respostas.append({"pergunta": pergunta, **corpo} if corpo is not None else _nao_entendi(pergunta))
+    return respostas
+
+
+# -----------------------------
+# Consultas com streaming (NDJSON)
+# -----------------------------
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson")
+LINHAS_POR_ENVIO = 256
+# Espera (s) por uma vaga no despachante entre dois blocos de um stream já iniciado
+ESPERA_FILA_STREAM = 0.05
+
+def _quer_stream(stream: bool, accept: str | None) -> bool:
+    return stream or any(tipo in (accept or "") for tipo in TIPOS_NDJSON)
+
+def _ndjson(linhas):
+    """
+    Uma linha JSON por registro, enviadas em blocos de LINHAS_POR_ENVIO.
+    """
+    bloco = []
+    for linha in linhas:
+        bloco.append(json.dumps(linha, ensure_ascii=False, default=str))
+        if len(bloco) >= LINHAS_POR_ENVIO:
+            yield "\n".join(bloco) + "\n"
+            bloco = []
+    if bloco:
+        yield "\n".join(bloco) + "\n"
+
+async def _enviar_blocos(blocos, primeiro):
+    """
+    Corpo do stream: cada bloco seguinte é produzido por uma chamada no
+    despachante, como as demais consultas (o gerador do serviço não roda no event
+    loop nem fora do limite dos pools). Com os cabeçalhos já enviados não cabe mais
+    um 503: com a fila cheia o envio espera uma vaga; um timeout interrompe o envio.
+    """
+    try:
+        bloco = primeiro
+        while bloco is not None:
+            yield bloco
+            while True:
+                try:
+                    with metricas.etapa("despacho.db"):
+                        bloco = await despachante.executar(next, blocos, None)
+                    break
+                except Sobrecarga:
+                    await asyncio.sleep(ESPERA_FILA_STREAM)
+    finally:
+        try:
+            blocos.close()
+        except ValueError:
+            pass  # ainda em execução numa thread do pool (timeout): termina sozinho
+
+async def _linhas_ou_stream(gerar, *args, stream: bool, accept: str | None):
+    """
+    Em modo stream, devolve as linhas do gerador do serviço em blocos de NDJSON,
+    cada um lido pelo despachante; o primeiro é lido antes de responder, então
+    fila cheia e timeout ainda viram 503/504. Senão, a lista completa.
+    """
+    if _quer_stream(stream, accept):
+        blocos = _ndjson(gerar(*args))
+        try:
+            primeiro = await executar(next, blocos, None)
+        except BaseException:
+            try:
+                blocos.close()
+            except ValueError:
+                pass  # timeout com a leitura ainda em andamento
+            raise
+        return StreamingResponse(_enviar_blocos(blocos, primeiro), media_type="application/x-ndjson")
+    return await executar(lambda: list(gerar(*args)))
+
+@router.get("/vendas/regiao")
+async def vendas_regiao_endpoint(stream: bool = False, accept: str | None = Header(default=None)):
+    return await _linhas_ou_stream(service.linhas_vendas_por_regiao, stream=stream, accept=accept)
+
+@router.get("/produtos/totais")
+async def produtos_totais_endpoint(categoria: str | None = None, stream: bool = False,
+                                   accept: str | None = Header(default=None)):
+    """
+    Quantidade e valor vendidos de cada produto do catálogo (opcionalmente de uma categoria).
+    """
+    return await _linhas_ou_stream(service.linhas_totais_produtos, categoria, stream=stream, accept=accept)
+
+@router.get("/produtos/top")
+async def produtos_top_endpoint(categoria: str, ano: int, top_n: int = Query(default=5, ge=1),
+                                stream: bool = False, accept: str | None = Header(default=None)):
+    return await _linhas_ou_stream(
+        service.linhas_top_produtos_categoria_ano, categoria, ano, top_n, stream=stream, accept=accept
+    )
+
+
+# -----------------------------
+# Previsões
+# -----------------------------
+@router.get("/previsoes")
+async def previsoes_endpoint(ids: list[int] | None = Query(default=None)):
+    """
+    Previsão do próximo trimestre de todos os produtos (ou dos `ids` informados),
+    com inclinação, intercepto, R² e número de trimestres de cada ajuste.
+    """
+    return {"previsoes": await executar(service.previsoes_produtos, ids)}
+
+
+# -----------------------------
+# Gráficos
+# -----------------------------
+@router.get("/graficos/{chave}.png")
+def grafico_endpoint(chave: str, if_none_match: str | None = Header(default=None)):
+    """
+    Serve um gráfico gerado pelo serviço. O conteúdo de uma chave nunca muda
+    (a chave inclui a impressão do conteúdo dos dados, que não se repete quando
+    o banco é recriado), então o ETag é a própria chave.
+    """
+    if not re.fullmatch(r"[0-9a-f]{24}", chave):
+        raise HTTPException(status_code=404, detail="Gráfico não encontrado")
+
+    etag = f'"{chave}"'
+    cabecalhos = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=cabecalhos)
+
+    png = graficos.obter_png(chave)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Gráfico não encontrado")
+    return Response(content=png, media_type="image/png", headers=cabecalhos)
+
+
+# -----------------------------
+# Cache de respostas
+# -----------------------------
+@router.get("/cache")
+def cache_endpoint():
+    """
+    Contadores do cache de respostas do chat (acertos, faltas, chamadas que
+    aguardaram um cálculo em andamento, erros) e número de entradas.
+    """
+    return cache_respostas.estatisticas()
+
+
+# -----------------------------
+# Prontidão
+# -----------------------------
+@router.get("/pronto")
+def pronto_endpoint(response: Response):
+    """
+    Estado da inicialização (verificação, carga, aquecimento). Responde 503 até
+    o servidor estar aquecido, para o balanceador só enviar tráfego depois disso.
+    """
+    if not inicializacao.pronto():
+        response.status_code = 503
+    return inicializacao.estado()
+
+
+# -----------------------------
+# Métricas
+# -----------------------------
+@router.get("/metrics", response_class=PlainTextResponse)
+def metricas_endpoint():
+    """
+    Histogramas de duração das requisições e das etapas, linhas e acertos de
+    cache, no formato texto do Prometheus.
+    """
+    pendentes = despachante.pendentes()
+    medidores = {
+        "chatbot_despacho_pendentes": [({"tipo": tipo}, n) for tipo, n in sorted(pendentes.items())],
+        "chatbot_cache_respostas_entradas": [({}, cache_respostas.estatisticas().get("entradas", 0))],
+    }
+    return PlainTextResponse(metricas.registro.prometheus(medidores), media_type="text/plain; version=0.0.4")
+
+
+# -----------------------------
+# Administração
+# -----------------------------
+@router.post("/admin/ingestao")
+def ingestao_incremental_endpoint(por_hash: bool = False, x_admin_token: str | None = Header(default=None)):
+    """
+    Grava no banco apenas as linhas novas/alteradas dos arquivos de data/.
+    Exige o valor de ADMIN_TOKEN no header X-Admin-Token; sem ADMIN_TOKEN
+    definido o endpoint fica desativado (403).
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Ingestão pela API desativada: defina ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Token de administração inválido")
+
+    # Import local: a ingestão (leitura de Excel/CSV, validação) fica fora da partida
+    from backend.ingestao import ingerir_incremental
+    resultado = ingerir_incremental(por_hash=por_hash)
+    if not resultado.ok:
+        raise HTTPException(status_code=422, detail={"log": resultado.log, "erros": resultado.erros})
+    return {"etapas": resultado.etapas, "log": resultado.log}
+
+
 # =====================
 # Configuração do FastAPI
 # =====================
+# App só com as rotas, sem a partida (validação/seed, aquecimento) nem o
+# desligamento dos pools: para testes e benchmarks. O servidor é `main:app`.
 app = FastAPI(title="Chatbot 🚀")
 app.include_router(router, prefix="/api")
@@ -0,0 +1,114 @@
+"""
+Roteador de intenções do chat, dirigido por tabela.
+
+A pergunta é normalizada uma vez e percorrida por um único padrão compilado que
+reconhece palavras-chave e ids (produto N, vendedor N). A intenção escolhida é a
+de menor prioridade cujas palavras-chave e slots estão todos presentes.
+Não depende do FastAPI nem do serviço: pode ser medido isoladamente.
+"""
+import re
+from dataclasses import dataclass, field
+
+from backend.texto import extrair_filtros_produtos, normalizar
+
+# Slots numéricos: (nome, padrão com um grupo de captura, palavra-chave implícita).
+# Palavras que só dão contexto ao número ficam num lookahead: consumidas pelo
+# slot, deixariam de ser vistas como palavras-chave ("5 melhores vendedores").
+_SLOTS = [
+    ("id_produto", r"produto\s+(\d+)", "produto"),
+    ("id_vendedor", r"vendedor\s+(\d+)", "vendedor"),
+    ("n_vendedores", r"(\d+)\s+(?=(?:melhores\s+|maiores\s+)?vendedores)", "vendedor"),
+]
+
+# Palavras-chave canônicas e suas variações (texto já sem acentos)
+_PALAVRAS = {
+    "previsao": r"prever|previs(?:ao|oes)|projec(?:ao|oes)|projetar",
+    "regiao": r"regi(?:ao|oes)",
+    "vendedor": r"vendedor(?:es|as|a)?",
+    "venda": r"vendas?\b",
+    "produto": r"produtos?",
+    "categoria": r"categorias?",
+    "ano": r"\bano\b",
+    "top": r"\btop\b|melhores|maiores",
+}
+
+
+@dataclass(frozen=True)
+class Intencao:
+    nome: str
+    prioridade: int
+    palavras: frozenset = frozenset()
+    slots: tuple = ()
+    opcionais: tuple = ()  # slots repassados ao tratador quando presentes
+    filtros_produtos: bool = False  # extrai categoria/ano/top_n
+
+
+@dataclass
+class Rota:
+    intencao: str
+    slots: dict = field(default_factory=dict)
+    texto: str = ""
+
+
+class Roteador:
+    def __init__(self):
+        self._intencoes = []
+        partes = [f"(?P<s_{nome}>{padrao})" for nome, padrao, _ in _SLOTS]
+        partes += [f"(?P<p_{nome}>{padrao})" for nome, padrao in _PALAVRAS.items()]
+        self._padrao = re.compile("|".join(partes))
+        self._slots = {nome: (re.compile(padrao), palavra) for nome, padrao, palavra in _SLOTS}
+
+    def registrar(self, nome: str, prioridade: int, palavras=(), slots=(), opcionais=(), filtros_produtos: bool = False):
+        self._intencoes.append(
+            Intencao(nome, prioridade, frozenset(palavras), tuple(slots), tuple(opcionais), filtros_produtos)
+        )
+        self._intencoes.sort(key=lambda i: i.prioridade)
+
+    @property
+    def intencoes(self):
+        return list(self._intencoes)
+
+    def _varrer(self, texto: str):
+        """
+        Uma passada do padrão combinado: retorna (palavras encontradas, slots numéricos).
+        """
+        palavras, slots = set(), {}
+        for m in self._padrao.finditer(texto):
+            grupo = m.lastgroup
+            if grupo.startswith("s_"):
+                nome = grupo[2:]
+                padrao, palavra = self._slots[nome]
+                # Casa no texto inteiro, a partir do início do slot, para o lookahead ver o que vem depois
+                slots.setdefault(nome, int(padrao.match(texto, m.start(grupo)).group(1)))
+                palavras.add(palavra)
+            else:
+                palavras.add(grupo[2:])
+        return palavras, slots
+
+    def rotear(self, texto: str):
+        """
+        Retorna a `Rota` da pergunta ou None se nenhuma intenção casar.
+        """
+        normalizado = normalizar(texto)
+        palavras, slots = self._varrer(normalizado)
+        for intencao in self._intencoes:
+            if intencao.palavras <= palavras and all(s in slots for s in intencao.slots):
+                valores = {s: slots[s] for s in intencao.slots + intencao.opcionais if s in slots}
+                if intencao.filtros_produtos:
+                    valores.update(extrair_filtros_produtos(normalizado, normalizado=True))
+                return Rota(intencao.nome, valores, normalizado)
+        return None
+
+
+# -----------------------------
+# Tabela de intenções
+# -----------------------------
+roteador = Roteador()
+roteador.registrar("prever_produto", 10, palavras={"previsao"}, slots=("id_produto",))
+roteador.registrar("total_vendas_produto", 20, palavras={"venda"}, slots=("id_produto",))
+roteador.registrar("total_vendas_vendedor", 30, palavras={"venda"}, slots=("id_vendedor",))
+roteador.registrar("vendas_regiao", 40, palavras={"venda", "regiao"})
+roteador.registrar("top_vendedores", 50, palavras={"vendedor", "top"}, opcionais=("n_vendedores",))
+roteador.registrar("info_vendedor", 60, slots=("id_vendedor",))
+roteador.registrar("top_produtos_categoria", 70, palavras={"categoria", "ano"}, filtros_produtos=True)
+roteador.registrar("detalhes_produto", 80, slots=("id_produto",))
@@ -1,18 +1,18 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from data_test.valida_dados import validar_dados
-from backend.seed import seed_db_from_files
+from backend import inicializacao
+from backend.despacho import despachante
 from frontend.api import router as api_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Antes de iniciar o servidor, valida e carrega o seed
-    if not validar_dados():
-        raise Exception("Falha na validação/limpeza de dados.")
-    seed_db_from_files()
-    print("✅ Dados validados e seed carregado.")
+    # Validação/seed (ou a verificação de que podem ser pulados) e o aquecimento
+    # dos caches rodam em segundo plano; /api/pronto informa quando terminaram.
+    # Com INICIALIZACAO=bloqueante, só aceita requisições depois disso.
+    inicializacao.iniciar()
     yield
-    # Aqui poderia entrar lógica de "shutdown", se precisar
+    # Encerra os pools de threads/processos das consultas
+    despachante.desligar()
 
 # FastAPI App
 app = FastAPI(
@@ -22,3 +22,4 @@ app = FastAPI(
 
 # Inclui todas as rotas definidas em frontend/api.py
 app.include_router(api_router, prefix="/api")
+
@@ -0,0 +1,79 @@
+"""
+Configuração comum dos testes: banco SQLite, gráficos e cache de fontes num
+diretório temporário, snapshot na memória do processo e despachante sem pool de
+processos. As variáveis são definidas antes de qualquer import do backend:
+a ENGINE e as configurações são lidas no import dos módulos.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+TEMP = tempfile.mkdtemp(prefix="chatbot-testes-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEMP, 'chatbot.db')}",
+    "SNAPSHOT_COMPARTILHADO": "0",
+    "DESPACHO_PROCESSOS": "0",
+    "CACHE_FONTES_DIR": os.path.join(TEMP, "cache_fontes"),
+    "GRAFICOS_DIR": os.path.join(TEMP, "graficos"),
+    "CACHE_RESPOSTAS": "memoria",
+    "INICIALIZACAO_AQUECER": "0",
+    "VALIDACAO_TAMANHO_BLOCO": "1000",  # vários blocos com os arquivos pequenos dos testes
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEMP, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def arquivos():
+    """
+    Arquivos sintéticos (CSV) com as colunas dos reais, ~1% das vendas sujas.
+    """
+    from bench.dados import gerar
+    return gerar(3000, os.path.join(TEMP, "fontes"), formato="csv")
+
+
+def _recriar_banco():
+    from backend import snapshot
+    from backend.database import Base, ENGINE
+    from backend.migracoes import migrar
+
+    Base.metadata.drop_all(ENGINE)
+    migrar()
+    snapshot.invalidar()
+    return ENGINE
+
+
+@pytest.fixture
+def recriar_banco():
+    """
+    Função que apaga e recria o banco (esquema atual, sem dados).
+    """
+    return _recriar_banco
+
+
+@pytest.fixture
+def banco_vazio():
+    """
+    Banco recriado do zero (esquema atual, sem dados).
+    """
+    from backend import snapshot
+
+    yield _recriar_banco()
+    snapshot.invalidar()
+
+
+@pytest.fixture
+def banco(banco_vazio, arquivos):
+    """
+    Banco carregado com os arquivos sintéticos pelo pipeline completo.
+    """
+    from backend import snapshot
+    from backend.ingestao import executar_pipeline
+
+    assert executar_pipeline(arquivos).ok
+    snapshot.invalidar()
+    return banco_vazio
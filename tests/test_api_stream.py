@@ -0,0 +1,57 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import metricas
+from backend.despacho import despachante
+from frontend import api
+
+
+@pytest.fixture
+def cliente(banco):
+    return TestClient(api.app)
+
+
+def _linhas(resposta):
+    return [json.loads(linha) for linha in resposta.text.splitlines()]
+
+
+def test_stream_igual_a_lista(cliente, monkeypatch):
+    monkeypatch.setattr(api, "LINHAS_POR_ENVIO", 8)
+    lista = cliente.get("/api/produtos/totais").json()
+    stream = cliente.get("/api/produtos/totais?stream=1")
+    assert stream.headers["content-type"].startswith("application/x-ndjson")
+    assert _linhas(stream) == json.loads(json.dumps(lista))
+    assert _linhas(cliente.get("/api/produtos/totais", headers={"Accept": "application/x-ndjson"})) == _linhas(stream)
+
+def test_stream_le_cada_bloco_pelo_despachante(cliente, monkeypatch):
+    monkeypatch.setattr(api, "LINHAS_POR_ENVIO", 8)
+    chamadas = []
+    original = despachante.executar
+
+    async def contar(func, *args, **kwargs):
+        chamadas.append(func)
+        return await original(func, *args, **kwargs)
+
+    monkeypatch.setattr(despachante, "executar", contar)
+    linhas = _linhas(cliente.get("/api/produtos/totais?stream=1"))
+    blocos = -(-len(linhas) // 8)
+    assert blocos > 1
+    assert chamadas.count(next) == blocos + 1  # a última chamada encontra o gerador esgotado
+
+def test_stream_responde_503_com_a_fila_cheia(cliente, monkeypatch):
+    monkeypatch.setitem(despachante._limites, "db", 0)
+    resposta = cliente.get("/api/vendas/regiao?stream=1")
+    assert resposta.status_code == 503
+    assert resposta.headers["retry-after"] == "1"
+
+def test_stream_registra_a_duracao_ao_fim_do_envio(cliente, monkeypatch):
+    registradas = []
+    monkeypatch.setattr(metricas, "_encerrar", lambda rastro: registradas.append((rastro.rota, rastro.status, rastro.etapas)))
+    resposta = cliente.get("/api/produtos/totais?stream=1")
+    assert resposta.status_code == 200
+    assert len(registradas) == 1
+    rota, status, etapas = registradas[0]
+    assert (rota, status) == ("GET /api/produtos/totais", 200)
+    assert etapas["despacho.db"][0] >= 2  # os blocos lidos durante o envio entram no rastro
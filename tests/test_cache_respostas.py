@@ -0,0 +1,159 @@
+import asyncio
+import types
+
+import numpy as np
+import pytest
+
+from backend import cache_respostas as modulo
+from backend.cache_respostas import BackendMemoria, BackendRedis, CacheRespostas, RedisLocal, chave
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """
+    time.monotonic controlado pelo teste: relogio.agora += segundos.
+    """
+    relogio = types.SimpleNamespace(agora=1000.0)
+    monkeypatch.setattr(modulo, "time", types.SimpleNamespace(monotonic=lambda: relogio.agora))
+    return relogio
+
+
+def test_chave_independe_da_ordem_dos_slots():
+    assert chave("top", {"a": 1, "b": 2}, "v1-x") == chave("top", {"b": 2, "a": 1}, "v1-x")
+    assert chave("top", {"a": 1}, "v1-x") != chave("top", {"a": 1}, "v1-y")
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+def test_memoria_expira_pelo_ttl(relogio):
+    backend = BackendMemoria(tamanho=10, ttl=5)
+    backend.gravar("a", {"x": 1})
+    relogio.agora += 4.9
+    assert backend.ler("a") == {"x": 1}
+    relogio.agora += 0.2
+    assert backend.ler("a") is None
+    assert len(backend) == 0
+
+def test_memoria_despeja_o_menos_usado():
+    backend = BackendMemoria(tamanho=2, ttl=60)
+    backend.gravar("a", 1)
+    backend.gravar("b", 2)
+    assert backend.ler("a") == 1  # "b" passa a ser o menos usado
+    backend.gravar("c", 3)
+    assert backend.ler("b") is None
+    assert (backend.ler("a"), backend.ler("c")) == (1, 3)
+
+def test_redis_local(relogio):
+    cliente = RedisLocal()
+    assert cliente.set("p:a", "texto", ex=10)
+    cliente.set("p:b", b"bytes")
+    cliente.set("q:c", "outro")
+    assert cliente.get("p:a") == b"texto"
+    assert sorted(cliente.scan_iter(match="p:*")) == ["p:a", "p:b"]
+    assert cliente.dbsize() == 3
+
+    relogio.agora += 11
+    assert cliente.get("p:a") is None
+    assert cliente.get("p:b") == b"bytes"  # sem `ex` não expira
+    assert cliente.delete("p:b", "inexistente") == 1
+    assert cliente.dbsize() == 1
+
+def test_backend_redis_serializa_e_expira(relogio):
+    backend = BackendRedis(RedisLocal(), ttl=30)
+    backend.gravar("k", {"total": np.float64(1.5), "n": np.int64(3), "dados": [1, "á"]})
+    assert backend.ler("k") == {"total": 1.5, "n": 3, "dados": [1, "á"]}
+    assert len(backend) == 1
+    relogio.agora += 31
+    assert backend.ler("k") is None
+
+    backend.gravar("k", 1)
+    backend.limpar()
+    assert len(backend) == 0
+
+
+# -----------------------------
+# Single-flight
+# -----------------------------
+def test_chamadas_simultaneas_calculam_uma_vez():
+    async def cenario():
+        cache = CacheRespostas(BackendMemoria())
+        chamadas = 0
+
+        async def calcular():
+            nonlocal chamadas
+            chamadas += 1
+            await asyncio.sleep(0.01)
+            return {"valor": 42}
+
+        valores = await asyncio.gather(*(cache.obter("k", calcular) for _ in range(5)))
+        return cache, chamadas, valores
+
+    cache, chamadas, valores = asyncio.run(cenario())
+    assert chamadas == 1
+    assert valores == [{"valor": 42}] * 5
+    assert cache.estatisticas()["compartilhados"] == 4
+    assert cache.backend.ler("k") == {"valor": 42}
+
+def test_cancelar_o_calculo_nao_cancela_quem_aguardava():
+    async def cenario():
+        cache = CacheRespostas(BackendMemoria())
+        chamadas = 0
+        liberar = asyncio.Event()
+
+        async def calcular():
+            nonlocal chamadas
+            chamadas += 1
+            await liberar.wait()
+            return chamadas
+
+        lider = asyncio.create_task(cache.obter("k", calcular))
+        await asyncio.sleep(0)
+        aguardando = [asyncio.create_task(cache.obter("k", calcular)) for _ in range(3)]
+        await asyncio.sleep(0)
+        lider.cancel()
+        await asyncio.sleep(0)
+        liberar.set()
+        return lider, await asyncio.gather(*aguardando), chamadas
+
+    lider, valores, chamadas = asyncio.run(cenario())
+    assert lider.cancelled()
+    assert chamadas == 2  # um dos que aguardavam refez o cálculo, os outros o compartilharam
+    assert valores == [2, 2, 2]
+
+def test_excecao_chega_a_todos_e_nao_e_guardada():
+    async def cenario():
+        cache = CacheRespostas(BackendMemoria())
+
+        async def falhar():
+            await asyncio.sleep(0.01)
+            raise ValueError("falhou")
+
+        resultados = await asyncio.gather(*(cache.obter("k", falhar) for _ in range(3)), return_exceptions=True)
+        return cache, resultados
+
+    cache, resultados = asyncio.run(cenario())
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert cache.backend.ler("k") is None
+    assert cache.estatisticas()["erros"] == 1
+
+def test_resposta_none_nao_e_guardada():
+    async def nada():
+        return None
+
+    cache = CacheRespostas(BackendMemoria())
+    assert asyncio.run(cache.obter("k", nada)) is None
+    assert len(cache.backend) == 0
+
+def test_lote_calcula_so_as_faltantes_uma_vez():
+    pedidas = []
+
+    async def calcular(faltantes):
+        pedidas.append(list(faltantes))
+        return [c.upper() for c in faltantes]
+
+    cache = CacheRespostas(BackendMemoria())
+    cache.backend.gravar("a", "A")
+    valores = asyncio.run(cache.obter_lote(["a", "b", "c", "b"], calcular))
+    assert valores == {"a": "A", "b": "B", "c": "C"}
+    assert pedidas == [["b", "c"]]
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from backend.database import ENGINE, FonteCarregada, Produto, Venda, VendaProdutoTrimestre, VendaVendedorMes, Vendedor
+from backend.ingestao import aplicar_delta, calcular_delta, executar_pipeline
+from backend.snapshot import versao_atual
+
+
+def _tabelas():
+    with ENGINE.connect() as conn:
+        return {
+            modelo.__tablename__: pd.read_sql(select(modelo).order_by(*modelo.__table__.primary_key.columns), conn)
+            for modelo in (Produto, Vendedor, Venda, VendaVendedorMes, VendaProdutoTrimestre)
+        }
+
+
+def test_carga_em_blocos_grava_o_mesmo_banco(banco_vazio, recriar_banco, arquivos):
+    assert executar_pipeline(arquivos, em_blocos=False).ok
+    esperado = _tabelas()
+
+    recriar_banco()
+    resultado = executar_pipeline(arquivos, em_blocos=True)
+    assert resultado.ok
+    assert "vendas" not in resultado.frames
+    assert resultado.etapas[-1]["linhas"]["blocos"] > 1
+    obtido = _tabelas()
+    for tabela, df in esperado.items():
+        pd.testing.assert_frame_equal(obtido[tabela], df, check_dtype=False, obj=tabela)
+    with ENGINE.connect() as conn:
+        assert {f.nome for f in conn.execute(select(FonteCarregada)).all()} == set(arquivos)
+
+
+def test_carga_em_blocos_desfeita_com_erro(banco_vazio, arquivos, tmp_path):
+    vendas = pd.read_csv(arquivos["vendas"], sep=";")
+    vendas.drop(columns=["Quantidade"]).to_csv(tmp_path / "vendas.csv", sep=";", index=False)
+    resultado = executar_pipeline(dict(arquivos, vendas=str(tmp_path / "vendas.csv")), em_blocos=True)
+    assert not resultado.ok
+    with ENGINE.connect() as conn:
+        assert conn.execute(select(Produto.id_produto).limit(1)).first() is None
+
+
+# -----------------------------
+# Ingestão incremental
+# -----------------------------
+@pytest.fixture
+def alterados(arquivos, tmp_path):
+    """
+    Os arquivos de teste com um produto renomeado, uma venda antiga corrigida
+    e dez vendas novas.
+    """
+    produtos = pd.read_csv(arquivos["produtos"], sep=";")
+    produtos.loc[0, "Nome_Produto"] = "Produto Renomeado"
+    vendas = pd.read_csv(arquivos["vendas"], sep=";")
+    valida = vendas.index[(vendas["Quantidade"] > 0) & vendas["Id_Produto"].isin(produtos["Id_Produto"])][0]
+    vendas.loc[valida, "Quantidade"] += 1
+    vendas.loc[valida, "R$_Total"] = round(vendas.loc[valida, "Quantidade"] * vendas.loc[valida, "R$_Unit"], 2)
+    novas = vendas[vendas["Quantidade"] > 0].tail(10).copy()
+    novas["Id_Venda"] = vendas["Id_Venda"].max() + 1 + np.arange(len(novas))
+    vendas = pd.concat([vendas, novas], ignore_index=True)
+
+    caminhos = dict(arquivos)
+    for tabela, df in (("produtos", produtos), ("vendas", vendas)):
+        caminhos[tabela] = str(tmp_path / f"{tabela}.csv")
+        df.to_csv(caminhos[tabela], sep=";", index=False)
+    return caminhos
+
+
+def _delta(arquivos, por_hash=True):
+    resultado = executar_pipeline(arquivos, carregar_banco=False)
+    assert resultado.ok
+    return calcular_delta(resultado.frames, por_hash=por_hash)
+
+
+def test_delta_vazio_com_os_mesmos_arquivos(banco, arquivos):
+    antes, versao = _tabelas(), versao_atual()
+    delta = _delta(arquivos)
+    assert {tabela: len(df) for tabela, df in delta.items()} == dict.fromkeys(delta, 0)
+    assert not any(aplicar_delta(delta).values())
+    assert versao_atual() == versao
+    for tabela, df in antes.items():
+        pd.testing.assert_frame_equal(_tabelas()[tabela], df, obj=tabela)
+
+
+def test_delta_aplicado_iguala_a_carga_completa(banco_vazio, recriar_banco, arquivos, alterados):
+    assert executar_pipeline(alterados).ok
+    esperado = _tabelas()
+
+    recriar_banco()
+    assert executar_pipeline(arquivos).ok
+    delta = _delta(alterados)
+    assert aplicar_delta(delta) == {"produtos": 1, "vendedores": 0, "vendas": 10, "vendas_alteradas": 1}
+    for tabela, df in esperado.items():
+        pd.testing.assert_frame_equal(_tabelas()[tabela], df, check_dtype=False, obj=tabela)
+
+    # Depois de aplicado, o delta dos mesmos arquivos é vazio; reaplicar o antigo não muda os dados
+    versao = versao_atual()
+    assert not any(aplicar_delta(_delta(alterados)).values())
+    assert versao_atual() == versao
+    aplicar_delta(delta)
+    for tabela, df in esperado.items():
+        pd.testing.assert_frame_equal(_tabelas()[tabela], df, check_dtype=False, obj=tabela)
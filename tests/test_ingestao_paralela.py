@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+import pytest
+
+from backend import inicializacao
+from backend.ingestao import executar_pipeline, fontes_inalteradas
+from backend.ingestao_paralela import ingerir_arquivos
+
+
+@pytest.fixture
+def particoes(arquivos, tmp_path):
+    """
+    Os mesmos dados, com as vendas divididas em dois arquivos.
+    """
+    vendas = pd.read_csv(arquivos["vendas"], sep=";")
+    metade = len(vendas) // 2
+    vendas.iloc[:metade].to_csv(tmp_path / "vendas_1.csv", sep=";", index=False)
+    vendas.iloc[metade:].to_csv(tmp_path / "vendas_2.csv", sep=";", index=False)
+    for tabela in ("produtos", "vendedores"):
+        pd.read_csv(arquivos[tabela], sep=";").to_csv(tmp_path / f"{tabela}.csv", sep=";", index=False)
+    return str(tmp_path)
+
+
+def test_particoes_consolidam_como_arquivo_unico(arquivos, particoes):
+    esperado = executar_pipeline(arquivos, carregar_banco=False)
+    resultado = ingerir_arquivos(particoes, processos=0, carregar_banco=False)
+    assert resultado.ok
+    for tabela in ("produtos", "vendedores", "vendas"):
+        pd.testing.assert_frame_equal(
+            resultado.frames[tabela].reset_index(drop=True),
+            esperado.frames[tabela].reset_index(drop=True),
+            check_dtype=False,
+        )
+
+
+def test_partida_reconhece_carga_paralela(banco_vazio, arquivos):
+    assert ingerir_arquivos(os.path.dirname(arquivos["vendas"]), processos=0).ok
+    assert fontes_inalteradas(arquivos)
+    assert inicializacao._verificar(arquivos)
+
+
+def test_partida_nao_recarrega_banco_com_arquivos_diferentes(banco_vazio, arquivos, particoes):
+    assert ingerir_arquivos(particoes, processos=0).ok
+    assert not fontes_inalteradas(arquivos)
+    assert inicializacao._verificar(arquivos)  # só avisa: o seed não carrega banco com dados
+
+
+def test_partida_carrega_banco_vazio(banco_vazio, arquivos):
+    assert not inicializacao._verificar(arquivos)
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import inspect, select
+
+from backend.database import Venda, VersaoSchema, criar_engine
+from backend.migracoes import MIGRACOES, PLANOS, migrar, plano, usa_indice
+
+# Esquema anterior às migrações: vendas sem ano/mes e sem os índices compostos
+ESQUEMA_ANTIGO = [
+    "CREATE TABLE produtos (id_produto INTEGER PRIMARY KEY, nome_produto VARCHAR NOT NULL, "
+    "categoria VARCHAR NOT NULL, preco FLOAT NOT NULL)",
+    "CREATE INDEX ix_produtos_id_produto ON produtos (id_produto)",
+    "CREATE TABLE vendedores (id_vendedor INTEGER PRIMARY KEY, nome_vendedor VARCHAR NOT NULL, regiao VARCHAR NOT NULL)",
+    "CREATE INDEX ix_vendedores_id_vendedor ON vendedores (id_vendedor)",
+    "CREATE TABLE vendas (id_venda INTEGER PRIMARY KEY, id_produto INTEGER REFERENCES produtos (id_produto), "
+    "id_vendedor INTEGER REFERENCES vendedores (id_vendedor), quantidade INTEGER NOT NULL, "
+    "data_venda DATE NOT NULL, preco_unit FLOAT NOT NULL, valor_total FLOAT NOT NULL)",
+    "CREATE INDEX ix_vendas_id_venda ON vendas (id_venda)",
+    "INSERT INTO produtos VALUES (1, 'Produto 1', 'Alimentos', 10.0)",
+    "INSERT INTO vendedores VALUES (1, 'Vendedor 1', 'Sul')",
+    "INSERT INTO vendas VALUES (1, 1, 1, 2, '2023-05-17', 10.0, 20.0), (2, 1, 1, 1, '2024-12-01', 10.0, 10.0)",
+]
+
+
+@pytest.fixture
+def banco_novo(tmp_path):
+    engine = criar_engine(f"sqlite:///{tmp_path / 'novo.db'}")
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def banco_antigo(tmp_path):
+    engine = criar_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    with engine.begin() as conn:
+        for sql in ESQUEMA_ANTIGO:
+            conn.exec_driver_sql(sql)
+    yield engine
+    engine.dispose()
+
+
+def _conferir(engine):
+    numeros = [numero for numero, _, _ in MIGRACOES]
+    with engine.connect() as conn:
+        assert sorted(conn.execute(select(VersaoSchema.numero)).scalars()) == numeros
+        for nome, (stmt, indice) in PLANOS.items():
+            texto = plano(conn, stmt)
+            assert usa_indice(texto, indice), f"{nome}: {texto}"
+    assert migrar(engine) == []  # idempotente: nada pendente na segunda vez
+
+
+def test_banco_novo(banco_novo):
+    assert migrar(banco_novo) == [numero for numero, _, _ in MIGRACOES]
+    _conferir(banco_novo)
+
+def test_banco_antigo(banco_antigo):
+    assert migrar(banco_antigo) == [numero for numero, _, _ in MIGRACOES]
+    _conferir(banco_antigo)
+
+    colunas = {c["name"] for c in inspect(banco_antigo).get_columns("vendas")}
+    assert {"ano", "mes"} <= colunas
+    with banco_antigo.connect() as conn:
+        periodos = conn.execute(select(Venda.id_venda, Venda.ano, Venda.mes).order_by(Venda.id_venda)).all()
+    assert [tuple(p) for p in periodos] == [(1, 2023, 5), (2, 2024, 12)]
+
+def test_usa_indice_recusa_varredura():
+    assert usa_indice("SEARCH vendas USING COVERING INDEX ix_vendas_produto_data (id_produto=?)", "ix_vendas_produto_data")
+    assert usa_indice("SEARCH produtos USING INDEX ix_produtos_categoria (categoria=?)", "ix_produtos_categoria")
+    assert not usa_indice("SCAN vendas USING COVERING INDEX ix_vendas_produto_data", "ix_vendas_produto_data")
+    assert not usa_indice("SCAN vendas", "ix_vendas_produto_data")
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from backend import previsao, service
+from backend.database import ENGINE, Venda
+
+LinearRegression = pytest.importorskip("sklearn.linear_model").LinearRegression
+
+
+def _previsao_original(df_vendas: pd.DataFrame, id_produto: int) -> float:
+    """
+    O modelo anterior: uma regressão por produto sobre os trimestres com venda.
+    """
+    df = df_vendas[df_vendas["id_produto"] == id_produto].copy()
+    df["trimestre"] = pd.to_datetime(df["data_venda"]).dt.to_period("Q")
+    df_trimestre = df.groupby("trimestre")["valor_total"].sum().reset_index()
+    df_trimestre["trimestre_num"] = np.arange(len(df_trimestre))
+    modelo = LinearRegression().fit(df_trimestre[["trimestre_num"]], df_trimestre["valor_total"])
+    return float(modelo.predict(pd.DataFrame({"trimestre_num": [len(df_trimestre)]}))[0])
+
+
+def test_ajuste_conjunto_igual_ao_modelo_por_produto(banco, monkeypatch):
+    monkeypatch.setattr(previsao, "_cache", {})
+    with ENGINE.connect() as conn:
+        df_vendas = pd.read_sql(select(Venda.id_produto, Venda.data_venda, Venda.valor_total), conn)
+
+    previsoes = {p["id_produto"]: p["previsao"] for p in service.previsoes_produtos()}
+    assert set(previsoes) == set(df_vendas["id_produto"])
+    for id_produto, valor in previsoes.items():
+        assert valor == pytest.approx(_previsao_original(df_vendas, id_produto), rel=1e-6, abs=1e-4)
+
+
+def test_ajuste_de_series_conhecidas():
+    df = pd.DataFrame({
+        "id_produto": [2, 2, 2, 2, 7, 9, 9],
+        "ano": [2023, 2023, 2022, 2023, 2024, 2024, 2024],
+        "trimestre": [1, 3, 4, 2, 1, 2, 1],
+        "valor_total": [20.0, 40.0, 10.0, 30.0, 5.0, 8.0, 8.0],
+    })
+    previsoes = previsao.ajustar(df, "teste")
+
+    assert previsoes.ids.tolist() == [2, 7, 9]
+    assert previsoes.registros([9, 2, 404]) == [previsoes.registro(2), previsoes.registro(0)]
+    # Reta exata (10, 20, 30, 40 em ordem de trimestre)
+    assert previsoes.registro(0) == pytest.approx(
+        {"id_produto": 2, "previsao": 50.0, "inclinacao": 10.0, "intercepto": 10.0, "r2": 1.0, "n_trimestres": 4})
+    # Um trimestre só ou série constante: sem tendência, prevê o último valor
+    assert previsoes.previsao[1] == pytest.approx(5.0) and previsoes.inclinacao[1] == 0
+    assert previsoes.previsao[2] == pytest.approx(8.0) and previsoes.r2[2] == 1.0
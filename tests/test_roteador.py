@@ -0,0 +1,43 @@
+import pytest
+
+from frontend.roteador import roteador
+
+
+@pytest.mark.parametrize("pergunta, slots", [
+    ("quais os 5 melhores vendedores", {"n_vendedores": 5}),
+    ("Quais são os 5 melhores vendedores?", {"n_vendedores": 5}),
+    ("top 3 vendedores", {"n_vendedores": 3}),
+    ("os 10 maiores vendedores", {"n_vendedores": 10}),
+    ("melhores vendedores", {}),
+    ("top vendedores", {}),
+])
+def test_top_vendedores(pergunta, slots):
+    rota = roteador.rotear(pergunta)
+    assert rota is not None
+    assert rota.intencao == "top_vendedores"
+    assert rota.slots == slots
+
+
+@pytest.mark.parametrize("pergunta, intencao, slots", [
+    ("qual a previsão do produto 3", "prever_produto", {"id_produto": 3}),
+    ("total de vendas do produto 7", "total_vendas_produto", {"id_produto": 7}),
+    ("vendas do vendedor 2", "total_vendas_vendedor", {"id_vendedor": 2}),
+    ("vendas por região", "vendas_regiao", {}),
+    ("me fale do vendedor 4", "info_vendedor", {"id_vendedor": 4}),
+    ("detalhes do produto 9", "detalhes_produto", {"id_produto": 9}),
+])
+def test_intencoes(pergunta, intencao, slots):
+    rota = roteador.rotear(pergunta)
+    assert rota is not None
+    assert (rota.intencao, rota.slots) == (intencao, slots)
+
+
+def test_filtros_de_produtos():
+    rota = roteador.rotear("top 3 produtos da categoria eletronicos no ano de 2023")
+    assert rota.intencao == "top_produtos_categoria"
+    assert rota.slots["ano"] == 2023
+    assert rota.slots["top_n"] == 3
+
+
+def test_pergunta_sem_intencao():
+    assert roteador.rotear("bom dia") is None
@@ -0,0 +1,124 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from backend import service
+from backend.database import ENGINE, Produto, Venda
+
+
+@pytest.fixture(params=[True, False], ids=["sql", "pandas"])
+def caminho(request, banco, monkeypatch):
+    """
+    Roda o teste nas consultas SQL e nas implementações pandas (CONSULTAS_SQL=0).
+    """
+    monkeypatch.setattr(service, "USAR_SQL", request.param)
+    return request.param
+
+
+def _vendas_com_produto():
+    with ENGINE.connect() as conn:
+        return pd.read_sql(
+            select(Venda.id_produto, Venda.ano, Venda.valor_total, Produto.categoria, Produto.nome_produto)
+            .join(Produto, Produto.id_produto == Venda.id_produto),
+            conn,
+        )
+
+
+def test_top_produtos_em_ordem_decrescente(caminho):
+    # Mudança de comportamento: a versão original ordenava em ordem crescente (os que menos venderam)
+    vendas = _vendas_com_produto()
+    categoria, ano = vendas.groupby(["categoria", "ano"]).size().idxmax()
+    categorias = set(service.resolver_categoria(categoria).categorias)
+
+    do_ano = vendas[(vendas["ano"] == ano) & vendas["categoria"].isin(categorias)]
+    totais = do_ano.groupby("id_produto")["valor_total"].sum().reset_index()
+    esperado = totais.sort_values(["valor_total", "id_produto"], ascending=[False, True]).head(5)
+
+    top = service.top_produtos_categoria_ano(categoria, int(ano), 5)
+    assert [t["id_produto"] for t in top] == esperado["id_produto"].tolist()
+    assert [t["valor_total"] for t in top] == pytest.approx(esperado["valor_total"].tolist())
+    valores = [t["valor_total"] for t in top]
+    assert valores == sorted(valores, reverse=True)
+
+
+# -----------------------------
+# SQL x pandas
+# -----------------------------
+def _nos_dois_caminhos(monkeypatch, func, *args, **kwargs):
+    """
+    Resultado de `func` pela consulta SQL e pela implementação pandas, com os
+    caches por versão (categorias, ranking, previsões) vazios em cada caminho.
+    """
+    from backend import categorias, previsao, ranking
+
+    resultados = []
+    for usar_sql in (True, False):
+        monkeypatch.setattr(service, "USAR_SQL", usar_sql)
+        for modulo in (categorias, previsao, ranking):
+            monkeypatch.setattr(modulo, "_cache", {})
+        resultado = func(*args, **kwargs)
+        resultados.append(list(resultado) if inspect.isgenerator(resultado) else resultado)
+    return resultados
+
+
+def _ids(df, coluna):
+    return sorted(int(i) for i in df[coluna].unique())
+
+
+def _aproximado(obtido, esperado):
+    # Somas em ordens diferentes (banco x numpy): iguais só até o arredondamento
+    if isinstance(esperado, dict):
+        assert obtido.keys() == esperado.keys()
+        for chave in esperado:
+            _aproximado(obtido[chave], esperado[chave])
+    elif isinstance(esperado, (list, tuple)):
+        assert len(obtido) == len(esperado)
+        for a, b in zip(obtido, esperado):
+            _aproximado(a, b)
+    elif isinstance(esperado, (float, np.floating)):
+        assert obtido == pytest.approx(esperado, rel=1e-9, abs=1e-6)
+    else:
+        assert obtido == esperado
+
+
+def test_totais_iguais_nos_dois_caminhos(banco, monkeypatch):
+    vendas = _vendas_com_produto()
+    produtos = _ids(vendas, "id_produto")[:5] + [999999]
+    for id_produto in produtos:
+        _aproximado(*_nos_dois_caminhos(monkeypatch, service.total_vendas_produto, id_produto))
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.totais_vendas_produtos, produtos + produtos[:2]))
+
+    with ENGINE.connect() as conn:
+        vendedores = sorted(pd.read_sql(select(Venda.id_vendedor).distinct(), conn)["id_vendedor"].tolist())[:5]
+    vendedores = [int(i) for i in vendedores] + [999999]
+    for id_vendedor in vendedores:
+        _aproximado(*_nos_dois_caminhos(monkeypatch, service.total_vendas_vendedor, id_vendedor))
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.totais_vendas_vendedores, vendedores))
+
+
+def test_agregacoes_iguais_nos_dois_caminhos(banco, monkeypatch):
+    vendas = _vendas_com_produto()
+    categoria, ano = vendas.groupby(["categoria", "ano"]).size().idxmax()
+
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.vendas_por_regiao))
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.top_produtos_categoria_ano, categoria, int(ano), 10))
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.linhas_totais_produtos))
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.linhas_totais_produtos, categoria))
+    for id_produto in _ids(vendas, "id_produto")[:5]:
+        sql, pandas_ = _nos_dois_caminhos(monkeypatch, service.detalhes_produto, id_produto)
+        assert sql == pandas_
+
+
+def test_vendedores_e_previsoes_iguais_nos_dois_caminhos(banco, monkeypatch):
+    for metrica in ("crescimento", "total", "tendencia"):
+        _aproximado(*_nos_dois_caminhos(monkeypatch, service.top_vendedores, 5, metrica))
+
+    with ENGINE.connect() as conn:
+        vendedores = pd.read_sql(select(Venda.id_vendedor).distinct(), conn)["id_vendedor"]
+    for id_vendedor in sorted(int(i) for i in vendedores)[:5]:
+        _aproximado(*_nos_dois_caminhos(monkeypatch, service.potencial_crescimento_vendedor, id_vendedor))
+
+    _aproximado(*_nos_dois_caminhos(monkeypatch, service.previsoes_produtos))